@@ -0,0 +1,320 @@
+"""Offline stand-ins for the Discord objects the cogs and views use.
+
+The fakes implement just enough of discord.Interaction, its response and
+followup, messages, channels and voice states to drive the cogs without a
+gateway connection. Every API call can be delayed by a simulated round
+trip, and all messages are kept so views can be clicked afterwards.
+"""
+
+import asyncio
+import itertools
+from typing import Any, Awaitable, Dict, List, Optional
+import discord
+
+_ids = itertools.count(10**17)
+
+def next_id() -> int:
+    """Get a new snowflake-like ID."""
+    return next(_ids)
+
+class FakeAPI:
+    """Simulated Discord API shared by all fakes of a benchmark.
+
+    Counts the calls made through it and sleeps for the round trip time
+    on each, so sessions can be measured with or without network latency.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """Initialize the API.
+
+        Args:
+            latency (float, optional): Seconds each API call takes. Defaults to 0.0.
+        """
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+
+    async def call(self, name: str, **kwargs: Any) -> None:
+        """Record an API call and wait for its round trip.
+
+        Args:
+            name (str): Name of the endpoint, e.g. send_message
+            **kwargs (Any): Arguments of the call, checked for error responses
+        """
+        self.calls[name] = self.calls.get(name, 0) + 1
+        content = kwargs.get('content')
+        if isinstance(content, str) and content.startswith('❌ An error occurred'):
+            self.errors += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            # Still give other tasks a turn, like a real request would
+            await asyncio.sleep(0)
+
+class FakeMessage:
+    """Message with its current content, embed and view."""
+
+    def __init__(self, api: FakeAPI, channel: 'FakeChannel', message_id: Optional[int] = None):
+        self.api = api
+        self.channel = channel
+        self.id = message_id or next_id()
+        self.content: Optional[str] = None
+        self.embed: Optional[discord.Embed] = None
+        self.view: Optional[discord.ui.View] = None
+        self.pinned = False
+
+    def apply(self, content: Any = ..., embed: Any = ..., view: Any = ..., **kwargs: Any) -> None:
+        """Apply the arguments of a send or edit to the message."""
+        if content is not ...:
+            self.content = content
+        if embed is not ...:
+            self.embed = embed
+        if view is not ...:
+            self.view = view
+
+    async def edit(self, **kwargs: Any) -> 'FakeMessage':
+        await self.api.call('edit_message', **kwargs)
+        self.apply(**kwargs)
+        return self
+
+    async def pin(self, **kwargs: Any) -> None:
+        await self.api.call('pin')
+        self.pinned = True
+
+    async def unpin(self, **kwargs: Any) -> None:
+        await self.api.call('unpin')
+        self.pinned = False
+
+class FakeChannel:
+    """Text channel keeping every message sent to it."""
+
+    def __init__(self, api: FakeAPI, channel_id: Optional[int] = None):
+        self.api = api
+        self.id = channel_id or next_id()
+        self.messages: Dict[int, FakeMessage] = {}
+
+    def new_message(self) -> FakeMessage:
+        """Create a message in the channel."""
+        message = FakeMessage(self.api, self)
+        self.messages[message.id] = message
+        return message
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> FakeMessage:
+        await self.api.call('channel_send', content=content)
+        message = self.new_message()
+        message.apply(content=content, **kwargs)
+        return message
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        message = self.messages.get(message_id)
+        if message is None:
+            message = self.messages[message_id] = FakeMessage(self.api, self, message_id)
+        return message
+
+class FakeVoiceChannel:
+    """Voice channel with members, soundboard sounds are only counted."""
+
+    def __init__(self, api: FakeAPI, name: str = 'Voice', members: Optional[List['FakeMember']] = None):
+        self.api = api
+        self.id = next_id()
+        self.name = name
+        self.members: List[FakeMember] = members or []
+
+    async def send_sound(self, sound: Any) -> None:
+        await self.api.call('send_sound')
+
+class FakeVoiceState:
+    """Voice state of a member."""
+
+    def __init__(self, channel: FakeVoiceChannel):
+        self.channel = channel
+
+class FakeMember:
+    """Guild member, optionally connected to a voice channel."""
+
+    def __init__(self, member_id: int, name: str, voice: Optional[FakeVoiceState] = None):
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.voice = voice
+
+class FakeClient:
+    """Bot client, used to reach messages by channel and message ID and to look up sounds."""
+
+    def __init__(self, api: FakeAPI):
+        self.api = api
+        self.channels: Dict[int, FakeChannel] = {}
+        self.voice_clients: List[Any] = []
+
+    def get_soundboard_sound(self, sound_id: int) -> discord.Object:
+        return discord.Object(id=sound_id)
+
+    def add_channel(self, channel: FakeChannel) -> None:
+        self.channels[channel.id] = channel
+
+    def get_partial_messageable(self, channel_id: int, **kwargs: Any) -> FakeChannel:
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = FakeChannel(self.api, channel_id)
+        return channel
+
+class FakeGateway:
+    """Dispatches interactions like the gateway, each in a task of its own.
+
+    Counts the interactions in flight, so load tests can see how many
+    the event loop was juggling at once.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.dispatched = 0
+
+    async def dispatch(self, call: Awaitable[Any]) -> Any:
+        """Run a command or callback in a new task and wait for it.
+
+        Args:
+            call (Awaitable[Any]): The command or callback
+
+        Returns:
+            Any: Result of the call
+        """
+        self.in_flight += 1
+        self.dispatched += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await asyncio.ensure_future(call)
+        finally:
+            self.in_flight -= 1
+
+class FakeResponse:
+    """Stand-in for discord.InteractionResponse, allows a single response."""
+
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    def _respond(self) -> None:
+        if self._done:
+            raise RuntimeError('This interaction has already been responded to before')
+        self._done = True
+
+    async def send_message(self, content: Optional[str] = None, **kwargs: Any) -> None:
+        self._respond()
+        await self._interaction.api.call('send_message', content=content)
+        message = self._interaction.channel.new_message()
+        message.apply(content=content, **kwargs)
+        self._interaction.original = message
+
+    async def edit_message(self, **kwargs: Any) -> None:
+        self._respond()
+        await self._interaction.api.call('edit_message', **kwargs)
+        self._interaction.message.apply(**kwargs)
+
+    async def defer(self, **kwargs: Any) -> None:
+        self._respond()
+        await self._interaction.api.call('defer')
+
+class FakeFollowup:
+    """Stand-in for the followup webhook of an interaction."""
+
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> FakeMessage:
+        await self._interaction.api.call('followup_send', content=content)
+        message = self._interaction.channel.new_message()
+        message.apply(content=content, **kwargs)
+        if self._interaction.original is None:
+            # The first followup of a deferred interaction is its response
+            self._interaction.original = message
+        return message
+
+    async def edit_message(self, message_id: int, **kwargs: Any) -> FakeMessage:
+        await self._interaction.api.call('followup_edit', **kwargs)
+        message = self._interaction.channel.get_partial_message(message_id)
+        message.apply(**kwargs)
+        return message
+
+class FakeInteraction:
+    """Stand-in for discord.Interaction of a command or a component click."""
+
+    def __init__(self, client: FakeClient, channel: FakeChannel, user: FakeMember, guild_id: int,
+                 data: Optional[Dict[str, Any]] = None, message: Optional[FakeMessage] = None):
+        """Create an interaction.
+
+        Args:
+            client (FakeClient): The bot client
+            channel (FakeChannel): Channel the interaction happened in
+            user (FakeMember): Member who triggered the interaction
+            guild_id (int): ID of the guild
+            data (Optional[Dict[str, Any]], optional): Interaction data, e.g. the
+                custom_id of a clicked button. Defaults to None.
+            message (Optional[FakeMessage], optional): Message of a clicked
+                component. Defaults to None.
+        """
+        self.client = client
+        self.api = client.api
+        self.channel = channel
+        self.user = user
+        self.guild_id = guild_id
+        self.data = data or {}
+        self.message = message
+        self.command = None
+        self.extras: Dict[str, Any] = {}
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        # Message created by the response, or the clicked message
+        self.original: Optional[FakeMessage] = message
+
+    async def original_response(self) -> FakeMessage:
+        await self.api.call('original_response')
+        return self.original
+
+    async def edit_original_response(self, **kwargs: Any) -> FakeMessage:
+        await self.api.call('edit_original_response', **kwargs)
+        self.original.apply(**kwargs)
+        return self.original
+
+def find_item(message: FakeMessage, custom_id: str) -> discord.ui.Item:
+    """Find a component of a message's view by its custom_id.
+
+    Persistent custom_ids also match by their last part, the action.
+
+    Raises:
+        LookupError: If the message has no such component
+    """
+    if message.view is not None:
+        for item in message.view.children:
+            item_id = getattr(item, 'custom_id', None) or ''
+            if item_id == custom_id or item_id.rsplit(':', 1)[-1] == custom_id:
+                return item
+    raise LookupError(f"Message {message.id} has no component {custom_id}")
+
+async def click(client: FakeClient, message: FakeMessage, user: FakeMember, guild_id: int,
+                custom_id: str) -> FakeInteraction:
+    """Click a component of a message like Discord would dispatch it.
+
+    Args:
+        client (FakeClient): The bot client
+        message (FakeMessage): Message with the view
+        user (FakeMember): Member clicking
+        guild_id (int): ID of the guild
+        custom_id (str): custom_id or action of the component
+
+    Returns:
+        FakeInteraction: The dispatched interaction
+    """
+    item = find_item(message, custom_id)
+    custom_id = item.custom_id
+    interaction = FakeInteraction(client, message.channel, user, guild_id,
+                                  data={'custom_id': custom_id, 'component_type': 2}, message=message)
+    if isinstance(item, discord.ui.DynamicItem):
+        # Dynamic items are rebuilt from the custom_id, the sent view is not kept
+        match = item.template.fullmatch(custom_id)
+        item = await type(item).from_custom_id(interaction, item.item, match)
+    await item.callback(interaction)
+    return interaction
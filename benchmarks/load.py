@@ -0,0 +1,296 @@
+"""Concurrent load test of the cogs and views.
+
+Replays a trace of player sessions across many guilds through a fake
+gateway, which runs every interaction in a task of its own like the real
+one. Concurrency is ramped up in steps; each step keeps that many
+sessions in flight for a fixed time and measures throughput, tail
+latency per interaction and event loop lag. The step with the highest
+throughput is reported as the saturation point.
+
+Run from the repository root:
+
+    python -m benchmarks.load --levels 1,8,64,512 --latency 50
+    python -m benchmarks.load --record trace.jsonl
+    python -m benchmarks.load --trace trace.jsonl --json load.json
+
+A trace is a JSON lines file of {"guild": int, "player": int, "session": str}
+entries, replayed in order and from the start again when exhausted.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+from utils import history, stats, user_manager
+from utils.storage import create_backend
+from benchmarks.fakes import FakeAPI, FakeGateway, FakeMember
+from benchmarks.sessions import (
+    Bench, Recorder, character_session, combat_session, dice_session,
+    dungeon_master_session, initiative_session, percentile, throw_session
+)
+
+DEFAULT_LEVELS = (1, 4, 16, 64, 256, 1024)
+# Sessions of the synthetic trace and how often they occur, in percent
+SESSION_MIX: Dict[str, int] = {
+    'throw': 35,
+    'dice': 20,
+    'initiative': 20,
+    'character': 10,
+    'combat': 10,
+    'dungeon_master': 5,
+}
+SESSIONS: Dict[str, Callable[[Bench, FakeMember], Awaitable[None]]] = {
+    'throw': throw_session,
+    'dice': dice_session,
+    'initiative': initiative_session,
+    'character': character_session,
+    'combat': combat_session,
+    'dungeon_master': dungeon_master_session,
+}
+# Seconds between event loop lag samples
+LAG_INTERVAL = 0.01
+# A step saturates when it adds less than this much throughput
+SATURATION_GAIN = 1.1
+
+def synthetic_trace(length: int, guilds: int, seed: int) -> List[Dict[str, Any]]:
+    """Generate a trace with sessions drawn from SESSION_MIX.
+
+    Args:
+        length (int): Number of sessions
+        guilds (int): Number of guilds to spread them over
+        seed (int): Seed of the trace
+
+    Returns:
+        List[Dict[str, Any]]: Trace entries
+    """
+    rng = random.Random(seed)
+    names = list(SESSION_MIX)
+    weights = [SESSION_MIX[name] for name in names]
+    return [
+        {'guild': rng.randrange(guilds), 'player': rng.randrange(1 << 16), 'session': name}
+        for name in rng.choices(names, weights, k=length)
+    ]
+
+def read_trace(path: str) -> List[Dict[str, Any]]:
+    """Read a trace from a JSON lines file.
+
+    Raises:
+        ValueError: If an entry names an unknown session
+    """
+    trace = []
+    with open(path, encoding='utf-8') as f:
+        for line in filter(None, map(str.strip, f)):
+            entry = json.loads(line)
+            if entry['session'] not in SESSIONS:
+                raise ValueError(f"Unknown session in trace: {entry['session']}")
+            trace.append(entry)
+    return trace
+
+async def sample_lag(samples: List[float], stop: asyncio.Event) -> None:
+    """Measure how late the event loop wakes up a sleeping task.
+
+    Args:
+        samples (List[float]): Receives the lag of every wake-up in seconds
+        stop (asyncio.Event): Ends the sampling when set
+    """
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, time.perf_counter() - started - LAG_INTERVAL))
+
+async def run_level(concurrency: int, duration: float, benches: List[Bench],
+                    trace: Iterator[Dict[str, Any]], gateway: FakeGateway, api: FakeAPI) -> Dict[str, Any]:
+    """Keep a number of sessions in flight for a while.
+
+    Sessions of different players run concurrently, also within a guild,
+    so they may get in each other's way like real players do. Sessions
+    that find a view they expected gone are counted as conflicts.
+
+    Args:
+        concurrency (int): Sessions in flight
+        duration (float): Seconds to start new sessions
+        benches (List[Bench]): The guilds
+        trace (Iterator[Dict[str, Any]]): Endless trace of sessions
+        gateway (FakeGateway): Gateway dispatching the interactions
+        api (FakeAPI): API shared by the guilds
+
+    Returns:
+        Dict[str, Any]: Throughput, latency and lag of the step
+    """
+    recorder = Recorder(api)
+    for bench in benches:
+        bench.recorder = recorder
+    session_seconds: List[float] = []
+    lag: List[float] = []
+    conflicts = 0
+    errors = api.errors
+    gateway.peak = gateway.in_flight
+
+    async def worker(deadline: float) -> None:
+        nonlocal conflicts
+        while time.perf_counter() < deadline:
+            entry = next(trace)
+            bench = benches[entry['guild'] % len(benches)]
+            player = bench.players[entry['player'] % len(bench.players)]
+            started = time.perf_counter()
+            try:
+                await SESSIONS[entry['session']](bench, player)
+            except LookupError:
+                conflicts += 1
+            session_seconds.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_lag(lag, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(started + duration) for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    latencies = sorted(itertools.chain.from_iterable(recorder.samples.values()))
+    session_seconds.sort()
+    lag.sort()
+    return {
+        'concurrency': concurrency,
+        'wall_sec': wall,
+        'sessions': len(session_seconds),
+        'sessions_per_sec': len(session_seconds) / wall,
+        'ops_per_sec': len(latencies) / wall,
+        'peak_in_flight': gateway.peak,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'p999_ms': percentile(latencies, 0.999) * 1000,
+        'session_p99_ms': percentile(session_seconds, 0.99) * 1000,
+        'lag_p99_ms': percentile(lag, 0.99) * 1000,
+        'lag_max_ms': (lag[-1] if lag else 0.0) * 1000,
+        'errors': api.errors - errors,
+        'conflicts': conflicts,
+        'commands': recorder.summary(),
+    }
+
+def saturation(levels: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Find the step after which more concurrency stops paying off.
+
+    Returns:
+        Dict[str, Any]: The first step whose successor adds less than
+            SATURATION_GAIN times its throughput, or the last step
+    """
+    for level, following in zip(levels, levels[1:]):
+        if following['sessions_per_sec'] < level['sessions_per_sec'] * SATURATION_GAIN:
+            return level
+    return levels[-1]
+
+async def run(args: argparse.Namespace, trace: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Set up the guilds and ramp up the load.
+
+    Returns:
+        Dict[str, Any]: Results, as written to the JSON file
+    """
+    api = FakeAPI(args.latency / 1000)
+    gateway = FakeGateway()
+    benches = [Bench(guild_id, args.size, seed=args.seed, api=api, gateway=gateway)
+               for guild_id in range(1, args.guilds + 1)]
+    entries = itertools.cycle(trace)
+
+    # Write-behind saves, roll archiving and statistics run like in the bot, competing for the loop
+    user_manager.start_persistence()
+    history.start_history()
+    stats.start_stats()
+    levels = []
+    try:
+        for concurrency in args.levels:
+            level = await run_level(concurrency, args.duration, benches, entries, gateway, api)
+            levels.append(level)
+            print(f"concurrency {concurrency:>5}: {level['sessions_per_sec']:>8.1f} sessions/s, "
+                  f"p99 {level['p99_ms']:.1f} ms, loop lag p99 {level['lag_p99_ms']:.1f} ms",
+                  file=sys.stderr)
+    finally:
+        await history.stop_history()
+        await stats.stop_stats()
+        await user_manager.stop_persistence()
+        backend = user_manager.get_backend()
+        backend.executor.shutdown(wait=True)
+        backend.close()
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'guilds': args.guilds,
+        'size': args.size,
+        'latency_ms': args.latency,
+        'duration_sec': args.duration,
+        'trace': args.trace or 'synthetic',
+        'levels': levels,
+        'saturation': saturation(levels)['concurrency'],
+    }
+
+def print_results(results: Dict[str, Any]) -> None:
+    """Print the throughput curve."""
+    print(f"\n{results['guilds']} guilds of {results['size']} characters, "
+          f"{results['latency_ms']:g} ms API latency, trace: {results['trace']}")
+    print(f"{'concurrency':>11}{'sessions/s':>12}{'ops/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'p99.9 ms':>10}"
+          f"{'lag p99':>9}{'lag max':>9}{'errors':>8}{'conflicts':>10}")
+    for level in results['levels']:
+        mark = '  <- saturation' if level['concurrency'] == results['saturation'] else ''
+        print(f"{level['concurrency']:>11}{level['sessions_per_sec']:>12.1f}{level['ops_per_sec']:>10.0f}"
+              f"{level['p50_ms']:>9.2f}{level['p99_ms']:>9.2f}{level['p999_ms']:>10.2f}"
+              f"{level['lag_p99_ms']:>9.2f}{level['lag_max_ms']:>9.2f}{level['errors']:>8}"
+              f"{level['conflicts']:>10}{mark}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parse the command line and run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--levels', default=','.join(map(str, DEFAULT_LEVELS)),
+                        help='comma separated numbers of sessions in flight (default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='seconds per concurrency level (default: %(default)s)')
+    parser.add_argument('--guilds', type=int, default=100, help='number of guilds (default: %(default)s)')
+    parser.add_argument('--size', type=int, default=20, help='characters per guild (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=50.0,
+                        help='simulated API round trip in milliseconds (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of rosters and trace (default: %(default)s)')
+    parser.add_argument('--trace', metavar='PATH', help='replay this JSON lines trace instead of a synthetic one')
+    parser.add_argument('--record', metavar='PATH', help='write the synthetic trace to a JSON lines file and exit')
+    parser.add_argument('--json', metavar='PATH', help='write the results to a JSON file')
+    parser.add_argument('--log-level', default='CRITICAL',
+                        help='log level of the bot, errors are counted either way (default: %(default)s)')
+    args = parser.parse_args(argv)
+    args.levels = [int(level) for level in args.levels.split(',') if level]
+
+    if args.trace:
+        trace = read_trace(args.trace)
+    else:
+        trace = synthetic_trace(10000, args.guilds, args.seed)
+    if args.record:
+        with open(args.record, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(entry) + '\n' for entry in trace)
+        return
+
+    logging.basicConfig(level=args.log_level.upper())
+    json_path = os.path.abspath(args.json) if args.json else None
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='dsa_load_') as directory:
+        # Storage paths are relative, keep every write in the temporary directory
+        os.chdir(directory)
+        user_manager._backend = create_backend('file')
+        try:
+            results = asyncio.run(run(args, trace))
+        finally:
+            os.chdir(cwd)
+
+    print_results(results)
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {json_path}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,414 @@
+"""Offline benchmark of the cogs and views.
+
+Drives CharacterCog, DiceCog, InitiativeCog, DungeonMasterCog and their
+views through scripted sessions against fake Discord objects, at several
+roster sizes, and reports throughput and latency percentiles per command.
+Every size runs once with plain views and once with PERSISTENT_VIEWS on,
+where each click is routed through PromptRouter.
+
+Run from the repository root:
+
+    python -m benchmarks.sessions --sizes 10,1000,100000 --json results.json
+    python -m benchmarks.sessions --compare results.json
+
+Characters and combat state are written to a temporary directory, never
+to the bot's own storage.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from models.user import ATTRIBUTES, User
+from utils import user_manager
+from utils.dice import start_session
+from utils.storage import create_backend
+from views import persistent
+from cogs.character import CharacterCog
+from cogs.dice import DiceCog
+from cogs.dungeon_master import DungeonMasterCog
+from cogs.history import HistoryCog
+from cogs.initiative import InitiativeCog
+from cogs.stats import StatsCog
+from benchmarks.fakes import (
+    FakeAPI, FakeChannel, FakeClient, FakeGateway, FakeInteraction, FakeMember, FakeMessage,
+    FakeVoiceChannel, FakeVoiceState, click
+)
+
+DEFAULT_SIZES = (10, 1000, 100000)
+# Players actively using the bot, a real table rarely has more
+ACTIVE_PLAYERS = 8
+# Sessions that scan the whole roster run once every HEAVY_EVERY rounds
+HEAVY_EVERY = 10
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile of sorted values by the nearest rank.
+
+    Args:
+        values (List[float]): Sorted values
+        fraction (float): Percentile as a fraction, e.g. 0.99
+
+    Returns:
+        float: The percentile, 0.0 without values
+    """
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(fraction * len(values) + 0.5) - 1))
+    return values[index]
+
+class Recorder:
+    """Collects the durations and error responses of every timed call."""
+
+    def __init__(self, api: FakeAPI):
+        self.api = api
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def time(self, label: str, call: Awaitable[Any]) -> Any:
+        """Await a call and record how long it took.
+
+        Args:
+            label (str): Name of the command or callback
+            call (Awaitable[Any]): The call
+
+        Returns:
+            Any: Result of the call
+        """
+        errors = self.api.errors
+        started = time.perf_counter()
+        try:
+            return await call
+        finally:
+            self.samples.setdefault(label, []).append(time.perf_counter() - started)
+            if self.api.errors != errors:
+                self.errors[label] = self.errors.get(label, 0) + self.api.errors - errors
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Summarize the recorded calls.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Count, serial throughput, latency
+                percentiles in milliseconds and errors per label
+        """
+        result = {}
+        for label, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            total = sum(samples)
+            result[label] = {
+                'count': len(samples),
+                'ops_per_sec': len(samples) / total if total else 0.0,
+                'p50_ms': percentile(samples, 0.50) * 1000,
+                'p90_ms': percentile(samples, 0.90) * 1000,
+                'p99_ms': percentile(samples, 0.99) * 1000,
+                'max_ms': samples[-1] * 1000,
+                'errors': self.errors.get(label, 0),
+            }
+        return result
+
+class Bench:
+    """One guild with a generated roster, the cogs and a fake client."""
+
+    def __init__(self, guild_id: int, size: int, latency: float = 0.0, seed: int = 0,
+                 api: Optional[FakeAPI] = None, gateway: Optional[FakeGateway] = None):
+        """Create the guild and its roster.
+
+        Args:
+            guild_id (int): ID of the guild
+            size (int): Number of characters in the roster
+            latency (float, optional): Seconds each API call takes. Defaults to 0.0.
+            seed (int, optional): Seed of the roster and the scripted choices. Defaults to 0.
+            api (Optional[FakeAPI], optional): API shared with other guilds. Defaults to None.
+            gateway (Optional[FakeGateway], optional): Runs every command and click in
+                a task of its own. Defaults to None, calling them directly.
+        """
+        self.guild_id = guild_id
+        self.size = size
+        self.rng = random.Random(f'{seed}:{guild_id}')
+        self.api = api or FakeAPI(latency)
+        self.gateway = gateway
+        self.client = FakeClient(self.api)
+        self.channel = FakeChannel(self.api)
+        self.client.add_channel(self.channel)
+        self.recorder = Recorder(self.api)
+
+        self.character = CharacterCog(self.client)
+        self.dice = DiceCog(self.client)
+        self.initiative = InitiativeCog(self.client)
+        self.dungeon_master = DungeonMasterCog(self.client)
+        self.history = HistoryCog(self.client)
+        self.stats = StatsCog(self.client)
+
+        users = [self.make_user(index) for index in range(size)]
+        user_manager.set_users(guild_id, users)
+        start_session(guild_id, f'benchmark:{seed}')
+
+        # The active players share a voice channel, the game master is not in the roster
+        self.voice = FakeVoiceChannel(self.api)
+        self.players = [self.member(user.id) for user in self.rng.sample(users, min(ACTIVE_PLAYERS, size))]
+        for player in self.players:
+            player.voice = FakeVoiceState(self.voice)
+            self.voice.members.append(player)
+        self.game_master = FakeMember(guild_id * 10, 'game_master')
+
+    def make_user(self, index: int) -> User:
+        """Generate a character of the roster.
+
+        A tenth of the characters have already rolled initiative.
+        """
+        user = User(str(self.guild_id * 10**7 + index), f'player{index}', f'Character {index}',
+                    user_manager.guild_key(self.guild_id))
+        for attr in ATTRIBUTES:
+            setattr(user, attr, self.rng.randint(8, 16))
+        user.ini = self.rng.randint(8, 15)
+        if self.rng.random() < 0.1:
+            user.current_ini = user.ini + self.rng.randint(1, 6)
+        return user
+
+    def member(self, user_id: str) -> FakeMember:
+        """Get a member for a character's Discord user."""
+        return FakeMember(int(user_id), f'player{user_id}')
+
+    async def command(self, label: str, command: Any, user: FakeMember, *args: Any) -> FakeInteraction:
+        """Invoke an app command of a cog.
+
+        Args:
+            label (str): Name to record the call under
+            command (Any): The app command, e.g. self.dice.throw_command
+            user (FakeMember): Member invoking it
+            *args (Any): Command arguments
+
+        Returns:
+            FakeInteraction: The command's interaction
+        """
+        interaction = FakeInteraction(self.client, self.channel, user, self.guild_id)
+        await self.recorder.time(label, self.dispatch(command.callback(command.binding, interaction, *args)))
+        return interaction
+
+    async def click(self, label: str, message: FakeMessage, user: FakeMember, custom_id: str) -> FakeInteraction:
+        """Click a component of a message and record the callback.
+
+        Args:
+            label (str): Name to record the call under
+            message (FakeMessage): Message with the view
+            user (FakeMember): Member clicking
+            custom_id (str): custom_id of the component
+
+        Returns:
+            FakeInteraction: The click's interaction
+        """
+        return await self.recorder.time(
+            label, self.dispatch(click(self.client, message, user, self.guild_id, custom_id))
+        )
+
+    def dispatch(self, call: Awaitable[Any]) -> Awaitable[Any]:
+        """Route a command or callback through the gateway, if there is one."""
+        return self.gateway.dispatch(call) if self.gateway else call
+
+    def close(self) -> None:
+        """Drop the guild's roster and combat."""
+        user_manager.end_combat(self.guild_id)
+        user_manager.set_users(self.guild_id, [])
+
+async def character_session(bench: Bench, player: FakeMember) -> None:
+    """Show a character sheet, its roll history and statistics, then update the sheet."""
+    await bench.command('char', bench.character.char_command, player)
+    await bench.command('history', bench.history.history_command, player, None, 10)
+    await bench.command('stats', bench.stats.stats_command, player, 'character', None)
+    stats = [bench.rng.randint(8, 16) for _ in range(len(ATTRIBUTES) + 1)]
+    await bench.command('char_setup', bench.character.char_setup_command, player,
+                        f'Character {player.id}', *stats)
+
+async def throw_session(bench: Bench, player: FakeMember) -> None:
+    """Make a full throw: pick three attributes, adjust the modifier, confirm."""
+    interaction = await bench.command('throw', bench.dice.throw_command, player)
+    message = interaction.original
+    await bench.click('ThrowTypeView.full', message, player, 'throw_full')
+    for attr in bench.rng.sample(ATTRIBUTES, 3):
+        await bench.click('DiceThrowView.attribute', message, player, f'attr_{attr}')
+    await bench.click('DiceThrowView.modifier', message, player, 'mod_plus')
+    await bench.click('DiceThrowView.confirm', message, player, 'confirm_throw')
+
+async def dice_session(bench: Bench, player: FakeMember) -> None:
+    """Look up odds and roll free dice expressions."""
+    await bench.command('odds', bench.dice.odds_command, player, 'MU', 'KL', 'IN', -1)
+    await bench.command('roll', bench.dice.roll_command, player, '3d20+MU')
+    await bench.command('roll', bench.dice.roll_command, player, '2W6+ini')
+
+async def initiative_session(bench: Bench, player: FakeMember) -> None:
+    """Roll initiative with a modifier and look at the order."""
+    interaction = await bench.command('init', bench.initiative.init_command, player)
+    message = interaction.original
+    await bench.click('InitiativeView.modifier', message, player, 'mod_plus')
+    await bench.click('InitiativeView.confirm', message, player, 'confirm_throw')
+    await bench.command('init_order', bench.initiative.init_order_command, player)
+
+async def combat_session(bench: Bench, player: FakeMember) -> None:
+    """Run a few turns of a combat through commands and tracker buttons."""
+    interaction = await bench.command('init_start', bench.initiative.init_start_command, bench.game_master)
+    tracker = interaction.original
+    await bench.command('init_next', bench.initiative.init_next_command, bench.game_master)
+    for _ in range(3):
+        await bench.click('InitiativeTrackerView.next', tracker, bench.game_master, 'init_tracker:next')
+    combat = user_manager.get_combat(bench.guild_id)
+    delayed = bench.member(combat.current) if combat and combat.current else player
+    await bench.command('init_delay', bench.initiative.init_delay_command, bench.game_master)
+    await bench.click('InitiativeTrackerView.ready', tracker, delayed, 'init_tracker:ready')
+    await bench.command('init_end', bench.initiative.init_end_command, bench.game_master)
+
+async def dungeon_master_session(bench: Bench, player: FakeMember) -> None:
+    """Pick a character as game master and throw for it."""
+    interaction = await bench.command('dm', bench.dungeon_master.dm_command, bench.game_master)
+    message = interaction.original
+    if message is None or message.view is None:
+        # Rosters beyond one view's worth of buttons fail, see the errors column
+        return
+    await bench.click('DungeonMasterRollView.character', message, bench.game_master, f'char_{player.id}')
+    # The throw view only accepts clicks of the character's player
+    for attr in bench.rng.sample(ATTRIBUTES, 3):
+        await bench.click('DiceThrowView.attribute', message, player, f'attr_{attr}')
+    await bench.click('DiceThrowView.confirm', message, player, 'confirm_throw')
+
+async def party_session(bench: Bench, player: FakeMember) -> None:
+    """Commands scanning the whole roster."""
+    await bench.command('odds party', bench.dice.odds_command, player, 'MU', 'KL', 'IN', 0, True)
+    await bench.command('group_throw', bench.dungeon_master.group_throw_command, bench.game_master,
+                        'MU', 'KL', 'IN')
+    await bench.command('group_throw voice', bench.dungeon_master.group_throw_command, player,
+                        'MU', 'KL', 'IN', 0, True)
+    await bench.command('init_reset', bench.initiative.init_reset_command, bench.game_master)
+
+SESSIONS: List[Callable[[Bench, FakeMember], Awaitable[None]]] = [
+    character_session, throw_session, dice_session, initiative_session,
+    combat_session, dungeon_master_session,
+]
+
+async def run_size(size: int, rounds: int, latency: float, seed: int,
+                   persistent_views: bool = False) -> Dict[str, Any]:
+    """Run all sessions against one roster size.
+
+    Args:
+        size (int): Number of characters
+        rounds (int): How often every session runs
+        latency (float): Seconds each API call takes
+        seed (int): Seed of the roster and the scripted choices
+        persistent_views (bool, optional): Run with PERSISTENT_VIEWS on. Defaults to False.
+
+    Returns:
+        Dict[str, Any]: Wall time, overall throughput and the per command summary
+    """
+    bench = Bench(size, size, latency, seed)
+    default = persistent.PERSISTENT_VIEWS
+    persistent.PERSISTENT_VIEWS = persistent_views
+    try:
+        started = time.perf_counter()
+        for index in range(rounds):
+            for session in SESSIONS:
+                await session(bench, bench.rng.choice(bench.players))
+            if index % HEAVY_EVERY == 0:
+                await party_session(bench, bench.rng.choice(bench.players))
+        wall = time.perf_counter() - started
+    finally:
+        persistent.PERSISTENT_VIEWS = default
+    bench.close()
+
+    commands = bench.recorder.summary()
+    operations = sum(stats['count'] for stats in commands.values())
+    return {
+        'size': size,
+        'persistent_views': persistent_views,
+        'wall_sec': wall,
+        'operations': operations,
+        'ops_per_sec': operations / wall if wall else 0.0,
+        'api_calls': bench.api.calls,
+        'commands': commands,
+    }
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """Print the results as tables, with the change against a baseline run."""
+    for key, result in results['sizes'].items():
+        views = 'persistent views' if result.get('persistent_views') else 'plain views'
+        print(f"\nRoster size {result.get('size', key)}, {views}: {result['operations']} operations "
+              f"in {result['wall_sec']:.2f}s ({result['ops_per_sec']:.0f} ops/s)")
+        print(f"{'command':<34}{'n':>6}{'ops/s':>10}{'p50 ms':>9}{'p90 ms':>9}"
+              f"{'p99 ms':>9}{'max ms':>9}{'errors':>7}")
+        base = (baseline or {}).get('sizes', {}).get(key, {}).get('commands', {})
+        for label, stats in result['commands'].items():
+            line = (f"{label:<34}{stats['count']:>6}{stats['ops_per_sec']:>10.0f}{stats['p50_ms']:>9.3f}"
+                    f"{stats['p90_ms']:>9.3f}{stats['p99_ms']:>9.3f}{stats['max_ms']:>9.3f}{stats['errors']:>7}")
+            if label in base and base[label]['p50_ms']:
+                line += f"  p50 {stats['p50_ms'] / base[label]['p50_ms'] - 1:+.0%}"
+                if base[label]['p99_ms']:
+                    line += f" p99 {stats['p99_ms'] / base[label]['p99_ms'] - 1:+.0%}"
+            print(line)
+
+async def run(sizes: List[int], rounds: int, latency: float, seed: int) -> Dict[str, Any]:
+    """Run the benchmark for every roster size.
+
+    Returns:
+        Dict[str, Any]: Results, as written to the JSON file
+    """
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'rounds': rounds,
+        'latency_ms': latency * 1000,
+        'seed': seed,
+        'sizes': {},
+    }
+    for size in sizes:
+        results['sizes'][str(size)] = await run_size(size, rounds, latency, seed)
+        results['sizes'][f'{size}p'] = await run_size(size, rounds, latency, seed, persistent_views=True)
+    backend = user_manager.get_backend()
+    backend.executor.shutdown(wait=True)
+    backend.close()
+    return results
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parse the command line and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated roster sizes (default: %(default)s)')
+    parser.add_argument('--rounds', type=int, default=100,
+                        help='how often every session runs per size (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='simulated API round trip in milliseconds (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of rosters and dice (default: %(default)s)')
+    parser.add_argument('--json', metavar='PATH', help='write the results to a JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='show the change against an earlier JSON file')
+    parser.add_argument('--log-level', default='CRITICAL',
+                        help='log level of the bot, errors are counted either way (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper())
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='dsa_bench_') as directory:
+        # Storage paths are relative, keep every write in the temporary directory
+        os.chdir(directory)
+        user_manager._backend = create_backend('file')
+        try:
+            results = asyncio.run(run(sizes, args.rounds, args.latency / 1000, args.seed))
+        finally:
+            os.chdir(cwd)
+
+    print_results(results, baseline)
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {json_path}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,17 @@
 """Character management cog for the DSA Bot."""
 
+import logging
 import discord
 from discord.ext import commands
 from discord import app_commands
 from models.user import User
-from utils.user_manager import get_users, set_users, save_all_users
+from utils.embeds import character_sheet_embed, no_character_embed
+from utils.user_manager import get_user, upsert_user, load_guild, guild_key
+
+logger = logging.getLogger(__name__)
+
+# Attribute and initiative values must fit the fixed-width snapshot records
+StatValue = app_commands.Range[int, -999, 999]
 
 class CharacterCog(commands.Cog):
     """Cog for handling character-related commands."""
@@ -21,46 +28,20 @@ class CharacterCog(commands.Cog):
     async def char_command(self, interaction: discord.Interaction):
         """Show the user's character sheet."""
         try:
-            print(f"Looking for user with ID: {interaction.user.id}")
-            users = get_users()
-            print(f"Current users in memory: {[f'{u.id} ({u.char_name})' for u in users]}")
+            logger.debug("Looking for user with ID: %s", interaction.user.id)
             
-            # Find user by Discord ID
-            current_user = next((user for user in users if str(user.id) == str(interaction.user.id)), None)
+            # Find user by Discord ID in this guild's roster
+            await load_guild(interaction.guild_id)
+            current_user = get_user(interaction.guild_id, interaction.user.id)
             
             if current_user is None:
-                embed = discord.Embed(
-                    title="❌ No Character Found",
-                    description=f"No character found for {interaction.user.name}",
-                    color=discord.Color.red()
-                )
-                embed.add_field(
-                    name="How to create a character",
-                    value='Use `/char_setup` to create your character.',
-                    inline=False
-                )
-                await interaction.response.send_message(embed=embed)
+                await interaction.response.send_message(embed=no_character_embed(interaction.user.name))
                 return
 
-            embed = discord.Embed(
-                title=f"📊 Character Sheet: {current_user.char_name}",
-                color=discord.Color.blue()
-            )
-            embed.add_field(name="Player", value=current_user.name, inline=True)
-            embed.add_field(name="Initiative", value=str(current_user.ini), inline=True)
-            embed.add_field(name="MU (Mut)", value=str(current_user.MU), inline=True)
-            embed.add_field(name="KL (Klugheit)", value=str(current_user.KL), inline=True)
-            embed.add_field(name="IN (Intuition)", value=str(current_user.IN), inline=True)
-            embed.add_field(name="CH (Charisma)", value=str(current_user.CH), inline=True)
-            embed.add_field(name="FF (Fingerfertigkeit)", value=str(current_user.FF), inline=True)
-            embed.add_field(name="GE (Gewandtheit)", value=str(current_user.GE), inline=True)
-            embed.add_field(name="KO (Konstitution)", value=str(current_user.KO), inline=True)
-            embed.add_field(name="KK (Körperkraft)", value=str(current_user.KK), inline=True)
-            
-            await interaction.response.send_message(embed=embed)
+            await interaction.response.send_message(embed=character_sheet_embed(current_user))
 
         except Exception as e:
-            print(f"Error in char command: {str(e)}")
+            logger.exception("Error in char command")
             await interaction.response.send_message(f'❌ An error occurred: {str(e)}')
 
     @app_commands.command(name="char_setup", description="Create or update your character")
@@ -80,15 +61,15 @@ class CharacterCog(commands.Cog):
         self,
         interaction: discord.Interaction,
         char_name: str,
-        mu: int,
-        kl: int,
-        in_: int,
-        ch: int,
-        ff: int,
-        ge: int,
-        ko: int,
-        kk: int,
-        ini: int
+        mu: StatValue,
+        kl: StatValue,
+        in_: StatValue,
+        ch: StatValue,
+        ff: StatValue,
+        ge: StatValue,
+        ko: StatValue,
+        kk: StatValue,
+        ini: StatValue
     ):
         """Create or update a character.
 
@@ -106,8 +87,9 @@ class CharacterCog(commands.Cog):
             ini (int): Initiative value
         """
         try:
-            print(f"Creating character for user ID: {interaction.user.id}")
-            new_user = User(str(interaction.user.id), interaction.user.name, char_name)
+            logger.debug("Creating character for user ID: %s", interaction.user.id)
+            new_user = User(str(interaction.user.id), interaction.user.name, char_name,
+                            guild_key(interaction.guild_id))
             new_user.MU = mu
             new_user.KL = kl
             new_user.IN = in_
@@ -118,17 +100,10 @@ class CharacterCog(commands.Cog):
             new_user.KK = kk
             new_user.ini = ini
 
-            # Check if user already exists and remove if found
-            users = get_users()
-            print(f"Current users before update: {[f'{u.id} ({u.char_name})' for u in users]}")
-            users = [user for user in users if str(user.id) != str(interaction.user.id)]
-            users.append(new_user)
-            set_users(users)
-            print(f"Users after update: {[f'{u.id} ({u.char_name})' for u in users]}")
-
-            # Save to file
-            save_all_users()
-            print(f"Saved users to file: {[f'{u.id} ({u.char_name})' for u in users]}")
+            # Replace any existing character of this user and schedule the save
+            await load_guild(interaction.guild_id)
+            upsert_user(new_user)
+            logger.debug("Stored character: %s (%s)", new_user.id, new_user.char_name)
 
             embed = discord.Embed(
                 title="✅ Character Created",
@@ -148,7 +123,7 @@ class CharacterCog(commands.Cog):
             await interaction.response.send_message(embed=embed)
 
         except Exception as e:
-            print(f"Error in char_setup command: {str(e)}")
+            logger.exception("Error in char_setup command")
             await interaction.response.send_message(f'❌ An error occurred: {str(e)}')
 
 async def setup(bot: commands.Bot):
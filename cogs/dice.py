@@ -1,12 +1,25 @@
 """Dice management cog for the DSA Bot."""
 
+import logging
 import discord
 from discord.ext import commands
 from discord import app_commands
-from models.user import User
+from typing import Optional
+from models.user import ATTRIBUTES, ATTRIBUTE_NAMES
 from views.dice_throw import ThrowTypeView
-from utils.user_manager import get_users, set_users, save_all_users
-import random
+from utils.checks import check_odds
+from utils.dice import end_session, get_stream, start_session
+from utils.dice_expr import DiceExpressionError, compile_expression
+from utils.embeds import join_lines, no_character_embed
+from utils.stats import reset_session
+from utils.user_manager import get_user, load_guild
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUTE_CHOICES = [
+    app_commands.Choice(name=f"{attr} ({ATTRIBUTE_NAMES[attr]})", value=attr)
+    for attr in ATTRIBUTES
+]
 
 class DiceCog(commands.Cog):
     """Cog for handling dice-related commands."""
@@ -27,38 +40,26 @@ class DiceCog(commands.Cog):
             interaction (discord.Interaction): The interaction that triggered this command
         """
         try:
-            print(f"\n=== Dice Throw Command ===")
-            print(f"User: {interaction.user.name} ({interaction.user.id})")
-            users = get_users()
-            print(f"Current users in memory: {[f'{u.id} ({u.char_name})' for u in users]}")
+            logger.debug("Dice Throw Command by %s (%s)", interaction.user.name, interaction.user.id)
             
-            current_user = next((user for user in users if str(user.id) == str(interaction.user.id)), None)
+            await load_guild(interaction.guild_id)
+            current_user = get_user(interaction.guild_id, interaction.user.id)
             
             if current_user is None:
-                print(f"No character found for user {interaction.user.id}")
-                embed = discord.Embed(
-                    title="❌ No Character Found",
-                    description=f"No character found for {interaction.user.name}",
-                    color=discord.Color.red()
-                )
-                embed.add_field(
-                    name="How to create a character",
-                    value='Use `/char_setup` to create your character.',
-                    inline=False
-                )
-                await interaction.response.send_message(embed=embed)
+                logger.debug("No character found for user %s", interaction.user.id)
+                await interaction.response.send_message(embed=no_character_embed(interaction.user.name))
                 return
 
-            print(f"Found character: {current_user.char_name}")
+            logger.debug("Found character: %s", current_user.char_name)
             view = ThrowTypeView(current_user, is_dm=False)
             await interaction.response.send_message(
                 "Choose your throw type:",
                 view=view
             )
-            print("Sent throw type selection view to user")
+            logger.debug("Sent throw type selection view to user")
 
         except Exception as e:
-            print(f"Error in throw command: {str(e)}")
+            logger.exception("Error in throw command")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
             else:
@@ -76,39 +77,197 @@ class DiceCog(commands.Cog):
             debug_value (int): The value to use for the first two dice (1 or 20)
         """
         try:
-            print(f"\n=== Debug Dice Throw Command ===")
-            print(f"User: {interaction.user.name} ({interaction.user.id})")
-            print(f"Debug value: {debug_value}")
-            users = get_users()
-            print(f"Current users in memory: {[f'{u.id} ({u.char_name})' for u in users]}")
+            logger.debug("Debug Dice Throw Command by %s (%s)", interaction.user.name, interaction.user.id)
+            logger.debug("Debug value: %s", debug_value)
             
-            current_user = next((user for user in users if str(user.id) == str(interaction.user.id)), None)
+            await load_guild(interaction.guild_id)
+            current_user = get_user(interaction.guild_id, interaction.user.id)
             
             if current_user is None:
-                print(f"No character found for user {interaction.user.id}")
-                embed = discord.Embed(
-                    title="❌ No Character Found",
-                    description=f"No character found for {interaction.user.name}",
-                    color=discord.Color.red()
-                )
-                embed.add_field(
-                    name="How to create a character",
-                    value='Use `/char_setup` to create your character.',
-                    inline=False
-                )
-                await interaction.response.send_message(embed=embed)
+                logger.debug("No character found for user %s", interaction.user.id)
+                await interaction.response.send_message(embed=no_character_embed(interaction.user.name))
                 return
 
-            print(f"Found character: {current_user.char_name}")
+            logger.debug("Found character: %s", current_user.char_name)
             view = ThrowTypeView(current_user, debug=debug_value, is_dm=False)
             await interaction.response.send_message(
                 "Choose your throw type:",
                 view=view
             )
-            print("Sent debug throw type selection view to user")
+            logger.debug("Sent debug throw type selection view to user")
+
+        except Exception as e:
+            logger.exception("Error in throw_debug command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+    @app_commands.command(name="odds", description="Show the exact odds of an attribute check")
+    @app_commands.describe(
+        attribute1="First attribute",
+        attribute2="Second attribute (for a full throw)",
+        attribute3="Third attribute (for a full throw)",
+        modifier="Modifier added to every attribute",
+        party="Show the odds for every character in this server"
+    )
+    @app_commands.choices(attribute1=ATTRIBUTE_CHOICES, attribute2=ATTRIBUTE_CHOICES, attribute3=ATTRIBUTE_CHOICES)
+    async def odds_command(
+        self,
+        interaction: discord.Interaction,
+        attribute1: str,
+        attribute2: Optional[str] = None,
+        attribute3: Optional[str] = None,
+        modifier: int = 0,
+        party: bool = False
+    ):
+        """Show the exact odds of an attribute check.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this command
+            attribute1 (str): First attribute
+            attribute2 (Optional[str], optional): Second attribute. Defaults to None.
+            attribute3 (Optional[str], optional): Third attribute. Defaults to None.
+            modifier (int, optional): Modifier added to every attribute. Defaults to 0.
+            party (bool, optional): Show the odds for every character. Defaults to False.
+        """
+        try:
+            attributes = [attr for attr in (attribute1, attribute2, attribute3) if attr]
+            users = await load_guild(interaction.guild_id)
+            if not party:
+                current_user = get_user(interaction.guild_id, interaction.user.id)
+                users = [current_user] if current_user else []
+
+            if not users:
+                await interaction.response.send_message(embed=no_character_embed(interaction.user.name), ephemeral=True)
+                return
+
+            check_name = " / ".join(attributes)
+            if modifier:
+                check_name += f" ({modifier:+d})"
+            embed = discord.Embed(
+                title=f"📈 Odds: {check_name}",
+                color=discord.Color.blue()
+            )
+
+            lines = []
+            for user in sorted(users, key=lambda u: u.char_name):
+                values = [getattr(user, attr) for attr in attributes]
+                odds = check_odds(values, modifier)
+                line = f"**{user.char_name}** ({', '.join(map(str, values))}): {odds.success:.1%}"
+                if len(attributes) > 1:
+                    line += f" · 🎉 {odds.party_effect:.2%} · 💀 {odds.doom_effect:.2%}"
+                line += f" · Ø Diff {odds.expected_diff:.1f}"
+                lines.append(line)
+            embed.description, omitted = join_lines(lines)
+            if omitted:
+                embed.set_footer(text=f"… and {omitted} more")
+
+            if not party:
+                distribution = " · ".join(
+                    f"{total}: {probability:.1%}" for total, probability in odds.diff_distribution[:10]
+                )
+                embed.add_field(name="Total Difference", value=distribution, inline=False)
+
+            await interaction.response.send_message(embed=embed, ephemeral=not party)
+
+        except Exception as e:
+            logger.exception("Error in odds command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+    @app_commands.command(name="roll", description="Roll a dice expression, e.g. 3d20+2 or 2W6+ini")
+    @app_commands.describe(
+        expression="Dice expression, may use your character's attributes like MU or ini"
+    )
+    async def roll_command(self, interaction: discord.Interaction, expression: str):
+        """Roll a dice expression.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this command
+            expression (str): Dice expression, e.g. 3d20+2 or 2W6+ini
+        """
+        try:
+            try:
+                compiled = compile_expression(expression)
+            except DiceExpressionError as e:
+                await interaction.response.send_message(f"❌ Invalid expression: {str(e)}", ephemeral=True)
+                return
+
+            current_user = None
+            if compiled.uses_character:
+                await load_guild(interaction.guild_id)
+                current_user = get_user(interaction.guild_id, interaction.user.id)
+                if current_user is None:
+                    await interaction.response.send_message(embed=no_character_embed(interaction.user.name))
+                    return
+
+            try:
+                result = compiled.evaluate(get_stream(interaction.guild_id), current_user)
+            except DiceExpressionError as e:
+                await interaction.response.send_message(f"❌ {str(e)}", ephemeral=True)
+                return
+
+            name = current_user.char_name if current_user else interaction.user.display_name
+            embed = discord.Embed(
+                title=f"🎲 {compiled.source} - {name}",
+                color=discord.Color.blue()
+            )
+            lines = []
+            for label, rolls in result.details:
+                shown = ", ".join(map(str, rolls[:50]))
+                if len(rolls) > 50:
+                    shown += f", ... ({len(rolls) - 50} more)"
+                lines.append(f"{label}: {shown} = {sum(rolls)}")
+            description, omitted = join_lines(lines)
+            embed.description = description or None
+            if omitted:
+                embed.set_footer(text=f"… and {omitted} more")
+            embed.add_field(name="Total", value=str(result.total), inline=False)
+            await interaction.response.send_message(embed=embed)
+
+        except Exception as e:
+            logger.exception("Error in roll command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+    @app_commands.command(name="dice_session", description="Start or end a reproducible dice session")
+    @app_commands.describe(
+        seed="Seed of the session, random if omitted",
+        end="End the session and go back to normal dice"
+    )
+    async def dice_session_command(self, interaction: discord.Interaction, seed: Optional[str] = None, end: bool = False):
+        """Start or end a reproducible dice session in this server.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this command
+            seed (Optional[str], optional): Seed of the session. Defaults to None.
+            end (bool, optional): End the session instead. Defaults to False.
+        """
+        try:
+            if end:
+                end_session(interaction.guild_id)
+                await interaction.response.send_message("🎲 Dice session ended, rolls are random again.")
+                return
+
+            try:
+                seed = start_session(interaction.guild_id, seed)
+            except ValueError as e:
+                await interaction.response.send_message(f"❌ {str(e)}", ephemeral=True)
+                return
+            # Session statistics count from here
+            reset_session(interaction.guild_id)
+            await interaction.response.send_message(
+                f"🎲 Dice session started with seed `{seed}`. "
+                "Starting a session with the same seed replays the same rolls."
+            )
 
         except Exception as e:
-            print(f"Error in throw_debug command: {str(e)}")
+            logger.exception("Error in dice_session command")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
             else:
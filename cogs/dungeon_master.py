@@ -1,11 +1,21 @@
 """Dungeon master management cog for the DSA Bot."""
 
+import logging
 import discord
 from discord.ext import commands
 from discord import app_commands
+from typing import List, Optional
 from models.user import User
 from views.dungeon_master_roll import DungeonMasterRollView
-from utils.user_manager import get_users
+from cogs.dice import ATTRIBUTE_CHOICES
+from utils.checks import resolve_checks
+from utils.dice import DiceSource, get_stream
+from utils.embeds import NO_CHARACTERS_EMBED, join_lines
+from utils.history import record_checks
+from utils.stats import add_checks
+from utils.user_manager import load_guild
+
+logger = logging.getLogger(__name__)
 
 class DungeonMasterCog(commands.Cog):
     """Cog for handling dungeon master-related commands."""
@@ -22,37 +32,25 @@ class DungeonMasterCog(commands.Cog):
     async def dm_command(self, interaction: discord.Interaction):
         """Make a dungeon master roll."""
         try:
-            print(f"\n=== Dungeon Master Roll Command ===")
-            print(f"User: {interaction.user.name} ({interaction.user.id})")
-            users = get_users()
-            print(f"Current users in memory: {[f'{u.id} ({u.char_name})' for u in users]}")
+            logger.debug("Dungeon Master Roll Command by %s (%s)", interaction.user.name, interaction.user.id)
+            users = await load_guild(interaction.guild_id)
             
             if not users:
-                print("No characters found")
-                embed = discord.Embed(
-                    title="❌ No Characters Found",
-                    description="No characters have been created yet!",
-                    color=discord.Color.red()
-                )
-                embed.add_field(
-                    name="How to create a character",
-                    value='Use `/char_setup` to create a character.',
-                    inline=False
-                )
-                await interaction.response.send_message(embed=embed)
+                logger.debug("No characters found")
+                await interaction.response.send_message(embed=NO_CHARACTERS_EMBED)
                 return
 
-            print(f"Found {len(users)} characters")
+            logger.debug("Found %s characters", len(users))
             view = DungeonMasterRollView(users)
             await interaction.response.send_message(
                 "Select a character to roll for:",
                 view=view,
                 ephemeral=True
             )
-            print("Sent dungeon master roll view to user")
+            logger.debug("Sent dungeon master roll view to user")
 
         except Exception as e:
-            print(f"Error in dm command: {str(e)}")
+            logger.exception("Error in dm command")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
             else:
@@ -70,14 +68,12 @@ class DungeonMasterCog(commands.Cog):
             value (int): Debug value (1 for party effect, 20 for doom effect)
         """
         try:
-            print(f"\n=== Debug Dungeon Master Roll Command ===")
-            print(f"User: {interaction.user.name} ({interaction.user.id})")
-            print(f"Debug value: {value}")
-            users = get_users()
-            print(f"Current users in memory: {[f'{u.id} ({u.char_name})' for u in users]}")
+            logger.debug("Debug Dungeon Master Roll Command by %s (%s)", interaction.user.name, interaction.user.id)
+            logger.debug("Debug value: %s", value)
+            users = await load_guild(interaction.guild_id)
             
             if value not in [1, 20]:
-                print(f"Invalid debug value: {value}")
+                logger.debug("Invalid debug value: %s", value)
                 await interaction.response.send_message(
                     "Debug value must be either 1 (party effect) or 20 (doom effect)!",
                     ephemeral=True
@@ -85,36 +81,144 @@ class DungeonMasterCog(commands.Cog):
                 return
 
             if not users:
-                print("No characters found")
-                embed = discord.Embed(
-                    title="❌ No Characters Found",
-                    description="No characters have been created yet!",
-                    color=discord.Color.red()
-                )
-                embed.add_field(
-                    name="How to create a character",
-                    value='Use `/char_setup` to create a character.',
-                    inline=False
-                )
-                await interaction.response.send_message(embed=embed)
+                logger.debug("No characters found")
+                await interaction.response.send_message(embed=NO_CHARACTERS_EMBED)
                 return
 
-            print(f"Found {len(users)} characters")
+            logger.debug("Found %s characters", len(users))
             view = DungeonMasterRollView(users, debug=value)
             await interaction.response.send_message(
                 "Select a character to roll for:",
                 view=view,
                 ephemeral=True
             )
-            print("Sent debug dungeon master roll view to user")
+            logger.debug("Sent debug dungeon master roll view to user")
+
+        except Exception as e:
+            logger.exception("Error in dm_debug command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+    @app_commands.command(name="group_throw", description="Make a throw for every character at once")
+    @app_commands.describe(
+        attribute1="First attribute",
+        attribute2="Second attribute (for a full throw)",
+        attribute3="Third attribute (for a full throw)",
+        modifier="Modifier added to every attribute",
+        voice_only="Only roll for characters of members in your voice channel"
+    )
+    @app_commands.choices(attribute1=ATTRIBUTE_CHOICES, attribute2=ATTRIBUTE_CHOICES, attribute3=ATTRIBUTE_CHOICES)
+    async def group_throw_command(
+        self,
+        interaction: discord.Interaction,
+        attribute1: str,
+        attribute2: Optional[str] = None,
+        attribute3: Optional[str] = None,
+        modifier: int = 0,
+        voice_only: bool = False
+    ):
+        """Make a throw for every character at once.
+
+        All dice are rolled in one batch and the results are sent as a
+        single summary message.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this command
+            attribute1 (str): First attribute
+            attribute2 (Optional[str], optional): Second attribute. Defaults to None.
+            attribute3 (Optional[str], optional): Third attribute. Defaults to None.
+            modifier (int, optional): Modifier added to every attribute. Defaults to 0.
+            voice_only (bool, optional): Only roll for characters of members in the
+                user's voice channel. Defaults to False.
+        """
+        try:
+            attributes = [attr for attr in (attribute1, attribute2, attribute3) if attr]
+            users = await load_guild(interaction.guild_id)
+
+            if voice_only:
+                voice = getattr(interaction.user, 'voice', None)
+                if not voice or not voice.channel:
+                    await interaction.response.send_message(
+                        "You need to be in a voice channel to roll for its members!",
+                        ephemeral=True
+                    )
+                    return
+                member_ids = {str(member.id) for member in voice.channel.members}
+                users = [user for user in users if user.id in member_ids]
+
+            if not users:
+                await interaction.response.send_message(embed=NO_CHARACTERS_EMBED)
+                return
+
+            users = sorted(users, key=lambda u: u.char_name)
+            embed = self.group_throw_embed(interaction.guild_id, users, attributes, modifier,
+                                          get_stream(interaction.guild_id))
+            await interaction.response.send_message(embed=embed)
 
         except Exception as e:
-            print(f"Error in dm_debug command: {str(e)}")
+            logger.exception("Error in group_throw command")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
             else:
                 await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
 
+    @staticmethod
+    def group_throw_embed(guild_id, users: List[User], attributes: List[str], modifier: int,
+                          dice: DiceSource) -> discord.Embed:
+        """Roll a throw for every user and summarize the results.
+
+        All dice are rolled at once and the checks are resolved, recorded
+        and counted as one batch.
+
+        Args:
+            guild_id (str | int | None): Discord guild ID
+            users (List[User]): Users to roll for
+            attributes (List[str]): Attributes to check
+            modifier (int): Modifier added to every attribute
+            dice (DiceSource): Source of the rolls
+
+        Returns:
+            discord.Embed: Summary of all throws
+        """
+        rolls = dice.roll_many(20, len(users) * len(attributes))
+        checks = resolve_checks(rolls, [[getattr(user, attr) for attr in attributes] for user in users], modifier)
+        results = [(user.id, check) for user, check in zip(users, checks)]
+        record_checks(guild_id, attributes, modifier, results)
+        add_checks(guild_id, attributes, results)
+
+        lines = []
+        for user, check in zip(users, checks):
+            if check.party_effect:
+                mark = "🎉"
+            elif check.doom_effect:
+                mark = "💀"
+            elif check.all_success:
+                mark = "✅"
+            else:
+                mark = "❌"
+            line = f"{mark} **{user.char_name}**: {' / '.join(map(str, check.rolls))}"
+            if check.total_diff:
+                line += f" (Diff: {check.total_diff:+d})"
+            lines.append(line)
+        description, omitted = join_lines(lines)
+
+        check_name = " / ".join(attributes)
+        if modifier:
+            check_name += f" ({modifier:+d})"
+        embed = discord.Embed(
+            title=f"🎲 Group Throw: {check_name}",
+            description=description,
+            color=discord.Color.blue()
+        )
+        successes = sum(check.all_success for check in checks)
+        footer = f"{successes}/{len(users)} successful"
+        if omitted:
+            footer += f" · … and {omitted} more"
+        embed.set_footer(text=footer)
+        return embed
+
 async def setup(bot: commands.Bot):
     """Set up the dungeon master cog.
 
@@ -0,0 +1,147 @@
+"""Roll history cog for the DSA Bot."""
+
+import io
+import logging
+from typing import Optional
+import discord
+from discord.ext import commands
+from discord import app_commands
+from utils.embeds import no_character_embed
+from utils.history import (
+    FLAG_DEBUG, FLAG_DOOM, FLAG_PARTY, FLAG_SUCCESS, KIND_INITIATIVE, Roll, export_history, recent_rolls
+)
+from utils.user_manager import get_user, load_guild
+
+logger = logging.getLogger(__name__)
+
+def roll_line(roll: Roll) -> str:
+    """Summarize a recorded roll in one line.
+
+    Args:
+        roll (Roll): The roll
+
+    Returns:
+        str: Time, kind, dice and result of the roll
+    """
+    if roll.kind == KIND_INITIATIVE:
+        text = f"⚔️ Initiative: 1d6 = {roll.rolls[0]}"
+        if roll.modifier:
+            text += f" ({roll.modifier:+d})"
+        return f"<t:{roll.time}:R> {text} → {roll.result}"
+
+    if roll.flags & FLAG_PARTY:
+        mark = "🎉"
+    elif roll.flags & FLAG_DOOM:
+        mark = "💀"
+    elif roll.flags & FLAG_SUCCESS:
+        mark = "✅"
+    else:
+        mark = "❌"
+    text = f"{mark} {' / '.join(roll.attributes)}"
+    if roll.modifier:
+        text += f" ({roll.modifier:+d})"
+    text += f": {' / '.join(map(str, roll.rolls))}"
+    if roll.result:
+        text += f" (Diff: {roll.result:+d})"
+    if roll.flags & FLAG_DEBUG:
+        text += " [debug]"
+    return f"<t:{roll.time}:R> {text}"
+
+class HistoryCog(commands.Cog):
+    """Cog for handling roll history commands."""
+
+    def __init__(self, bot: commands.Bot):
+        """Initialize the history cog.
+
+        Args:
+            bot (commands.Bot): The bot instance
+        """
+        self.bot = bot
+
+    @app_commands.command(name="history", description="Show the latest rolls of a character")
+    @app_commands.describe(
+        member="Whose rolls to show, defaults to you",
+        count="Number of rolls to show"
+    )
+    async def history_command(self, interaction: discord.Interaction,
+                              member: Optional[discord.Member] = None,
+                              count: app_commands.Range[int, 1, 25] = 10):
+        """Show the latest rolls of a character.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this command
+            member (Optional[discord.Member], optional): Whose rolls to show. Defaults to the user.
+            count (int, optional): Number of rolls to show. Defaults to 10.
+        """
+        try:
+            member = member or interaction.user
+            await load_guild(interaction.guild_id)
+            current_user = get_user(interaction.guild_id, member.id)
+            if current_user is None:
+                await interaction.response.send_message(embed=no_character_embed(member.name), ephemeral=True)
+                return
+
+            rolls = await recent_rolls(interaction.guild_id, current_user.id, count)
+            embed = discord.Embed(
+                title=f"📜 Roll History: {current_user.char_name}",
+                description="\n".join(roll_line(roll) for roll in rolls) or "No rolls yet!",
+                color=discord.Color.blue()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            logger.exception("Error in history command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+    @app_commands.command(name="history_export", description="Export all rolls of this server as a CSV file")
+    @app_commands.describe(member="Only export the rolls of this member's character")
+    async def history_export_command(self, interaction: discord.Interaction,
+                                     member: Optional[discord.Member] = None):
+        """Export the rolls of the guild as a gzip compressed CSV file.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this command
+            member (Optional[discord.Member], optional): Only export this member's rolls.
+                Defaults to None.
+        """
+        try:
+            # Reading a large archive takes a while
+            await interaction.response.defer(ephemeral=True)
+            users = await load_guild(interaction.guild_id)
+            names = {user.id: user.char_name for user in users}
+            data, count = await export_history(interaction.guild_id, names,
+                                               str(member.id) if member else None)
+
+            limit = (interaction.guild.filesize_limit if interaction.guild
+                     else discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES)
+            if len(data) > limit:
+                await interaction.followup.send(
+                    f"The export of {count} rolls is too large to upload ({len(data) // 1024} KiB), "
+                    "export a single member's rolls instead!",
+                    ephemeral=True
+                )
+                return
+
+            await interaction.followup.send(
+                f"Exported {count} rolls.",
+                file=discord.File(io.BytesIO(data), filename=f"rolls_{interaction.guild_id}.csv.gz"),
+                ephemeral=True
+            )
+
+        except Exception as e:
+            logger.exception("Error in history_export command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+async def setup(bot: commands.Bot):
+    """Set up the history cog.
+
+    Args:
+        bot (commands.Bot): The bot instance
+    """
+    await bot.add_cog(HistoryCog(bot))
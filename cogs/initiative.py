@@ -1,61 +1,77 @@
 """Initiative management cog for the DSA Bot."""
 
+import logging
+from functools import partial
 import discord
 from discord.ext import commands
 from discord import app_commands
+from typing import Any, Callable, List, Optional
 from models.user import User
-from utils.user_manager import get_users, set_users, save_all_users
-import random
+from utils.dice import get_stream
+from utils.embeds import NO_INITIATIVE_EMBED, initiative_order_embed, no_character_embed
+from utils.history import record_initiative
+from utils.initiative import Combat
+from utils.user_manager import (
+    get_user, upsert_user, load_guild, get_initiative, reset_initiative,
+    get_combat, start_combat, end_combat, save_combat, guild_key
+)
+from views.persistent import (
+    ButtonTemplate, PersistentView, action_of, build_layout, decode_id, encode_id, load_character
+)
+from views.initiative_tracker import InitiativeTrackerView, combat_embed, refresh_tracker
 
-class InitiativeView(discord.ui.View):
+logger = logging.getLogger(__name__)
+
+# Buttons of the initiative prompt, declared once and built by every view
+INITIATIVE_LAYOUT = build_layout([
+    ButtonTemplate("mod_minus", "-1", discord.ButtonStyle.danger, 0, "modifier_callback"),
+    ButtonTemplate("mod_plus", "+1", discord.ButtonStyle.success, 0, "modifier_callback"),
+    ButtonTemplate("confirm_throw", "Roll Initiative", discord.ButtonStyle.primary, 0, "confirm_callback"),
+])
+
+class InitiativeView(PersistentView, kind='i'):
     """View for handling initiative rolls."""
 
-    def __init__(self, user: User, timeout: int = 180):
+    def __init__(self, user: User, timeout: int = 180, persistent: Optional[bool] = None):
         """Initialize the initiative view.
 
         Args:
             user (User): The user making the throw
             timeout (int, optional): View timeout in seconds. Defaults to 180.
+            persistent (Optional[bool], optional): Keep the state in the custom_ids.
+                Defaults to PERSISTENT_VIEWS.
         """
-        super().__init__(timeout=timeout)
+        super().__init__(timeout=timeout, persistent=persistent)
         self.user = user
         self.modifier = 0
-        self.add_modifier_buttons()
-        self.add_confirm_button()
-
-    def add_modifier_buttons(self) -> None:
-        """Add buttons for modifier adjustment."""
-        print("Adding modifier buttons...")
-        minus_button = discord.ui.Button(
-            label="-1",
-            custom_id="mod_minus",
-            style=discord.ButtonStyle.danger,
-            row=0
-        )
-        plus_button = discord.ui.Button(
-            label="+1",
-            custom_id="mod_plus",
-            style=discord.ButtonStyle.success,
-            row=0
-        )
-        minus_button.callback = self.modifier_callback
-        plus_button.callback = self.modifier_callback
-        self.add_item(minus_button)
-        self.add_item(plus_button)
-        print("Modifier buttons added")
-
-    def add_confirm_button(self) -> None:
-        """Add the confirm button."""
-        print("Adding confirm button...")
-        confirm_button = discord.ui.Button(
-            label="Roll Initiative",
-            custom_id="confirm_throw",
-            style=discord.ButtonStyle.primary,
-            row=0
-        )
-        confirm_button.callback = self.confirm_callback
-        self.add_item(confirm_button)
-        print("Confirm button added")
+        self.add_layout(INITIATIVE_LAYOUT)
+
+    def state_fields(self) -> List[str]:
+        """Get the view's state for its custom_ids.
+
+        Returns:
+            List[str]: Owner and modifier
+        """
+        return [encode_id(self.user.id), str(self.modifier)]
+
+    @classmethod
+    async def from_state(cls, interaction: discord.Interaction, fields: List[str]) -> Optional['InitiativeView']:
+        """Rebuild the view from the state in a clicked custom_id.
+
+        Args:
+            interaction (discord.Interaction): The click
+            fields (List[str]): Owner and modifier
+
+        Returns:
+            Optional[InitiativeView]: The view or None if the character is gone
+        """
+        owner, modifier = fields
+        user = await load_character(interaction.guild_id, decode_id(owner))
+        if user is None:
+            return None
+        view = cls(user, persistent=True)
+        view.modifier = int(modifier)
+        return view
 
     async def modifier_callback(self, interaction: discord.Interaction) -> None:
         """Handle modifier button clicks.
@@ -63,30 +79,28 @@ class InitiativeView(discord.ui.View):
         Args:
             interaction (discord.Interaction): The interaction that triggered this callback
         """
-        print(f"\n=== Modifier Adjustment ===")
-        print(f"User: {interaction.user.name} ({interaction.user.id})")
-        print(f"Expected user: {self.user.name} ({self.user.id})")
+        logger.debug("Modifier Adjustment by %s (%s)", interaction.user.name, interaction.user.id)
         
         if str(interaction.user.id) != str(self.user.id):
-            print("Wrong user tried to use the throw")
+            logger.debug("%s tried to use the throw of %s", interaction.user.id, self.user.id)
             await interaction.response.send_message("This is not your throw!", ephemeral=True)
             return
 
-        button = interaction.data.get("custom_id")
+        button = action_of(interaction.data.get("custom_id", ""))
         if not button:
-            print("Could not identify button")
+            logger.debug("Could not identify button")
             await interaction.response.send_message("Error: Could not identify the button!", ephemeral=True)
             return
 
         change = -1 if button == "mod_minus" else 1
         self.modifier += change
-        print(f"New modifier value: {self.modifier}")
+        logger.debug("New modifier value: %s", self.modifier)
 
         # Update message to show current modifier
-        await interaction.response.edit_message(
-            content=f"Current modifier: {self.modifier:+d}",
-            view=self
-        )
+        await self.show(interaction, lambda: {
+            "content": f"Current modifier: {self.modifier:+d}",
+            "view": self
+        })
 
     async def confirm_callback(self, interaction: discord.Interaction) -> None:
         """Handle confirm button clicks.
@@ -95,20 +109,22 @@ class InitiativeView(discord.ui.View):
             interaction (discord.Interaction): The interaction that triggered this callback
         """
         try:
-            print(f"\n=== Confirming Initiative Roll ===")
-            print(f"User: {interaction.user.name} ({interaction.user.id})")
-            print(f"Expected user: {self.user.name} ({self.user.id})")
-            print(f"Modifier: {self.modifier}")
+            logger.debug("Confirming Initiative Roll by %s (%s)", interaction.user.name, interaction.user.id)
+            logger.debug("Modifier: %s", self.modifier)
             
             if str(interaction.user.id) != str(self.user.id):
-                print("Wrong user tried to use the throw")
+                logger.debug("%s tried to use the throw of %s", interaction.user.id, self.user.id)
                 await interaction.response.send_message("This is not your throw!", ephemeral=True)
                 return
 
+            # Pending modifier edits must not overwrite the result
+            await self.edits.close()
+
             # Make the roll
-            roll = random.randint(1, 6)
+            roll = get_stream(interaction.guild_id).roll(6)
             total = self.user.ini + roll + self.modifier
             self.user.current_ini = total
+            record_initiative(interaction.guild_id, self.user.id, roll, self.modifier, total)
 
             # Create result embed
             embed = discord.Embed(
@@ -122,12 +138,8 @@ class InitiativeView(discord.ui.View):
                 embed.add_field(name="Modifier", value=f"{self.modifier:+d}", inline=True)
             embed.add_field(name="Total", value=str(total), inline=True)
 
-            # Update user in the list
-            users = get_users()
-            users = [user for user in users if str(user.id) != str(self.user.id)]
-            users.append(self.user)
-            set_users(users)
-            save_all_users()
+            # Update user in the index, this also schedules the save
+            upsert_user(self.user)
 
             # Send new message with results and remove the view
             await interaction.response.edit_message(
@@ -136,8 +148,13 @@ class InitiativeView(discord.ui.View):
                 view=None
             )
 
+            # Show the new roll in the tracker of a running combat
+            combat = get_combat(interaction.guild_id)
+            if combat:
+                await refresh_tracker(interaction.client, combat)
+
         except Exception as e:
-            print(f"Error in confirm callback: {str(e)}")
+            logger.exception("Error in confirm callback")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f"❌ An error occurred: {str(e)}", ephemeral=True)
             else:
@@ -153,44 +170,31 @@ class InitiativeCog(commands.Cog):
             bot (commands.Bot): The bot instance
         """
         self.bot = bot
-        self.initiative_order = []
 
     @app_commands.command(name="init", description="Roll for initiative")
     async def init_command(self, interaction: discord.Interaction):
         """Roll for initiative."""
         try:
-            print(f"\n=== Initiative Roll Command ===")
-            print(f"User: {interaction.user.name} ({interaction.user.id})")
-            users = get_users()
-            print(f"Current users in memory: {[f'{u.id} ({u.char_name})' for u in users]}")
+            logger.debug("Initiative Roll Command by %s (%s)", interaction.user.name, interaction.user.id)
             
-            current_user = next((user for user in users if str(user.id) == str(interaction.user.id)), None)
+            await load_guild(interaction.guild_id)
+            current_user = get_user(interaction.guild_id, interaction.user.id)
             
             if current_user is None:
-                print(f"No character found for user {interaction.user.id}")
-                embed = discord.Embed(
-                    title="❌ No Character Found",
-                    description=f"No character found for {interaction.user.name}",
-                    color=discord.Color.red()
-                )
-                embed.add_field(
-                    name="How to create a character",
-                    value='Use `/char_setup` to create your character.',
-                    inline=False
-                )
-                await interaction.response.send_message(embed=embed)
+                logger.debug("No character found for user %s", interaction.user.id)
+                await interaction.response.send_message(embed=no_character_embed(interaction.user.name))
                 return
 
-            print(f"Found character: {current_user.char_name}")
+            logger.debug("Found character: %s", current_user.char_name)
             view = InitiativeView(current_user)
             await interaction.response.send_message(
                 "Adjust your initiative modifier and click 'Roll Initiative':",
                 view=view
             )
-            print("Sent initiative roll view to user")
+            logger.debug("Sent initiative roll view to user")
 
         except Exception as e:
-            print(f"Error in init command: {str(e)}")
+            logger.exception("Error in init command")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
             else:
@@ -200,38 +204,19 @@ class InitiativeCog(commands.Cog):
     async def init_order_command(self, interaction: discord.Interaction):
         """Show current initiative order."""
         try:
-            print(f"\n=== Initiative Order Command ===")
-            users = get_users()
-            print(f"Current users in memory: {[f'{u.id} ({u.char_name})' for u in users]}")
+            logger.debug("Initiative Order Command")
+            await load_guild(interaction.guild_id)
+            tracker = get_initiative(interaction.guild_id)
             
-            # Sort users by current initiative
-            sorted_users = sorted(users, key=lambda x: x.current_ini, reverse=True)
-            
-            if not sorted_users:
-                embed = discord.Embed(
-                    title="❌ No Initiative Rolls",
-                    description="No one has rolled for initiative yet!",
-                    color=discord.Color.red()
-                )
-                await interaction.response.send_message(embed=embed)
+            if not tracker:
+                await interaction.response.send_message(embed=NO_INITIATIVE_EMBED)
                 return
 
-            embed = discord.Embed(
-                title="📋 Initiative Order",
-                color=discord.Color.blue()
-            )
-            
-            for i, user in enumerate(sorted_users, 1):
-                embed.add_field(
-                    name=f"{i}. {user.char_name}",
-                    value=f"Initiative: {user.current_ini}",
-                    inline=False
-                )
-            
-            await interaction.response.send_message(embed=embed)
+            await interaction.response.send_message(
+                embed=initiative_order_embed(guild_key(interaction.guild_id), tracker))
 
         except Exception as e:
-            print(f"Error in init_order command: {str(e)}")
+            logger.exception("Error in init_order command")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
             else:
@@ -241,26 +226,195 @@ class InitiativeCog(commands.Cog):
     async def init_reset_command(self, interaction: discord.Interaction):
         """Reset all initiative rolls."""
         try:
-            print(f"\n=== Initiative Reset Command ===")
-            users = get_users()
-            print(f"Current users in memory: {[f'{u.id} ({u.char_name})' for u in users]}")
-            
-            # Reset all current initiative values
-            for user in users:
-                user.current_ini = 0
+            logger.debug("Initiative Reset Command")
+            await load_guild(interaction.guild_id)
             
-            set_users(users)
-            save_all_users()
+            # Closing the tracker takes a few requests
+            await interaction.response.defer()
+            # Reset all current initiative values, this also schedules the save
+            await self.finish_combat(interaction.guild_id)
+            reset_initiative(interaction.guild_id)
             
             embed = discord.Embed(
                 title="🔄 Initiative Reset",
-                description="All initiative rolls have been reset!",
+                description="All initiative rolls in this server have been reset!",
                 color=discord.Color.green()
             )
-            await interaction.response.send_message(embed=embed)
+            await interaction.followup.send(embed=embed)
+
+        except Exception as e:
+            logger.exception("Error in init_reset command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+    async def post_tracker(self, interaction: discord.Interaction, combat: Combat) -> None:
+        """Send a combat's tracker message as the response and pin it.
+
+        Args:
+            interaction (discord.Interaction): The interaction to respond to,
+                possibly deferred
+            combat (Combat): The running combat
+        """
+        if interaction.response.is_done():
+            message = await interaction.followup.send(embed=combat_embed(combat), view=InitiativeTrackerView(),
+                                                      wait=True)
+        else:
+            await interaction.response.send_message(embed=combat_embed(combat), view=InitiativeTrackerView())
+            message = await interaction.original_response()
+        await self.pin_tracker(interaction.guild_id, combat, message)
+
+    async def pin_tracker(self, guild_id, combat: Combat, message: discord.Message) -> None:
+        """Make a message the tracker of a combat and pin it.
+
+        Args:
+            guild_id (str | int | None): Discord guild ID
+            combat (Combat): The running combat
+            message (discord.Message): The tracker message
+        """
+        combat.channel_id = message.channel.id
+        combat.message_id = message.id
+        try:
+            await message.pin()
+        except discord.HTTPException as e:
+            logger.debug("Could not pin tracker message: %s", e)
+        await save_combat(guild_id)
+
+    async def finish_combat(self, guild_id) -> Optional[Combat]:
+        """End a guild's combat and close its tracker message.
+
+        Args:
+            guild_id (str | int | None): Discord guild ID
+
+        Returns:
+            Optional[Combat]: The ended combat or None if there was none
+        """
+        combat = end_combat(guild_id)
+        if combat is None:
+            return None
+        await save_combat(guild_id)
+        if combat.channel_id is not None and combat.message_id is not None:
+            message = self.bot.get_partial_messageable(combat.channel_id).get_partial_message(combat.message_id)
+            embed = combat_embed(combat)
+            embed.title = f"🏁 Combat ended after {combat.round} round{'s' if combat.round > 1 else ''}"
+            embed.set_footer(text=None)
+            try:
+                await message.edit(embed=embed, view=None)
+                await message.unpin()
+            except discord.HTTPException as e:
+                logger.debug("Could not close tracker message: %s", e)
+        return combat
+
+    async def combat_action(self, interaction: discord.Interaction, action: Callable[[Combat], Any],
+                            failed: Optional[str] = None) -> None:
+        """Apply a turn action to the running combat and update its tracker message.
+
+        The interaction is deferred first, so a slow message edit or save
+        cannot miss Discord's response deadline.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered the action
+            action (Callable[[Combat], Any]): Changes the combat, e.g. Combat.next
+            failed (Optional[str], optional): Message sent instead if the action
+                returns False. Defaults to None.
+        """
+        try:
+            await interaction.response.defer(ephemeral=True)
+            await load_guild(interaction.guild_id)
+            combat = get_combat(interaction.guild_id)
+            if combat is None:
+                await interaction.followup.send(
+                    "No combat is running! Use `/init_start` to start one.",
+                    ephemeral=True
+                )
+                return
+
+            if action(combat) is False and failed is not None:
+                await interaction.followup.send(failed, ephemeral=True)
+                return
+
+            if await refresh_tracker(self.bot, combat):
+                await save_combat(interaction.guild_id)
+            else:
+                # The tracker message is gone, post a new one, the response is private
+                message = await interaction.channel.send(embed=combat_embed(combat), view=InitiativeTrackerView())
+                await self.pin_tracker(interaction.guild_id, combat, message)
+
+            current_user = combat.current_user()
+            turn = f"{current_user.char_name}'s turn" if current_user else "No one's turn"
+            await interaction.followup.send(f"⚔️ Round {combat.round}: {turn}", ephemeral=True)
+
+        except Exception as e:
+            logger.exception("Error in combat action")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+    @app_commands.command(name="init_start", description="Start a combat in initiative order")
+    async def init_start_command(self, interaction: discord.Interaction):
+        """Start a combat and post its tracker message."""
+        try:
+            logger.debug("Initiative Start Command")
+            await load_guild(interaction.guild_id)
+            
+            if not get_initiative(interaction.guild_id):
+                await interaction.response.send_message(embed=NO_INITIATIVE_EMBED)
+                return
+
+            # Closing the previous tracker takes a few requests
+            await interaction.response.defer()
+            await self.finish_combat(interaction.guild_id)
+            combat = start_combat(interaction.guild_id)
+            await self.post_tracker(interaction, combat)
+
+        except Exception as e:
+            logger.exception("Error in init_start command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+    @app_commands.command(name="init_next", description="End the current turn")
+    async def init_next_command(self, interaction: discord.Interaction):
+        """End the current turn."""
+        await self.combat_action(interaction, Combat.next)
+
+    @app_commands.command(name="init_prev", description="Go back to the previous turn")
+    async def init_prev_command(self, interaction: discord.Interaction):
+        """Go back to the previous turn."""
+        await self.combat_action(interaction, Combat.prev)
+
+    @app_commands.command(name="init_delay", description="Delay the current character's action")
+    async def init_delay_command(self, interaction: discord.Interaction):
+        """Delay the current character's action."""
+        await self.combat_action(interaction, Combat.delay)
+
+    @app_commands.command(name="init_ready", description="Act now after delaying your action")
+    async def init_ready_command(self, interaction: discord.Interaction):
+        """Let the user's delayed character act now."""
+        await self.combat_action(interaction, partial(Combat.ready, user_id=str(interaction.user.id)),
+                                 "Your character has not delayed its action!")
+
+    @app_commands.command(name="init_end", description="End the running combat")
+    async def init_end_command(self, interaction: discord.Interaction):
+        """End the running combat."""
+        try:
+            logger.debug("Initiative End Command")
+            await load_guild(interaction.guild_id)
+            if get_combat(interaction.guild_id) is None:
+                await interaction.response.send_message("No combat is running!", ephemeral=True)
+                return
+            # Closing the tracker takes a few requests
+            await interaction.response.defer()
+            combat = await self.finish_combat(interaction.guild_id)
+            await interaction.followup.send(
+                f"🏁 Combat ended after {combat.round} round{'s' if combat.round > 1 else ''}."
+            )
 
         except Exception as e:
-            print(f"Error in init_reset command: {str(e)}")
+            logger.exception("Error in init_end command")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
             else:
@@ -272,4 +426,6 @@ async def setup(bot: commands.Bot):
     Args:
         bot (commands.Bot): The bot instance
     """
+    # Tracker buttons act on the guild's combat, so they keep working after a restart
+    bot.add_view(InitiativeTrackerView())
     await bot.add_cog(InitiativeCog(bot)) 
\ No newline at end of file
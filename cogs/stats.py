@@ -0,0 +1,124 @@
+"""Dice statistics cog for the DSA Bot."""
+
+import logging
+from typing import Optional
+import discord
+from discord.ext import commands
+from discord import app_commands
+from models.user import ATTRIBUTES, ATTRIBUTE_NAMES
+from utils.embeds import no_character_embed
+from utils.stats import CheckStats, D20_MEAN, character_stats, guild_stats, load_stats, session_stats
+from utils.user_manager import get_user, load_guild
+
+logger = logging.getLogger(__name__)
+
+# Standard errors of the average d20 from a fair die's that count as cursed or blessed
+LUCK_THRESHOLD = 2.0
+
+def stats_embed(title: str, stats: CheckStats) -> discord.Embed:
+    """Create the embed showing check statistics.
+
+    Args:
+        title (str): Title of the embed
+        stats (CheckStats): The statistics
+
+    Returns:
+        discord.Embed: Embed with success rates, effects and average rolls
+    """
+    if not stats.checks:
+        return discord.Embed(title=title, description="No checks rolled yet!", color=discord.Color.blue())
+
+    # High rolls fail checks in DSA
+    luck = stats.luck()
+    if luck >= LUCK_THRESHOLD:
+        verdict, color = "💀 These dice are cursed!", discord.Color.red()
+    elif luck <= -LUCK_THRESHOLD:
+        verdict, color = "🍀 These dice are blessed!", discord.Color.green()
+    else:
+        verdict, color = "🎲 These dice look fair.", discord.Color.blue()
+
+    embed = discord.Embed(title=title, description=verdict, color=color)
+    embed.add_field(name="Checks", value=str(stats.checks), inline=True)
+    embed.add_field(name="Success Rate", value=f"{stats.success_rate:.1%}", inline=True)
+    embed.add_field(name="🎉 / 💀", value=f"{stats.party_effects} / {stats.doom_effects}", inline=True)
+    embed.add_field(
+        name="Average d20",
+        value=f"{stats.d20.mean:.2f} ± {stats.d20.stddev:.2f} (fair: {D20_MEAN})",
+        inline=True
+    )
+    embed.add_field(
+        name="Average Difference",
+        value=f"{stats.diff.mean:+.2f} ± {stats.diff.stddev:.2f}",
+        inline=True
+    )
+    lines = []
+    for attr in ATTRIBUTES:
+        counts = stats.attributes.get(attr)
+        if counts:
+            rolls, passed = counts
+            lines.append(f"{attr} ({ATTRIBUTE_NAMES[attr]}): {passed}/{rolls} ({passed / rolls:.0%})")
+    if lines:
+        embed.add_field(name="Passed Rolls per Attribute", value="\n".join(lines), inline=False)
+    return embed
+
+class StatsCog(commands.Cog):
+    """Cog for handling dice statistics commands."""
+
+    def __init__(self, bot: commands.Bot):
+        """Initialize the stats cog.
+
+        Args:
+            bot (commands.Bot): The bot instance
+        """
+        self.bot = bot
+
+    @app_commands.command(name="stats", description="Show how lucky the dice have been")
+    @app_commands.describe(
+        scope="Whose checks to count",
+        member="Whose character to show for the character scope, defaults to you"
+    )
+    @app_commands.choices(scope=[
+        app_commands.Choice(name="Character", value="character"),
+        app_commands.Choice(name="Server", value="guild"),
+        app_commands.Choice(name="Session (since /dice_session)", value="session"),
+    ])
+    async def stats_command(self, interaction: discord.Interaction, scope: str = "character",
+                            member: Optional[discord.Member] = None):
+        """Show the check statistics of a character, the guild or the session.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this command
+            scope (str, optional): character, guild or session. Defaults to "character".
+            member (Optional[discord.Member], optional): Whose character to show. Defaults to the user.
+        """
+        try:
+            await load_stats(interaction.guild_id)
+            if scope == "guild":
+                embed = stats_embed("📈 Dice Stats: Server", guild_stats(interaction.guild_id))
+            elif scope == "session":
+                embed = stats_embed("📈 Dice Stats: Session", session_stats(interaction.guild_id))
+            else:
+                member = member or interaction.user
+                await load_guild(interaction.guild_id)
+                current_user = get_user(interaction.guild_id, member.id)
+                if current_user is None:
+                    await interaction.response.send_message(embed=no_character_embed(member.name), ephemeral=True)
+                    return
+                embed = stats_embed(f"📈 Dice Stats: {current_user.char_name}",
+                                    character_stats(interaction.guild_id, current_user.id))
+            await interaction.response.send_message(embed=embed)
+
+        except Exception as e:
+            logger.exception("Error in stats command")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f'❌ An error occurred: {str(e)}', ephemeral=True)
+            else:
+                await interaction.followup.send(f'❌ An error occurred: {str(e)}', ephemeral=True)
+
+async def setup(bot: commands.Bot):
+    """Set up the stats cog.
+
+    Args:
+        bot (commands.Bot): The bot instance
+    """
+    await bot.add_cog(StatsCog(bot))
@@ -13,5 +13,34 @@ COMMAND_PREFIX = '/'
 # File paths
 INI_FILE_PATH = 'user.txt'
 
+# Storage configuration
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'file')  # 'file' or 'sqlite'
+SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH', 'dsa_bot.db')
+
+# Persistence configuration
+SAVE_INTERVAL = 5  # seconds between background saves
+JOURNAL_COMPACT_SIZE = 256 * 1024  # bytes of journal before it is folded into a snapshot
+HISTORY_SIZE = 50  # latest rolls per character kept in memory
+HISTORY_FLUSH_INTERVAL = 30  # seconds between appends to the roll archives
+
+# Dice configuration
+DICE_MODE = os.getenv('DICE_MODE', 'random')  # 'random' or 'crypto'
+DICE_SEED = os.getenv('DICE_SEED')  # seeds every guild's dice when set, e.g. for testing
+DICE_BUFFER_SIZE = 1024  # pre-generated d6 and d20 rolls per guild
+
+# Logging configuration
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')  # per-module levels, e.g. 'cogs=DEBUG,discord=WARNING'
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' or 'json'
+
+# Metrics configuration
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 disables the /metrics endpoint
+
 # Discord configuration
-DEFAULT_TIMEOUT = 180  # seconds 
\ No newline at end of file
+DEFAULT_TIMEOUT = 180  # seconds
+EDIT_WINDOW = 0.5  # seconds to merge button clicks into one message edit 
+SOUND_INTERVAL = 1.0  # seconds between soundboard sounds in one voice channel
+VOICE_IDLE_TIMEOUT = int(os.getenv('VOICE_IDLE_TIMEOUT', '900'))  # seconds before leaving an unused voice channel, 0 stays
+# Keep prompt state in the buttons' custom_ids, prompts then never time out and survive restarts
+PERSISTENT_VIEWS = os.getenv('PERSISTENT_VIEWS', '').lower() in ('1', 'true', 'yes')
\ No newline at end of file
@@ -1,36 +1,39 @@
 """Main entry point for the DSA Bot."""
 
+import logging
 import discord
 from discord.ext import commands
 import asyncio
-from config import BOT_TOKEN, COMMAND_PREFIX, DEFAULT_TIMEOUT
-from utils.user_manager import load_all_users
+from config import BOT_TOKEN, COMMAND_PREFIX, METRICS_HOST, METRICS_PORT
+from utils.history import start_history, stop_history
+from utils.instrumentation import InstrumentedTree, install_instrumentation
+from utils.logging_setup import setup_logging, stop_logging
+from utils.metrics import start_metrics_server
+from utils.stats import start_stats, stop_stats
+from utils.user_manager import load_guild, start_persistence, stop_persistence
+from utils.voice_manager import join_channel, leave_guild, start_eviction, stop_eviction
+from views.persistent import PromptRouter
+
+logger = logging.getLogger(__name__)
 
 # Initialize bot with intents
 intents = discord.Intents.default()
 intents.message_content = True
 intents.voice_states = True
 
-bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents, tree_cls=InstrumentedTree)
 
 @bot.event
 async def on_ready():
     """Called when the bot is ready."""
-    print(f'Logged in as {bot.user.name} ({bot.user.id})')
-    print('------')
-    
-    # Load users from file
-    loaded_users = load_all_users()
-    print(f"Loaded {len(loaded_users)} users from file:")
-    for user in loaded_users:
-        print(f"- {user.name} ({user.id}): {user.char_name}")
+    logger.info('Logged in as %s (%s)', bot.user.name, bot.user.id)
     
     # Sync commands
     try:
         synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        print(f"Failed to sync commands: {e}")
+        logger.info("Synced %d command(s)", len(synced))
+    except Exception:
+        logger.exception("Failed to sync commands")
 
 @bot.tree.command(name="sync", description="Sync bot commands")
 async def sync(interaction: discord.Interaction):
@@ -47,13 +50,13 @@ async def sync(interaction: discord.Interaction):
 
 @bot.tree.command(name="join", description="Join your current voice channel")
 async def join(interaction: discord.Interaction):
-    """Join the user's voice channel."""
+    """Join the user's voice channel, moving there if already connected in this guild."""
     if not interaction.user.voice:
         await interaction.response.send_message("You need to be in a voice channel first!", ephemeral=True)
         return
     
     try:
-        await interaction.user.voice.channel.connect()
+        await join_channel(interaction.user.voice.channel)
         await interaction.response.send_message(f"Joined {interaction.user.voice.channel.name}", ephemeral=True)
     except Exception as e:
         await interaction.response.send_message(f"Failed to join voice channel: {e}", ephemeral=True)
@@ -61,38 +64,73 @@ async def join(interaction: discord.Interaction):
 @bot.tree.command(name="leave", description="Leave the current voice channel")
 async def leave(interaction: discord.Interaction):
     """Leave the current voice channel."""
-    if not interaction.guild.voice_client:
-        await interaction.response.send_message("I'm not in a voice channel!", ephemeral=True)
-        return
-    
     try:
-        await interaction.guild.voice_client.disconnect()
+        if not await leave_guild(interaction.guild):
+            await interaction.response.send_message("I'm not in a voice channel!", ephemeral=True)
+            return
         await interaction.response.send_message("Left voice channel", ephemeral=True)
     except Exception as e:
         await interaction.response.send_message(f"Failed to leave voice channel: {e}", ephemeral=True)
 
 async def main():
     """Main entry point."""
+    setup_logging()
+    try:
+        await run()
+    finally:
+        stop_logging()
+
+async def run():
+    """Load characters and extensions, then run the bot."""
     if not BOT_TOKEN:
-        print("Error: BOT_TOKEN not found in environment variables")
+        logger.error("BOT_TOKEN not found in environment variables")
         return
     
+    # Load characters created before rosters were split by guild, they move
+    # into a guild's roster on first use. Guild rosters load on demand.
+    loaded_users = await load_guild(None)
+    logger.info("Loaded %d users without a guild", len(loaded_users))
+    
     # Load cogs
     cogs = [
         'cogs.character',
         'cogs.dice',
         'cogs.initiative',
-        'cogs.dungeon_master'
+        'cogs.dungeon_master',
+        'cogs.history',
+        'cogs.stats'
     ]
     
     for cog in cogs:
         try:
             await bot.load_extension(cog)
-            print(f"Loaded extension: {cog}")
-        except Exception as e:
-            print(f"Failed to load extension {cog}: {e}")
+            logger.info("Loaded extension: %s", cog)
+        except Exception:
+            logger.exception("Failed to load extension %s", cog)
+
+    # Route clicks on persistent prompts, also those sent before a restart
+    # or while PERSISTENT_VIEWS was on
+    bot.add_dynamic_items(PromptRouter)
     
-    await bot.start(BOT_TOKEN)
+    install_instrumentation(bot)
+    metrics_runner = None
+    if METRICS_PORT:
+        metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    start_persistence()
+    start_history()
+    start_stats()
+    start_eviction()
+    try:
+        await bot.start(BOT_TOKEN)
+    finally:
+        await stop_eviction()
+        await stop_history()
+        await stop_stats()
+        # Final flush so no pending character changes are lost on shutdown
+        await stop_persistence()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
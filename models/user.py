@@ -1,19 +1,43 @@
 """User model for DSA characters."""
 
+import csv
+import io
+import sys
+
+# DSA attribute abbreviations and names, in storage order
+ATTRIBUTES = ('MU', 'KL', 'IN', 'CH', 'FF', 'GE', 'KO', 'KK')
+ATTRIBUTE_NAMES = {
+    'MU': 'Mut',
+    'KL': 'Klugheit',
+    'IN': 'Intuition',
+    'CH': 'Charisma',
+    'FF': 'Fingerfertigkeit',
+    'GE': 'Gewandtheit',
+    'KO': 'Konstitution',
+    'KK': 'Körperkraft',
+}
+
 class User:
     """Represents a DSA character with their attributes and stats."""
 
-    def __init__(self, id: str, name: str, char_name: str):
+    # Fixed slots instead of a per-instance __dict__ keep large rosters small
+    __slots__ = ('id', 'name', 'char_name', 'guild_id', 'ini', 'current_ini') + ATTRIBUTES
+
+    def __init__(self, id: str, name: str, char_name: str, guild_id: str = ''):
         """Initialize a new User instance.
 
         Args:
             id (str): Discord user ID
             name (str): Discord username
             char_name (str): Character name
+            guild_id (str, optional): Discord guild ID the character belongs to.
+                Defaults to '' for characters not bound to a guild.
         """
         self.id = str(id)  # Ensure ID is always a string
         self.name = name
         self.char_name = char_name
+        # Interned, every character of a guild shares one string
+        self.guild_id = sys.intern(str(guild_id)) if guild_id else ''
         self.ini = 0
         self.current_ini = 0
         
@@ -27,13 +51,41 @@ class User:
         self.KO = 0  # Konstitution
         self.KK = 0  # Körperkraft
 
+    def to_row(self) -> tuple:
+        """Convert user data to a tuple for storage backends.
+
+        Returns:
+            tuple: (id, name, char_name, ini, MU, KL, IN, CH, FF, GE, KO, KK,
+                guild_id, current_ini)
+        """
+        return (self.id, self.name, self.char_name, self.ini,
+                self.MU, self.KL, self.IN, self.CH, self.FF, self.GE, self.KO, self.KK,
+                self.guild_id, self.current_ini)
+
+    @classmethod
+    def from_row(cls, row: tuple) -> 'User':
+        """Create a User instance from a storage row.
+
+        Args:
+            row (tuple): Row in the layout returned by to_row
+
+        Returns:
+            User: New User instance
+        """
+        user = cls(row[0], row[1], row[2], row[12] if len(row) > 12 else '')
+        (user.ini, user.MU, user.KL, user.IN, user.CH,
+         user.FF, user.GE, user.KO, user.KK) = row[3:12]
+        if len(row) > 13:
+            user.current_ini = row[13]
+        return user
+
     def to_string(self) -> str:
         """Convert user data to string format for storage.
 
         Returns:
             str: User data in CSV format
         """
-        return f"{self.id},{self.name},{self.char_name},{self.ini},{self.MU},{self.KL},{self.IN},{self.CH},{self.FF},{self.GE},{self.KO},{self.KK}"
+        return row_to_string(self.to_row())
 
     @classmethod
     def from_string(cls, string: str) -> 'User':
@@ -44,10 +96,19 @@ class User:
 
         Returns:
             User: New User instance or None if data is invalid
+
+        Raises:
+            ValueError: If a field is malformed
         """
-        parts = string.strip().split(',')
+        try:
+            # Names may contain commas, those fields are quoted
+            parts = next(csv.reader([string.strip()]), [])
+        except csv.Error as e:
+            raise ValueError(str(e)) from e
         if len(parts) >= 12:  # We need at least 12 parts for all attributes
-            user = cls(parts[0], parts[1], parts[2])  # ID is now passed as string
+            # Lines written before per-guild rosters have no guild ID
+            guild_id = parts[12] if len(parts) > 12 else ''
+            user = cls(parts[0], parts[1], parts[2], guild_id)  # ID is now passed as string
             user.ini = int(parts[3])
             user.MU = int(parts[4])
             user.KL = int(parts[5])
@@ -57,5 +118,23 @@ class User:
             user.GE = int(parts[9])
             user.KO = int(parts[10])
             user.KK = int(parts[11])
+            # Lines written before initiative was stored have no current_ini
+            if len(parts) > 13:
+                user.current_ini = int(parts[13])
             return user
-        return None 
\ No newline at end of file
+        return None 
+
+def row_to_string(row: tuple) -> str:
+    """Convert a storage row to CSV format.
+
+    Fields containing commas or quotes are quoted, so names can hold them.
+
+    Args:
+        row (tuple): Row in the layout returned by User.to_row
+
+    Returns:
+        str: Row in CSV format, without a line break
+    """
+    line = io.StringIO()
+    csv.writer(line, lineterminator='').writerow(row)
+    return line.getvalue()
@@ -0,0 +1,12 @@
+"""Shared helpers of the tests."""
+
+from models.user import User
+
+def make_user(user_id, name, char_name, guild_id='', base=10, current_ini=0):
+    """Create a user with distinct attribute values."""
+    user = User(user_id, name, char_name, guild_id)
+    user.ini = base
+    (user.MU, user.KL, user.IN, user.CH,
+     user.FF, user.GE, user.KO, user.KK) = range(base + 1, base + 9)
+    user.current_ini = current_ini
+    return user
@@ -0,0 +1,60 @@
+"""Tests of the attribute check odds."""
+
+import itertools
+import unittest
+from utils.checks import check_odds, resolve_check
+
+def brute_force_odds(values, modifier):
+    """Count the outcomes of a check over every combination of rolls."""
+    outcomes = list(itertools.product(range(1, 21), repeat=len(values)))
+    results = [resolve_check(rolls, values, modifier) for rolls in outcomes]
+    distribution = {}
+    for result in results:
+        distribution[result.total_diff] = distribution.get(result.total_diff, 0) + 1
+    return (
+        sum(result.all_success for result in results) / len(outcomes),
+        sum(result.party_effect for result in results) / len(outcomes),
+        sum(result.doom_effect for result in results) / len(outcomes),
+        sum(result.total_diff for result in results) / len(outcomes),
+        tuple((total, distribution[total] / len(outcomes)) for total in sorted(distribution)),
+    )
+
+class CheckOddsTest(unittest.TestCase):
+    """check_odds against enumerating every roll."""
+
+    CASES = [
+        ((12, 13, 14), 0),
+        ((8, 8, 8), -10),
+        ((2, 5, 0), -5),
+        ((0, 0, 0), 0),
+        ((10, 20, 1), -1),
+        ((18, 19, 20), 5),
+        ((25, 3, 14), 0),
+        ((2,), -5),
+        ((21,), 3),
+    ]
+
+    def test_matches_brute_force(self):
+        for values, modifier in self.CASES:
+            with self.subTest(values=values, modifier=modifier):
+                odds = check_odds(values, modifier)
+                success, party, doom, expected, distribution = brute_force_odds(values, modifier)
+                self.assertAlmostEqual(odds.success, success)
+                self.assertAlmostEqual(odds.party_effect, party)
+                self.assertAlmostEqual(odds.doom_effect, doom)
+                self.assertAlmostEqual(odds.expected_diff, expected)
+                self.assertEqual([total for total, _ in odds.diff_distribution],
+                                 [total for total, _ in distribution])
+                for (_, probability), (_, exact) in zip(odds.diff_distribution, distribution):
+                    self.assertAlmostEqual(probability, exact)
+
+    def test_negative_targets(self):
+        self.assertAlmostEqual(check_odds([2], -5).expected_diff, 13.5)
+        self.assertAlmostEqual(check_odds([8, 8, 8], -10).expected_diff, 37.5)
+        self.assertEqual(check_odds([8, 8, 8], -10).success, 0.0)
+
+    def test_order_does_not_matter(self):
+        self.assertEqual(check_odds([3, 12, 17], 1), check_odds([17, 3, 12], 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Tests of the dice streams."""
+
+import unittest
+from utils.dice import DiceStream
+
+class DiceStreamTest(unittest.TestCase):
+    """Rolls of seeded and unseeded dice streams."""
+
+    def test_seeded_streams_repeat(self):
+        first = DiceStream('session', buffer_size=16)
+        second = DiceStream('session', buffer_size=16)
+        rolls = [first.roll_many(20, count) for count in (1, 3, 40, 2)]
+        self.assertEqual([second.roll_many(20, count) for count in (1, 3, 40, 2)], rolls)
+
+    def test_dice_sizes_are_independent(self):
+        first = DiceStream('session', buffer_size=16)
+        second = DiceStream('session', buffer_size=16)
+        second.roll_many(6, 30)
+        second.roll_many(8, 5)
+        self.assertEqual(first.roll_many(20, 50), second.roll_many(20, 50))
+
+    def test_values_in_range(self):
+        stream = DiceStream(buffer_size=16)
+        for sides in (1, 6, 20, 100):
+            with self.subTest(sides=sides):
+                self.assertTrue(all(1 <= roll <= sides for roll in stream.roll_many(sides, 200)))
+
+    def test_invalid_rolls(self):
+        stream = DiceStream()
+        with self.assertRaises(ValueError):
+            stream.roll_many(0, 1)
+        with self.assertRaises(ValueError):
+            stream.roll_many(6, -1)
+        with self.assertRaises(ValueError):
+            DiceStream('seed', crypto=True)
+
+if __name__ == '__main__':
+    unittest.main()
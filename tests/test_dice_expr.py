@@ -0,0 +1,94 @@
+"""Tests of dice expressions."""
+
+import unittest
+from utils.dice import DiceStream, ScriptedSource
+from utils.dice_expr import MAX_DICE, MAX_EXPRESSION_LENGTH, MAX_SIDES, DiceExpressionError, compile_expression
+from tests.helpers import make_user
+
+class NoDice(DiceStream):
+    """Dice stream that fails the test if anything beyond the script is rolled."""
+
+    def roll_many(self, sides, count):
+        if count:
+            raise AssertionError(f'Unexpected roll of {count}d{sides}')
+        return []
+
+def scripted(*values):
+    """Create a dice source returning exactly the given values."""
+    return ScriptedSource(values, NoDice())
+
+class CompileExpressionTest(unittest.TestCase):
+    """Parsing and evaluating dice expressions."""
+
+    def test_evaluate(self):
+        cases = [
+            ('7', (), 7),
+            ('1+2*3', (), 7),
+            ('(1+2)*3', (), 9),
+            ('10-2-3', (), 5),
+            ('-3+-(2)', (), -5),
+            ('7/2', (), 3),
+            ('-7/2', (), -4),
+            ('d20', (13,), 13),
+            ('3d6+2', (1, 2, 6), 11),
+            ('2W6 - 1w6', (3, 4, 5), 2),
+            ('1d20*2+1d6', (10, 4), 24),
+        ]
+        for expression, rolls, total in cases:
+            with self.subTest(expression=expression):
+                self.assertEqual(compile_expression(expression).evaluate(scripted(*rolls)).total, total)
+
+    def test_details(self):
+        result = compile_expression('2d6+1d20').evaluate(scripted(3, 4, 17))
+        self.assertEqual(result.total, 24)
+        self.assertEqual(result.details, (('2d6', (3, 4)), ('1d20', (17,))))
+
+    def test_attributes(self):
+        user = make_user('1001', 'alice', 'Alrik', base=8)
+        expression = compile_expression('1d20 + mu - INI')
+        self.assertTrue(expression.uses_character)
+        self.assertEqual(expression.evaluate(scripted(5), user).total, 5 + user.MU - user.ini)
+        with self.assertRaises(DiceExpressionError):
+            expression.evaluate(scripted(5))
+
+    def test_metadata(self):
+        expression = compile_expression(' 3d6 + 2 d 20 ')
+        self.assertEqual(expression.source, '3d6+2d20')
+        self.assertEqual(expression.dice_count, 5)
+        self.assertFalse(expression.uses_character)
+        self.assertIs(compile_expression('3d6+2d20'), expression)
+
+    def test_errors(self):
+        cases = [
+            '',
+            '   ',
+            '1+',
+            '(1+2',
+            '1+2)',
+            '*3',
+            '2(3)',
+            '1d20#',
+            '1d0',
+            f'1d{MAX_SIDES + 1}',
+            f'{MAX_DICE + 1}d6',
+            f'{MAX_DICE}d6+1d6',
+            'foo',
+            '1' * (MAX_EXPRESSION_LENGTH + 1),
+        ]
+        for expression in cases:
+            with self.subTest(expression=expression):
+                with self.assertRaises(DiceExpressionError):
+                    compile_expression(expression)
+
+    def test_division_by_zero(self):
+        expression = compile_expression('6/(1d6-3)')
+        with self.assertRaises(DiceExpressionError):
+            expression.evaluate(scripted(3))
+        self.assertEqual(expression.evaluate(scripted(5)).total, 3)
+
+    def test_invalid_scripted_roll(self):
+        with self.assertRaises(ValueError):
+            compile_expression('1d6').evaluate(scripted(7))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""Tests of the initiative order and the combat turn order."""
+
+import unittest
+from utils.initiative import Combat, InitiativeTracker
+from tests.helpers import make_user
+
+def order(tracker):
+    """Get the Discord IDs of a tracker in initiative order."""
+    return [user.id for user in tracker.users()]
+
+class InitiativeTrackerTest(unittest.TestCase):
+    """Ordering characters by their rolled initiative."""
+
+    def setUp(self):
+        self.users = {
+            'a': make_user('1', 'a', 'Borbarad', base=10, current_ini=15),
+            'b': make_user('2', 'b', 'Bärbel', base=12, current_ini=15),
+            'c': make_user('3', 'c', 'Cara', base=10, current_ini=20),
+            'd': make_user('4', 'd', 'Answin', base=10, current_ini=15),
+            'e': make_user('5', 'e', 'Egon', base=10),
+        }
+        self.tracker = InitiativeTracker(self.users.values())
+
+    def test_order(self):
+        # Highest initiative first, ties by base initiative, then by character name
+        self.assertEqual(order(self.tracker), ['3', '2', '4', '1'])
+        self.assertEqual(len(self.tracker), 4)
+        self.assertNotIn('5', self.tracker)
+        self.assertEqual(self.tracker.index('4'), 2)
+        self.assertEqual([user.id for user in self.tracker.users(1, 3)], ['2', '4'])
+
+    def test_update(self):
+        version = self.tracker.version
+        self.users['e'].current_ini = 16
+        self.tracker.update(self.users['e'])
+        self.users['c'].current_ini = 1
+        self.tracker.update(self.users['c'])
+        self.assertEqual(order(self.tracker), ['5', '2', '4', '1', '3'])
+        self.assertGreater(self.tracker.version, version)
+
+        self.users['b'].current_ini = 0
+        self.tracker.update(self.users['b'])
+        self.assertEqual(order(self.tracker), ['5', '4', '1', '3'])
+
+    def test_remove_and_clear(self):
+        self.assertIs(self.tracker.remove('2'), self.users['b'])
+        self.assertIsNone(self.tracker.remove('2'))
+        self.assertEqual(order(self.tracker), ['3', '4', '1'])
+        with self.assertRaises(KeyError):
+            self.tracker.index('2')
+        self.assertEqual(len(self.tracker.clear()), 3)
+        self.assertEqual(order(self.tracker), [])
+
+class CombatTest(unittest.TestCase):
+    """Turns, rounds, delayed and readied actions."""
+
+    def setUp(self):
+        self.users = [make_user(str(index), f'u{index}', f'Char {index}', current_ini=20 - index)
+                      for index in range(1, 5)]
+        self.tracker = InitiativeTracker(self.users)
+        self.combat = Combat(self.tracker)
+
+    def turn(self):
+        user = self.combat.current_user()
+        return user.id if user else None
+
+    def test_empty(self):
+        combat = Combat(InitiativeTracker())
+        self.assertIsNone(combat.start())
+        self.assertIsNone(combat.next())
+        self.assertIsNone(combat.prev())
+
+    def test_next_and_prev(self):
+        self.assertEqual(self.combat.start().id, '1')
+        turns = [self.combat.next().id for _ in range(5)]
+        self.assertEqual(turns, ['2', '3', '4', '1', '2'])
+        self.assertEqual(self.combat.round, 2)
+        self.assertEqual([self.combat.prev().id for _ in range(3)], ['1', '4', '3'])
+        self.assertEqual(self.combat.round, 1)
+
+    def test_changes_keep_the_turn(self):
+        self.combat.start()
+        self.combat.next()
+        self.users[3].current_ini = 30
+        self.tracker.update(self.users[3])
+        self.assertEqual(self.turn(), '2')
+        self.assertEqual(self.combat.next().id, '3')
+
+        self.tracker.remove('3')
+        self.assertIsNone(self.combat.current_user())
+        self.assertEqual(self.combat.next().id, '4')
+
+    def test_delay_and_ready(self):
+        self.combat.start()
+        self.assertEqual(self.combat.delay().id, '2')
+        self.assertEqual(self.combat.next().id, '3')
+        self.assertFalse(self.combat.ready('2'))
+
+        # The delayed character interrupts, then the turn goes back
+        self.assertTrue(self.combat.ready('1'))
+        self.assertEqual(self.turn(), '1')
+        self.assertEqual(self.combat.next().id, '3')
+        self.assertEqual(self.combat.next().id, '4')
+
+    def test_delay_lapses_at_round_end(self):
+        self.combat.start()
+        self.combat.delay()
+        self.assertEqual([self.combat.next().id for _ in range(3)], ['3', '4', '1'])
+        self.assertEqual(self.combat.round, 2)
+        self.assertFalse(self.combat.ready('1'))
+
+    def test_everyone_delayed(self):
+        self.combat.start()
+        for _ in range(3):
+            self.combat.delay()
+        self.assertEqual(self.combat.delay().id, '1')
+        self.assertEqual(self.combat.round, 2)
+
+    def test_json_round_trip(self):
+        self.combat.start()
+        self.combat.delay()
+        self.combat.ready('1')
+        self.combat.channel_id = 5
+        self.combat.message_id = 6
+        restored = Combat.from_json(self.tracker, self.combat.to_json())
+        for field in ('round', 'current', 'resume', 'delayed', 'channel_id', 'message_id'):
+            self.assertEqual(getattr(restored, field), getattr(self.combat, field))
+        self.assertEqual(restored.next().id, '2')
+
+if __name__ == '__main__':
+    unittest.main()
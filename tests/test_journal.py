@@ -0,0 +1,85 @@
+"""Tests of the roster journal of the file backend."""
+
+import os
+import tempfile
+import unittest
+from utils.file_handler import (append_journal, compact_journal, delete_record, journal_file_path,
+                                load_users, replay_journal, snapshot_file_path, upsert_record)
+from tests.helpers import make_user
+
+class JournalTest(unittest.TestCase):
+    """Replaying, truncating and compacting journals."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'user.txt')
+        self.journal = journal_file_path(self.path)
+        self.alice = make_user('1001', 'alice', 'Alrik', '42', base=8, current_ini=17)
+        self.bob = make_user('1002', 'bob', 'Bärbel', '42', base=12)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def replay(self):
+        users = {}
+        replay_journal(users, self.journal)
+        return {user_id: user.to_row() for user_id, user in users.items()}
+
+    def test_missing_journal(self):
+        self.assertEqual(self.replay(), {})
+
+    def test_replay(self):
+        changed = make_user('1001', 'alice', 'Alrik', '42', base=9)
+        append_journal([upsert_record(self.alice.to_row()), upsert_record(self.bob.to_row())], self.journal)
+        append_journal([upsert_record(changed.to_row()), delete_record('1002')], self.journal)
+        self.assertEqual(self.replay(), {'1001': changed.to_row()})
+
+    def test_names_with_commas_and_quotes(self):
+        carol = make_user('1003', 'carol', 'Cara, "die Kühne"', '42', base=9, current_ini=4)
+        append_journal([upsert_record(carol.to_row()), upsert_record(self.bob.to_row())], self.journal)
+        self.assertEqual(self.replay(), {'1003': carol.to_row(), '1002': self.bob.to_row()})
+
+    def test_unquoted_records(self):
+        # Records written before names were quoted
+        with open(self.journal, 'w') as file:
+            file.write('U,' + ','.join(str(value) for value in self.alice.to_row()) + '\n')
+        self.assertEqual(self.replay(), {'1001': self.alice.to_row()})
+
+    def test_partial_last_record(self):
+        size = append_journal([upsert_record(self.alice.to_row())], self.journal)
+        with open(self.journal, 'a') as file:
+            file.write(upsert_record(self.bob.to_row())[:20])
+
+        self.assertEqual(self.replay(), {'1001': self.alice.to_row()})
+        self.assertEqual(os.path.getsize(self.journal), size)
+
+        # Later appends start on a clean line
+        append_journal([upsert_record(self.bob.to_row())], self.journal)
+        self.assertEqual(self.replay(), {'1001': self.alice.to_row(), '1002': self.bob.to_row()})
+
+    def test_skips_invalid_records(self):
+        with open(self.journal, 'w') as file:
+            file.write('X,unknown\n')
+            file.write('U,1003,carol,Cara,not-a-number,1,2,3,4,5,6,7,8,42,0\n')
+        append_journal([upsert_record(self.alice.to_row())], self.journal)
+        self.assertEqual(self.replay(), {'1001': self.alice.to_row()})
+
+    def test_compact(self):
+        append_journal([upsert_record(self.alice.to_row()), upsert_record(self.bob.to_row())], self.journal)
+        compact_journal([self.alice.to_row(), self.bob.to_row()], self.path)
+        self.assertTrue(os.path.exists(snapshot_file_path(self.path)))
+        self.assertEqual(os.path.getsize(self.journal), 0)
+
+        append_journal([delete_record('1001')], self.journal)
+        self.assertEqual([user.to_row() for user in load_users(self.path)], [self.bob.to_row()])
+
+    def test_imports_csv_without_snapshot(self):
+        with open(self.path, 'w') as file:
+            file.write(f'{self.alice.to_string()}\n')
+            file.write('broken line\n')
+        append_journal([upsert_record(self.bob.to_row())], self.journal)
+        self.assertEqual([user.to_row() for user in load_users(self.path)],
+                         [self.alice.to_row(), self.bob.to_row()])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Tests of clicks on persistent prompts, routed through PromptRouter."""
+
+import unittest
+from unittest import mock
+from benchmarks.fakes import FakeAPI, FakeChannel, FakeClient, FakeMember, click
+from cogs.initiative import InitiativeView
+from views.dice_throw import DiceThrowView, ThrowTypeView
+from views.dungeon_master_roll import DungeonMasterRollView
+from views.persistent import PromptRouter
+from tests.helpers import make_user
+
+GUILD_ID = 42
+
+class PersistentClickTest(unittest.IsolatedAsyncioTestCase):
+    """A click rebuilds the prompt from its custom_id and runs the clicked button's handler once."""
+
+    def setUp(self):
+        self.user = make_user('1001', 'alice', 'Alrik', str(GUILD_ID), base=8)
+        self.member = FakeMember(1001, 'alice')
+        self.client = FakeClient(FakeAPI())
+        self.channel = FakeChannel(self.client.api)
+        for module in ('cogs.initiative', 'views.dice_throw', 'views.dungeon_master_roll'):
+            patcher = mock.patch(f'{module}.load_character', mock.AsyncMock(return_value=self.user))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def click(self, view, action):
+        """Send a view and click one of its buttons."""
+        message = self.channel.new_message()
+        message.view = view
+        return await click(self.client, message, self.member, GUILD_ID, action)
+
+    async def assert_routed(self, view_class, handler, make_view, action):
+        """Click a button of a persistent view and check its handler ran once."""
+        with mock.patch.object(view_class, handler) as callback:
+            view = make_view()
+            self.assertTrue(all(isinstance(item, PromptRouter) for item in view.children))
+            interaction = await self.click(view, action)
+        callback.assert_awaited_once_with(interaction)
+
+    async def test_layout_buttons(self):
+        cases = [
+            (InitiativeView, 'modifier_callback', lambda: InitiativeView(self.user, persistent=True), 'mod_plus'),
+            (InitiativeView, 'confirm_callback', lambda: InitiativeView(self.user, persistent=True), 'confirm_throw'),
+            (ThrowTypeView, 'full_callback', lambda: ThrowTypeView(self.user, persistent=True), 'throw_full'),
+            (DiceThrowView, 'attribute_callback', lambda: DiceThrowView(self.user, persistent=True), 'attr_MU'),
+            (DiceThrowView, 'modifier_callback', lambda: DiceThrowView(self.user, persistent=True), 'mod_minus'),
+        ]
+        for view_class, handler, make_view, action in cases:
+            with self.subTest(view=view_class.__name__, action=action):
+                await self.assert_routed(view_class, handler, make_view, action)
+
+    async def test_created_buttons(self):
+        await self.assert_routed(DungeonMasterRollView, 'character_callback',
+                                 lambda: DungeonMasterRollView([self.user], persistent=True),
+                                 f'char_{self.user.id}')
+
+    async def test_state_survives_the_click(self):
+        view = DiceThrowView(self.user, persistent=True)
+        view.selected_attributes = ['MU']
+        view.modifier = -2
+        view.refresh_custom_ids()
+        message = self.channel.new_message()
+        message.view = view
+        await click(self.client, message, self.member, GUILD_ID, 'attr_KL')
+        rebuilt = message.view
+        self.assertIsNot(rebuilt, view)
+        self.assertEqual((rebuilt.selected_attributes, rebuilt.modifier), (['MU', 'KL'], -2))
+
+    def test_layout_copies_are_independent(self):
+        first = DiceThrowView(self.user, persistent=False)
+        second = DiceThrowView(self.user, persistent=False)
+        first.children[0].disabled = True
+        first.children[0].label = 'changed'
+        self.assertFalse(second.children[0].disabled)
+        self.assertNotEqual(second.children[0].label, 'changed')
+        self.assertFalse(DiceThrowView(self.user, persistent=False).children[0].disabled)
+
+if __name__ == '__main__':
+    unittest.main()
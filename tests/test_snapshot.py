@@ -0,0 +1,91 @@
+"""Tests of the binary roster snapshot format."""
+
+import os
+import tempfile
+import unittest
+from utils.snapshot import HEADER, MAGIC, RECORDS, Snapshot, SnapshotError, read_snapshot, write_snapshot
+from tests.helpers import make_user
+
+def write_v1_snapshot(path, users):
+    """Write users in the version 1 layout, without current initiative."""
+    records = bytearray()
+    blob = bytearray()
+    for user in users:
+        name = user.name.encode('utf-8')
+        char_name = user.char_name.encode('utf-8')
+        records += RECORDS[1].pack(int(user.guild_id or 0), int(user.id), *user.to_row()[3:12],
+                                   len(blob), len(name), len(blob) + len(name), len(char_name))
+        blob += name + char_name
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, 1, RECORDS[1].size, len(users)))
+        file.write(records)
+        file.write(blob)
+
+class SnapshotTest(unittest.TestCase):
+    """Round trips and validation of snapshot files."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'user.snapshot')
+        self.users = [
+            make_user('1001', 'alice', 'Alrik', '42', base=8, current_ini=17),
+            make_user('1002', 'bob', 'Bärbel Ögelsdóttir', '42', base=12),
+            make_user('1003', 'carol', '', '', base=-3, current_ini=-2),
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        write_snapshot(self.path, [user.to_row() for user in self.users])
+        loaded = read_snapshot(self.path)
+        self.assertEqual([user.to_row() for user in loaded], [user.to_row() for user in self.users])
+
+    def test_single_records(self):
+        write_snapshot(self.path, [user.to_row() for user in self.users])
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(len(snapshot), 3)
+            self.assertEqual(snapshot[1].to_row(), self.users[1].to_row())
+            with self.assertRaises(IndexError):
+                snapshot[3]
+
+    def test_empty(self):
+        write_snapshot(self.path, [])
+        self.assertEqual(read_snapshot(self.path), [])
+
+    def test_reads_version_1(self):
+        write_v1_snapshot(self.path, self.users)
+        loaded = read_snapshot(self.path)
+        for user in self.users:
+            user.current_ini = 0
+        self.assertEqual([user.to_row() for user in loaded], [user.to_row() for user in self.users])
+
+    def test_rejects_invalid_rows(self):
+        with self.assertRaises(ValueError):
+            write_snapshot(self.path, [make_user('not-a-number', 'x', 'X').to_row()])
+        with self.assertRaises(ValueError):
+            write_snapshot(self.path, [make_user('1', 'x', 'X', base=40000).to_row()])
+
+    def test_rejects_invalid_files(self):
+        cases = {
+            'short': b'DSA',
+            'magic': HEADER.pack(b'NOPE', 2, RECORDS[2].size, 0),
+            'version': HEADER.pack(MAGIC, 99, RECORDS[2].size, 0),
+            'record size': HEADER.pack(MAGIC, 2, RECORDS[1].size, 0),
+            'truncated': HEADER.pack(MAGIC, 2, RECORDS[2].size, 5) + bytes(RECORDS[2].size),
+        }
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                with open(self.path, 'wb') as file:
+                    file.write(data)
+                with self.assertRaises(SnapshotError):
+                    Snapshot(self.path)
+
+    def test_header_layout(self):
+        write_snapshot(self.path, [self.users[0].to_row()])
+        with open(self.path, 'rb') as file:
+            magic, version, record_size, count = HEADER.unpack(file.read(HEADER.size))
+        self.assertEqual((magic, version, record_size, count), (MAGIC, 2, RECORDS[2].size, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Tests of the SQLite storage backend and its schema migrations."""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from utils.sqlite_storage import CREATE_USERS, INTEGER_COLUMNS, SCHEMA_VERSION, SQLiteStorage
+from tests.helpers import make_user
+
+# Integer columns of the older users tables
+INTEGERS = ', '.join(f'"{column}" INTEGER NOT NULL' for column in INTEGER_COLUMNS)
+NAMES = 'name TEXT NOT NULL, char_name TEXT NOT NULL'
+
+# Users table of every older schema version and how its rows are inserted
+OLD_SCHEMAS = {
+    1: (f'CREATE TABLE users (id TEXT PRIMARY KEY, {NAMES}, {INTEGERS})',
+        'INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'),
+    2: (f"CREATE TABLE users (guild_id TEXT NOT NULL DEFAULT '', id TEXT NOT NULL, {NAMES}, {INTEGERS}, "
+        'PRIMARY KEY (guild_id, id))',
+        'INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'),
+    3: (CREATE_USERS,
+        'INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'),
+}
+
+class SQLiteStorageTest(unittest.TestCase):
+    """Migrating old databases and round trips through the backend."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'dsa_bot.db')
+        self.user = make_user('1001', 'alice', 'Alrik', '', base=8, current_ini=17)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_old_database(self, version):
+        """Create a database of an old schema version holding self.user."""
+        create, insert = OLD_SCHEMAS[version]
+        row = self.user.to_row()
+        if version == 1:
+            values = row[:12]
+        elif version == 2:
+            values = (row[12],) + row[:12]
+        else:
+            values = (row[12],) + row[:12] + (row[13],)
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute(create)
+            connection.execute(insert, values)
+            connection.execute(f'PRAGMA user_version = {version}')
+        connection.close()
+
+    def open(self):
+        storage = SQLiteStorage(self.path)
+        self.addCleanup(storage.close)
+        return storage
+
+    def test_migrations(self):
+        for version in OLD_SCHEMAS:
+            with self.subTest(version=version):
+                self.create_old_database(version)
+                storage = self.open()
+                self.assertEqual(storage.connection.execute('PRAGMA user_version').fetchone()[0],
+                                 SCHEMA_VERSION)
+                expected = self.user.to_row()
+                if version < 3:
+                    # Rolled initiative was not stored before version 3
+                    expected = expected[:13] + (0,)
+                self.assertEqual([user.to_row() for user in storage.load_users('')], [expected])
+                self.assertIsNone(storage.load_state('', 'combat'))
+                storage.write_state('', 'combat', '{}')
+                self.assertEqual(storage.load_state('', 'combat'), '{}')
+                storage.close()
+                os.remove(self.path)
+
+    def test_new_database(self):
+        storage = self.open()
+        self.assertEqual(storage.connection.execute('PRAGMA user_version').fetchone()[0], SCHEMA_VERSION)
+        self.assertEqual(storage.load_users(''), [])
+
+    def test_write_changes(self):
+        storage = self.open()
+        alice = make_user('1001', 'alice', 'Alrik', '42', base=8, current_ini=17)
+        bob = make_user('1002', 'bob', 'Bärbel', '42', base=12)
+        other = make_user('1001', 'alice', 'Alrike', '7', base=5)
+        storage.write_changes('42', [alice.to_row(), bob.to_row()], [])
+        storage.write_changes('7', [other.to_row()], [])
+        storage.write_changes('42', [], ['1002'])
+        self.assertEqual([user.to_row() for user in storage.load_users('42')], [alice.to_row()])
+
+        storage.write_changes('42', [], [], snapshot=[bob.to_row()])
+        self.assertEqual([user.to_row() for user in storage.load_users('42')], [bob.to_row()])
+        self.assertEqual([user.to_row() for user in storage.load_users('7')], [other.to_row()])
+
+    def test_state(self):
+        storage = self.open()
+        storage.write_state('42', 'stats', 'a')
+        storage.write_state('42', 'stats', 'b')
+        self.assertEqual(storage.load_state('42', 'stats'), 'b')
+        self.assertIsNone(storage.load_state('7', 'stats'))
+        storage.write_state('42', 'stats', None)
+        self.assertIsNone(storage.load_state('42', 'stats'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Tests of the running dice statistics."""
+
+import random
+import statistics
+import unittest
+from utils.checks import resolve_check
+from utils.stats import CheckStats, RunningStats
+
+def single_pass(values):
+    """Add values to running statistics one by one."""
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    return stats
+
+class RunningStatsTest(unittest.TestCase):
+    """Welford updates, batches and merges against each other."""
+
+    def setUp(self):
+        generator = random.Random(17)
+        self.values = [generator.randint(1, 20) for _ in range(500)] + [1e6, -3.5]
+
+    def assertStatsEqual(self, stats, expected):
+        self.assertEqual(stats.count, expected.count)
+        self.assertAlmostEqual(stats.mean, expected.mean)
+        self.assertAlmostEqual(stats.m2 / expected.m2, 1.0)
+
+    def test_single_pass(self):
+        stats = single_pass(self.values)
+        self.assertAlmostEqual(stats.mean, statistics.mean(self.values))
+        self.assertAlmostEqual(stats.variance / statistics.variance(self.values), 1.0)
+
+    def test_merge(self):
+        expected = single_pass(self.values)
+        for split in (0, 1, 250, len(self.values) - 1, len(self.values)):
+            with self.subTest(split=split):
+                stats = single_pass(self.values[:split])
+                stats.merge(single_pass(self.values[split:]))
+                self.assertStatsEqual(stats, expected)
+
+    def test_merge_many(self):
+        stats = RunningStats()
+        for start in range(0, len(self.values), 7):
+            stats.merge(RunningStats.from_values(self.values[start:start + 7]))
+        self.assertStatsEqual(stats, single_pass(self.values))
+
+    def test_from_values(self):
+        self.assertStatsEqual(RunningStats.from_values(self.values), single_pass(self.values))
+        empty = RunningStats.from_values([])
+        self.assertEqual((empty.count, empty.mean, empty.m2), (0, 0.0, 0.0))
+
+    def test_merge_empty(self):
+        stats = RunningStats()
+        stats.merge(RunningStats())
+        self.assertEqual((stats.count, stats.variance), (0, 0.0))
+        stats.merge(single_pass([4, 8]))
+        self.assertEqual((stats.count, stats.mean, stats.variance), (2, 6.0, 8.0))
+
+    def test_storage(self):
+        stats = single_pass(self.values)
+        self.assertStatsEqual(RunningStats.from_list(stats.to_list()), stats)
+
+class CheckStatsTest(unittest.TestCase):
+    """Batched check statistics against adding checks one by one."""
+
+    def setUp(self):
+        generator = random.Random(3)
+        self.attributes = ('MU', 'KL', 'IN')
+        self.checks = [
+            resolve_check([generator.randint(1, 20) for _ in range(3)], (12, 13, 11), generator.randint(-5, 3))
+            for _ in range(300)
+        ]
+
+    def assertCheckStatsEqual(self, stats, expected):
+        self.assertEqual((stats.checks, stats.successes, stats.party_effects, stats.doom_effects),
+                         (expected.checks, expected.successes, expected.party_effects, expected.doom_effects))
+        self.assertEqual(stats.attributes, expected.attributes)
+        for name in ('d20', 'diff'):
+            actual, wanted = getattr(stats, name), getattr(expected, name)
+            self.assertEqual(actual.count, wanted.count)
+            self.assertAlmostEqual(actual.mean, wanted.mean)
+            self.assertAlmostEqual(actual.m2, wanted.m2, delta=1e-9 * max(1.0, wanted.m2))
+
+    def single_pass(self, checks):
+        stats = CheckStats()
+        for check in checks:
+            stats.add(self.attributes, check)
+        return stats
+
+    def test_from_checks(self):
+        self.assertCheckStatsEqual(CheckStats.from_checks(self.attributes, self.checks),
+                                   self.single_pass(self.checks))
+
+    def test_merge(self):
+        stats = self.single_pass(self.checks[:120])
+        stats.merge(CheckStats.from_checks(self.attributes, self.checks[120:]))
+        self.assertCheckStatsEqual(stats, self.single_pass(self.checks))
+
+    def test_storage(self):
+        stats = self.single_pass(self.checks)
+        self.assertCheckStatsEqual(CheckStats.from_dict(stats.to_dict()), stats)
+
+if __name__ == '__main__':
+    unittest.main()
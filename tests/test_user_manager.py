@@ -0,0 +1,39 @@
+"""Tests of the write-behind persistence of the user manager."""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from utils import user_manager
+from utils.sqlite_storage import SQLiteStorage
+
+class StopPersistenceTest(unittest.IsolatedAsyncioTestCase):
+    """Shutting down the persistence task."""
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.backend = SQLiteStorage(os.path.join(self.directory.name, 'dsa_bot.db'))
+        patcher = mock.patch.object(user_manager, '_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_closes_storage_after_a_failed_flush(self):
+        user_manager.start_persistence(interval=3600)
+        with mock.patch.object(user_manager, 'flush_users', mock.AsyncMock(side_effect=OSError('disk full'))):
+            with self.assertRaises(OSError):
+                await user_manager.stop_persistence()
+        self.assertIsNone(user_manager._backend)
+        self.assertIsNone(user_manager._persistence_task)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            self.backend.connection.execute('SELECT 1')
+
+    async def test_closes_storage(self):
+        await user_manager.stop_persistence()
+        self.assertIsNone(user_manager._backend)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            self.backend.connection.execute('SELECT 1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""Attribute check evaluation and exact success odds for the DSA Bot."""
+
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+class CheckResult(NamedTuple):
+    """Outcome of an attribute check."""
+
+    rolls: Tuple[int, ...]
+    diffs: Tuple[int, ...]
+    total_diff: int
+    all_success: bool
+    party_effect: bool
+    doom_effect: bool
+
+class CheckOdds(NamedTuple):
+    """Exact probabilities of an attribute check."""
+
+    success: float
+    party_effect: float
+    doom_effect: float
+    expected_diff: float
+    diff_distribution: Tuple[Tuple[int, float], ...]
+
+def resolve_check(rolls: Sequence[int], attribute_values: Sequence[int], modifier: int) -> CheckResult:
+    """Evaluate a check from its d20 rolls.
+
+    Each roll is compared with its attribute plus the modifier. A roll above
+    the modified attribute fails by the difference. Two or more 1s trigger
+    the party effect, two or more 20s the doom effect, counted over all
+    rolls.
+
+    Args:
+        rolls (Sequence[int]): The d20 rolls, at least one per attribute
+        attribute_values (Sequence[int]): Attribute values being checked
+        modifier (int): Modifier added to every attribute
+
+    Returns:
+        CheckResult: The outcome of the check
+    """
+    diffs = tuple(
+        max(0, roll - (value + modifier)) for roll, value in zip(rolls, attribute_values)
+    )
+    total_diff = sum(diffs)
+    return CheckResult(
+        rolls=tuple(rolls),
+        diffs=diffs,
+        total_diff=total_diff,
+        all_success=total_diff == 0,
+        party_effect=sum(1 for roll in rolls if roll == 1) >= 2,
+        doom_effect=sum(1 for roll in rolls if roll == 20) >= 2,
+    )
+
+def resolve_checks(rolls: Sequence[int], attribute_values: Sequence[Sequence[int]],
+                   modifier: int) -> List[CheckResult]:
+    """Evaluate the checks of a group from one batch of d20 rolls.
+
+    Gives the same results as resolve_check for every check, but computes
+    the differences of the whole batch at once.
+
+    Args:
+        rolls (Sequence[int]): The d20 rolls of all checks, one per attribute, in order
+        attribute_values (Sequence[Sequence[int]]): Attribute values of every check,
+            all checks of the same length
+        modifier (int): Modifier added to every attribute
+
+    Returns:
+        List[CheckResult]: The outcome of every check
+    """
+    if not attribute_values:
+        return []
+    count = len(attribute_values[0])
+    targets = [value + modifier for values in attribute_values for value in values]
+    all_diffs = [roll - target if roll > target else 0 for roll, target in zip(rolls, targets)]
+    results = []
+    for start in range(0, len(targets), count):
+        end = start + count
+        check_rolls = tuple(rolls[start:end])
+        diffs = tuple(all_diffs[start:end])
+        total_diff = sum(diffs)
+        results.append(CheckResult(
+            rolls=check_rolls,
+            diffs=diffs,
+            total_diff=total_diff,
+            all_success=total_diff == 0,
+            party_effect=check_rolls.count(1) >= 2,
+            doom_effect=check_rolls.count(20) >= 2,
+        ))
+    return results
+
+def check_odds(attribute_values: Sequence[int], modifier: int = 0) -> CheckOdds:
+    """Get the exact odds of a check.
+
+    The odds only depend on the modified attributes, in any order. Modified
+    attributes of 20 or more never fail, so they are capped at 20 and
+    equivalent checks share one cache entry. Modified attributes of 0 or
+    less are kept as they are, since every roll fails by its full distance
+    to them.
+
+    Args:
+        attribute_values (Sequence[int]): Attribute values being checked
+        modifier (int, optional): Modifier added to every attribute. Defaults to 0.
+
+    Returns:
+        CheckOdds: The probabilities of the check
+    """
+    targets = tuple(sorted(min(20, value + modifier) for value in attribute_values))
+    return _check_odds(targets)
+
+@lru_cache(maxsize=None)
+def _die_outcomes(target: int) -> Dict[Tuple[int, int, int], int]:
+    """Count the outcomes of one d20 against a modified attribute.
+
+    Args:
+        target (int): Modified attribute, capped at 20
+
+    Returns:
+        Dict[Tuple[int, int, int], int]: Number of faces per (diff, is 1, is 20)
+    """
+    outcomes: Dict[Tuple[int, int, int], int] = {}
+    for roll in range(1, 21):
+        key = (max(0, roll - target), int(roll == 1), int(roll == 20))
+        outcomes[key] = outcomes.get(key, 0) + 1
+    return outcomes
+
+@lru_cache(maxsize=8192)
+def _check_odds(targets: Tuple[int, ...]) -> CheckOdds:
+    """Compute the exact odds of a check by convolving the dice.
+
+    The state after each die is (total diff, 1s so far, 20s so far), with
+    the counters capped at 2. Counting outcomes as integers keeps the
+    result exact until the final division.
+
+    Args:
+        targets (Tuple[int, ...]): Sorted modified attributes, capped at 20
+
+    Returns:
+        CheckOdds: The probabilities of the check
+    """
+    states: Dict[Tuple[int, int, int], int] = {(0, 0, 0): 1}
+    for target in targets:
+        next_states: Dict[Tuple[int, int, int], int] = {}
+        for (total, ones, twenties), count in states.items():
+            for (diff, one, twenty), faces in _die_outcomes(target).items():
+                key = (total + diff, min(2, ones + one), min(2, twenties + twenty))
+                next_states[key] = next_states.get(key, 0) + count * faces
+        states = next_states
+
+    outcomes = 20 ** len(targets)
+    distribution: Dict[int, int] = {}
+    party = doom = 0
+    for (total, ones, twenties), count in states.items():
+        distribution[total] = distribution.get(total, 0) + count
+        if ones >= 2:
+            party += count
+        if twenties >= 2:
+            doom += count
+
+    return CheckOdds(
+        success=distribution.get(0, 0) / outcomes,
+        party_effect=party / outcomes,
+        doom_effect=doom / outcomes,
+        expected_diff=sum(total * count for total, count in distribution.items()) / outcomes,
+        diff_distribution=tuple((total, distribution[total] / outcomes) for total in sorted(distribution)),
+    )
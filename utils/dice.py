@@ -0,0 +1,330 @@
+"""Dice service for the DSA Bot.
+
+Every roll goes through a dice source. Each guild gets its own stream,
+which can be seeded for a session to make its rolls reproducible. Debug
+throws use a scripted source that returns fixed values before falling
+back to the guild's stream.
+"""
+
+import asyncio
+import logging
+import random
+import secrets
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, List, Optional
+from config import DICE_BUFFER_SIZE, DICE_MODE, DICE_SEED
+
+logger = logging.getLogger(__name__)
+
+# Dice kept pre-generated in a buffer, other dice are rolled on demand
+BUFFERED_SIDES = (6, 20)
+
+# Buffers are refilled on their own worker thread, in order
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dice')
+
+class DiceSource:
+    """Base class for sources of die rolls."""
+
+    def roll(self, sides: int) -> int:
+        """Roll a single die.
+
+        Args:
+            sides (int): Number of sides of the die
+
+        Returns:
+            int: The rolled value, 1..sides
+        """
+        return self.roll_many(sides, 1)[0]
+
+    def roll_many(self, sides: int, count: int) -> List[int]:
+        """Roll several dice of the same kind.
+
+        Args:
+            sides (int): Number of sides of the dice
+            count (int): Number of dice to roll
+
+        Returns:
+            List[int]: The rolled values, each 1..sides
+        """
+        raise NotImplementedError
+
+class DiceStream(DiceSource):
+    """Stream of die rolls with pre-generated buffers for common dice.
+
+    Every die size draws from its own generator. With a seed, the values
+    of each die size therefore only depend on the seed and how many of
+    them were rolled before, not on buffer refills or other dice.
+
+    Buffers running low are refilled on a worker thread and the new rolls
+    are added on the event loop. A roll needing more than the buffer holds
+    waits for a running refill first, so the rolls keep their order.
+    """
+
+    def __init__(self, seed: Optional[str] = None, crypto: bool = False,
+                 buffer_size: int = DICE_BUFFER_SIZE):
+        """Initialize the dice stream.
+
+        Args:
+            seed (Optional[str], optional): Seed for reproducible rolls. Defaults to None.
+            crypto (bool, optional): Use the operating system's cryptographic
+                random source instead. Defaults to False.
+            buffer_size (int, optional): Number of pre-generated rolls per
+                buffered die size. Defaults to DICE_BUFFER_SIZE.
+
+        Raises:
+            ValueError: If a seed is given in crypto mode
+        """
+        if crypto and seed is not None:
+            raise ValueError("Cryptographic dice cannot be seeded")
+        self.seed = seed
+        self.crypto = crypto
+        self.buffer_size = buffer_size
+        self._generators: Dict[int, random.Random] = {}
+        self._buffers: Dict[int, Deque[int]] = {}
+        # Running background refill per die size
+        self._refills: Dict[int, Future] = {}
+
+    def _generator(self, sides: int) -> random.Random:
+        """Get the random generator of a die size.
+
+        Args:
+            sides (int): Number of sides of the die
+
+        Returns:
+            random.Random: The generator
+        """
+        generator = self._generators.get(sides)
+        if generator is None:
+            if self.crypto:
+                generator = random.SystemRandom()
+            elif self.seed is None:
+                generator = random.Random()
+            else:
+                generator = random.Random(f'{self.seed}:d{sides}')
+            self._generators[sides] = generator
+        return generator
+
+    def _generate(self, sides: int, count: int) -> List[int]:
+        """Generate new rolls without using the buffer.
+
+        Args:
+            sides (int): Number of sides of the dice
+            count (int): Number of dice to roll
+
+        Returns:
+            List[int]: The rolled values
+        """
+        return self._generator(sides).choices(range(1, sides + 1), k=count)
+
+    def _refill(self, sides: int, needed: int = 0) -> None:
+        """Top up the buffer of a die size right away.
+
+        Waits for a running background refill first, its rolls come before
+        the ones generated here.
+
+        Args:
+            sides (int): Number of sides of the die
+            needed (int, optional): Rolls that must be available on top of
+                the buffer size. Defaults to 0.
+        """
+        buffer = self._buffers.setdefault(sides, deque())
+        refill = self._refills.pop(sides, None)
+        if refill is not None:
+            try:
+                buffer.extend(refill.result())
+            except Exception:
+                logger.warning("Background refill of d%d failed", sides, exc_info=True)
+        missing = self.buffer_size + needed - len(buffer)
+        if missing > 0:
+            buffer.extend(self._generate(sides, missing))
+
+    def _schedule_refill(self, sides: int) -> None:
+        """Top up a buffer on the worker thread.
+
+        Outside of an event loop the buffer is refilled on the next roll
+        that needs it.
+
+        Args:
+            sides (int): Number of sides of the die
+        """
+        if sides in self._refills:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        missing = self.buffer_size - len(self._buffers[sides])
+        refill = self._refills[sides] = _executor.submit(self._generate, sides, missing)
+        refill.add_done_callback(lambda done: loop.call_soon_threadsafe(self._finish_refill, sides, done))
+
+    def _finish_refill(self, sides: int, refill: Future) -> None:
+        """Add the rolls of a background refill to the buffer, on the event loop.
+
+        Args:
+            sides (int): Number of sides of the die
+            refill (Future): The finished refill
+        """
+        if self._refills.get(sides) is not refill:
+            # A roll already waited for it
+            return
+        del self._refills[sides]
+        try:
+            self._buffers[sides].extend(refill.result())
+        except Exception:
+            logger.warning("Background refill of d%d failed", sides, exc_info=True)
+
+    def roll_many(self, sides: int, count: int) -> List[int]:
+        """Roll several dice of the same kind.
+
+        Args:
+            sides (int): Number of sides of the dice
+            count (int): Number of dice to roll
+
+        Returns:
+            List[int]: The rolled values, each 1..sides
+
+        Raises:
+            ValueError: If sides or count are invalid
+        """
+        if sides < 1:
+            raise ValueError("A die needs at least one side")
+        if count < 0:
+            raise ValueError("Cannot roll a negative number of dice")
+        if sides not in BUFFERED_SIDES:
+            return self._generate(sides, count)
+
+        buffer = self._buffers.get(sides)
+        if buffer is None or len(buffer) < count:
+            self._refill(sides, count)
+            buffer = self._buffers[sides]
+        rolls = [buffer.popleft() for _ in range(count)]
+        if len(buffer) < self.buffer_size // 2:
+            self._schedule_refill(sides)
+        return rolls
+
+class ScriptedSource(DiceSource):
+    """Dice source returning fixed values first, used for debug throws."""
+
+    def __init__(self, values: Iterable[int], fallback: DiceSource):
+        """Initialize the scripted source.
+
+        Args:
+            values (Iterable[int]): Values returned by the next rolls, in order
+            fallback (DiceSource): Source for rolls after the scripted values
+        """
+        self.values = deque(values)
+        self.fallback = fallback
+
+    def roll_many(self, sides: int, count: int) -> List[int]:
+        """Roll several dice, taking scripted values first.
+
+        Args:
+            sides (int): Number of sides of the dice
+            count (int): Number of dice to roll
+
+        Returns:
+            List[int]: The rolled values, each 1..sides
+
+        Raises:
+            ValueError: If a scripted value is not a possible roll of the die
+        """
+        rolls = []
+        while self.values and len(rolls) < count:
+            value = self.values.popleft()
+            if not 1 <= value <= sides:
+                raise ValueError(f"{value} is not a possible roll of a d{sides}")
+            rolls.append(value)
+        rolls.extend(self.fallback.roll_many(sides, count - len(rolls)))
+        return rolls
+
+# Dice streams by guild ID, '' outside of guilds
+_streams: Dict[str, DiceStream] = {}
+
+def _stream_key(guild_id) -> str:
+    """Normalize a Discord guild ID to a stream key.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        str: Stream key
+    """
+    return str(guild_id) if guild_id else ''
+
+def create_stream(seed: Optional[str] = None) -> DiceStream:
+    """Create a dice stream for the configured DICE_MODE.
+
+    Args:
+        seed (Optional[str], optional): Seed for reproducible rolls. Defaults to None.
+
+    Returns:
+        DiceStream: New dice stream
+
+    Raises:
+        ValueError: If DICE_MODE is unknown or a seed is given in crypto mode
+    """
+    if DICE_MODE == 'random':
+        return DiceStream(seed)
+    if DICE_MODE == 'crypto':
+        return DiceStream(seed, crypto=True)
+    raise ValueError(f"Unknown dice mode: {DICE_MODE}")
+
+def get_stream(guild_id) -> DiceStream:
+    """Get the dice stream of a guild.
+
+    Without a session, the stream is seeded from DICE_SEED if it is set.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        DiceStream: The guild's dice stream
+    """
+    key = _stream_key(guild_id)
+    stream = _streams.get(key)
+    if stream is None:
+        seed = f'{DICE_SEED}:{key}' if DICE_SEED else None
+        stream = _streams[key] = create_stream(seed)
+    return stream
+
+def start_session(guild_id, seed: Optional[str] = None) -> str:
+    """Start a reproducible dice session for a guild.
+
+    All following rolls in the guild are drawn from a stream seeded with
+    the session seed, so replaying the same throws yields the same rolls.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        seed (Optional[str], optional): Session seed, random if omitted. Defaults to None.
+
+    Returns:
+        str: The session seed
+
+    Raises:
+        ValueError: If the dice mode does not support seeds
+    """
+    seed = seed or secrets.token_hex(4)
+    _streams[_stream_key(guild_id)] = create_stream(seed)
+    return seed
+
+def end_session(guild_id) -> None:
+    """End a guild's dice session and go back to its default stream.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+    """
+    _streams.pop(_stream_key(guild_id), None)
+
+def debug_source(guild_id, value: int, count: int = 2) -> ScriptedSource:
+    """Create a dice source for a debug throw.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        value (int): Value of the scripted rolls, e.g. 1 or 20
+        count (int, optional): Number of scripted rolls. Defaults to 2.
+
+    Returns:
+        ScriptedSource: Source returning the scripted rolls, then the guild's rolls
+    """
+    return ScriptedSource([value] * count, get_stream(guild_id))
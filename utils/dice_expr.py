@@ -0,0 +1,253 @@
+"""Dice expressions such as "3d20+2" or "2W6+ini" for the DSA Bot.
+
+Grammar, with d or W (Würfel) for dice and identifiers for the attributes
+of the rolling character:
+
+    expression  term (('+' | '-') term)*
+    term        unary (('*' | '/') unary)*
+    unary       '-' unary | atom
+    atom        NUMBER | [NUMBER] ('d' | 'W') NUMBER | IDENT | '(' expression ')'
+
+Expressions are compiled once into a tree of closures and cached by their
+text, so repeated rolls skip parsing. Every dice term rolls all of its
+dice with a single call to the dice source.
+"""
+
+import operator
+import re
+from functools import lru_cache
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from models.user import ATTRIBUTES, User
+from utils.dice import DiceSource
+
+MAX_EXPRESSION_LENGTH = 100
+MAX_DICE = 1000  # dice per expression
+MAX_SIDES = 1000
+
+# Identifiers usable in expressions, mapped to User attributes
+IDENTIFIERS = {attr: attr for attr in ATTRIBUTES}
+IDENTIFIERS['INI'] = 'ini'
+
+TOKEN = re.compile(r'(?P<dice>(\d*)[dDwW](\d+))(?![A-Za-z])|(?P<number>\d+)|(?P<ident>[A-Za-z]+)|(?P<op>[-+*/()])')
+
+Details = List[Tuple[str, Tuple[int, ...]]]
+Evaluator = Callable[[DiceSource, Optional[User], Details], int]
+
+class DiceExpressionError(ValueError):
+    """Raised when a dice expression is not valid."""
+
+class RollResult(NamedTuple):
+    """Outcome of a dice expression."""
+
+    total: int
+    details: Tuple[Tuple[str, Tuple[int, ...]], ...]
+
+class CompiledExpression:
+    """A parsed dice expression ready to be evaluated."""
+
+    def __init__(self, source: str, evaluator: Evaluator, dice_count: int, uses_character: bool):
+        """Initialize the compiled expression.
+
+        Args:
+            source (str): Normalized expression text
+            evaluator (Evaluator): Root of the closure tree
+            dice_count (int): Number of dice rolled per evaluation
+            uses_character (bool): Whether the expression references attributes
+        """
+        self.source = source
+        self.dice_count = dice_count
+        self.uses_character = uses_character
+        self._evaluator = evaluator
+
+    def evaluate(self, dice: DiceSource, user: Optional[User] = None) -> RollResult:
+        """Roll the expression.
+
+        Args:
+            dice (DiceSource): Source of the rolls
+            user (Optional[User], optional): Character whose attributes are
+                referenced. Defaults to None.
+
+        Returns:
+            RollResult: Total and the rolls of every dice term
+
+        Raises:
+            DiceExpressionError: If a character is required but missing, or
+                the expression divides by zero
+        """
+        if self.uses_character and user is None:
+            raise DiceExpressionError("This expression needs a character")
+        details: Details = []
+        total = self._evaluator(dice, user, details)
+        return RollResult(total, tuple(details))
+
+class _Parser:
+    """Recursive descent parser building the closure tree."""
+
+    def __init__(self, source: str):
+        """Tokenize an expression.
+
+        Args:
+            source (str): Expression text without whitespace
+
+        Raises:
+            DiceExpressionError: If the text contains invalid characters
+        """
+        self.tokens: List[Tuple[str, str, re.Match]] = []
+        position = 0
+        while position < len(source):
+            match = TOKEN.match(source, position)
+            if not match:
+                raise DiceExpressionError(f"Unexpected character '{source[position]}'")
+            self.tokens.append((match.lastgroup, match.group(match.lastgroup), match))
+            position = match.end()
+        self.index = 0
+        self.dice_count = 0
+        self.uses_character = False
+
+    def peek(self) -> Optional[str]:
+        """Get the text of the next token, None at the end."""
+        if self.index < len(self.tokens):
+            return self.tokens[self.index][1]
+        return None
+
+    def parse(self) -> Evaluator:
+        """Parse the whole expression.
+
+        Returns:
+            Evaluator: Root of the closure tree
+        """
+        if not self.tokens:
+            raise DiceExpressionError("The expression is empty")
+        evaluator = self.expression()
+        if self.index < len(self.tokens):
+            raise DiceExpressionError(f"Unexpected '{self.peek()}'")
+        return evaluator
+
+    def expression(self) -> Evaluator:
+        """Parse a sum or difference."""
+        left = self.term()
+        while self.peek() in ('+', '-'):
+            op = operator.add if self.tokens[self.index][1] == '+' else operator.sub
+            self.index += 1
+            left = _binary(op, left, self.term())
+        return left
+
+    def term(self) -> Evaluator:
+        """Parse a product or quotient."""
+        left = self.unary()
+        while self.peek() in ('*', '/'):
+            op = operator.mul if self.tokens[self.index][1] == '*' else _divide
+            self.index += 1
+            left = _binary(op, left, self.unary())
+        return left
+
+    def unary(self) -> Evaluator:
+        """Parse a negation."""
+        if self.peek() == '-':
+            self.index += 1
+            operand = self.unary()
+            return lambda dice, user, details: -operand(dice, user, details)
+        return self.atom()
+
+    def atom(self) -> Evaluator:
+        """Parse a number, dice term, identifier or parenthesized expression."""
+        if self.index >= len(self.tokens):
+            raise DiceExpressionError("The expression ends unexpectedly")
+        kind, text, match = self.tokens[self.index]
+        self.index += 1
+
+        if kind == 'number':
+            value = int(text)
+            return lambda dice, user, details: value
+        if kind == 'dice':
+            return self.dice(match)
+        if kind == 'ident':
+            name = IDENTIFIERS.get(text.upper())
+            if name is None:
+                raise DiceExpressionError(f"Unknown attribute '{text}'")
+            self.uses_character = True
+            return lambda dice, user, details: getattr(user, name)
+        if text == '(':
+            inner = self.expression()
+            if self.peek() != ')':
+                raise DiceExpressionError("Missing ')'")
+            self.index += 1
+            return inner
+        raise DiceExpressionError(f"Unexpected '{text}'")
+
+    def dice(self, match: re.Match) -> Evaluator:
+        """Build the evaluator of a dice term.
+
+        Args:
+            match (re.Match): Token match of the dice term
+
+        Returns:
+            Evaluator: Evaluator rolling all dice of the term at once
+        """
+        count = int(match.group(2) or 1)
+        sides = int(match.group(3))
+        if not 1 <= sides <= MAX_SIDES:
+            raise DiceExpressionError(f"Dice need 1 to {MAX_SIDES} sides")
+        self.dice_count += count
+        if self.dice_count > MAX_DICE:
+            raise DiceExpressionError(f"An expression can roll at most {MAX_DICE} dice")
+        label = f'{count}d{sides}'
+
+        def roll(dice: DiceSource, user: Optional[User], details: Details) -> int:
+            rolls = dice.roll_many(sides, count)
+            details.append((label, tuple(rolls)))
+            return sum(rolls)
+        return roll
+
+def _binary(op: Callable[[int, int], int], left: Evaluator, right: Evaluator) -> Evaluator:
+    """Combine two evaluators with a binary operator.
+
+    Args:
+        op (Callable[[int, int], int]): The operator
+        left (Evaluator): Left operand
+        right (Evaluator): Right operand
+
+    Returns:
+        Evaluator: Evaluator of the operation
+    """
+    return lambda dice, user, details: op(left(dice, user, details), right(dice, user, details))
+
+def _divide(left: int, right: int) -> int:
+    """Divide and round down, as in DSA.
+
+    Raises:
+        DiceExpressionError: If dividing by zero
+    """
+    if right == 0:
+        raise DiceExpressionError("Division by zero")
+    return left // right
+
+def compile_expression(expression: str) -> CompiledExpression:
+    """Compile a dice expression, reusing earlier compilations.
+
+    Args:
+        expression (str): Expression text, e.g. "2d6+4" or "1W20+MU"
+
+    Returns:
+        CompiledExpression: The compiled expression
+
+    Raises:
+        DiceExpressionError: If the expression is not valid
+    """
+    return _compile(''.join(expression.split()))
+
+@lru_cache(maxsize=512)
+def _compile(source: str) -> CompiledExpression:
+    """Compile a dice expression without whitespace.
+
+    Args:
+        source (str): Expression text without whitespace
+
+    Returns:
+        CompiledExpression: The compiled expression
+    """
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise DiceExpressionError(f"Expressions can be at most {MAX_EXPRESSION_LENGTH} characters long")
+    parser = _Parser(source)
+    evaluator = parser.parse()
+    return CompiledExpression(source, evaluator, parser.dice_count, parser.uses_character)
@@ -0,0 +1,79 @@
+"""Coalesced message edits for views of the DSA Bot."""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+import discord
+from config import EDIT_WINDOW
+
+logger = logging.getLogger(__name__)
+
+class EditCoalescer:
+    """Merges rapid button clicks on one message into few edits.
+
+    Clicks are acknowledged right away and only remember the latest
+    interaction. The message is edited at most once per window, rendered
+    from the view's state at that time, so the last state always wins.
+    While an edit is in flight, new clicks wait for the next window
+    instead of racing it.
+    """
+
+    def __init__(self, window: float = EDIT_WINDOW):
+        """Initialize the coalescer.
+
+        Args:
+            window (float, optional): Seconds to collect clicks before editing.
+                Defaults to EDIT_WINDOW.
+        """
+        self.window = window
+        self._interaction: Optional[discord.Interaction] = None
+        self._render: Optional[Callable[[], Dict[str, Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._editing = False
+
+    async def push(self, interaction: discord.Interaction, render: Callable[[], Dict[str, Any]]) -> None:
+        """Acknowledge a click and schedule an edit of its message.
+
+        Args:
+            interaction (discord.Interaction): The component interaction
+            render (Callable[[], Dict[str, Any]]): Returns the keyword arguments
+                of the edit, called when the edit is sent
+        """
+        if not interaction.response.is_done():
+            await interaction.response.defer()
+        self._interaction = interaction
+        self._render = render
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        """Send edits until no click is pending."""
+        while self._interaction is not None:
+            await asyncio.sleep(self.window)
+            interaction, render = self._interaction, self._render
+            self._interaction = None
+            if interaction is None:
+                return
+            self._editing = True
+            try:
+                await interaction.edit_original_response(**render())
+            except discord.HTTPException as e:
+                logger.warning("Error editing message: %s", e)
+            finally:
+                self._editing = False
+
+    async def close(self) -> None:
+        """Drop pending edits, e.g. before the view's message is replaced.
+
+        An edit already in flight is awaited, so it cannot land after the
+        caller's own edit.
+        """
+        self._interaction = None
+        task = self._task
+        self._task = None
+        if task is None or task.done():
+            return
+        if self._editing:
+            await task
+        else:
+            task.cancel()
@@ -0,0 +1,194 @@
+"""Cached embeds of the DSA Bot.
+
+Embeds of read-heavy commands are rendered once per version of the data
+they show and then reused. Static error embeds are built once at import.
+Cached embeds are shared between all callers, so never modify them;
+discord.py only reads an embed when sending it.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Hashable, List, Tuple
+import discord
+from models.user import User
+from utils.initiative import InitiativeTracker
+from utils.user_manager import character_version
+
+# Most embeds kept per cache, the least recently used are dropped first
+CACHE_SIZE = 1024
+
+# Embeds hold at most 25 fields
+ORDER_LIMIT = 25
+
+# Characters an embed description can hold
+DESCRIPTION_LIMIT = 4096
+
+class EmbedCache:
+    """Least recently used cache of rendered embeds.
+
+    Every entry remembers the version of the data it was rendered from
+    and is rendered again once the version changes.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE):
+        """Initialize the cache.
+
+        Args:
+            size (int, optional): Most embeds to keep. Defaults to CACHE_SIZE.
+        """
+        self.size = size
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, discord.Embed]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Get the number of cached embeds."""
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: Any, render: Callable[[], discord.Embed]) -> discord.Embed:
+        """Get a cached embed, rendering it if missing or outdated.
+
+        Args:
+            key (Hashable): What the embed shows, e.g. (guild, user)
+            version (Any): Version of the data, compared with ==
+            render (Callable[[], discord.Embed]): Renders the embed
+
+        Returns:
+            discord.Embed: The embed, not to be modified
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        embed = render()
+        self._entries[key] = (version, embed)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return embed
+
+    def clear(self) -> None:
+        """Drop all cached embeds."""
+        self._entries.clear()
+
+def join_lines(lines: List[str], limit: int = DESCRIPTION_LIMIT) -> Tuple[str, int]:
+    """Join as many whole lines as fit into an embed description.
+
+    Args:
+        lines (List[str]): The lines, in display order
+        limit (int, optional): Most characters of the text. Defaults to DESCRIPTION_LIMIT.
+
+    Returns:
+        Tuple[str, int]: The text and the number of lines left out
+    """
+    length = -1
+    for index, line in enumerate(lines):
+        length += len(line) + 1
+        if length > limit:
+            return "\n".join(lines[:index]), len(lines) - index
+    return "\n".join(lines), 0
+
+_sheets = EmbedCache()
+_orders = EmbedCache()
+
+def _help_field(embed: discord.Embed, whose: str) -> discord.Embed:
+    """Add the hint how to create a character to an embed."""
+    return embed.add_field(
+        name="How to create a character",
+        value=f'Use `/char_setup` to create {whose} character.',
+        inline=False
+    )
+
+NO_CHARACTERS_EMBED = _help_field(discord.Embed(
+    title="❌ No Characters Found",
+    description="No characters have been created yet!",
+    color=discord.Color.red()
+), 'a')
+
+NO_INITIATIVE_EMBED = discord.Embed(
+    title="❌ No Initiative Rolls",
+    description="No one has rolled for initiative yet!",
+    color=discord.Color.red()
+)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def no_character_embed(name: str) -> discord.Embed:
+    """Get the embed telling a user that they have no character.
+
+    Args:
+        name (str): Discord name of the user
+
+    Returns:
+        discord.Embed: The embed, not to be modified
+    """
+    return _help_field(discord.Embed(
+        title="❌ No Character Found",
+        description=f"No character found for {name}",
+        color=discord.Color.red()
+    ), 'your')
+
+def _render_sheet(user: User) -> discord.Embed:
+    """Render the character sheet of a user."""
+    embed = discord.Embed(
+        title=f"📊 Character Sheet: {user.char_name}",
+        color=discord.Color.blue()
+    )
+    embed.add_field(name="Player", value=user.name, inline=True)
+    embed.add_field(name="Initiative", value=str(user.ini), inline=True)
+    embed.add_field(name="MU (Mut)", value=str(user.MU), inline=True)
+    embed.add_field(name="KL (Klugheit)", value=str(user.KL), inline=True)
+    embed.add_field(name="IN (Intuition)", value=str(user.IN), inline=True)
+    embed.add_field(name="CH (Charisma)", value=str(user.CH), inline=True)
+    embed.add_field(name="FF (Fingerfertigkeit)", value=str(user.FF), inline=True)
+    embed.add_field(name="GE (Gewandtheit)", value=str(user.GE), inline=True)
+    embed.add_field(name="KO (Konstitution)", value=str(user.KO), inline=True)
+    embed.add_field(name="KK (Körperkraft)", value=str(user.KK), inline=True)
+    return embed
+
+def character_sheet_embed(user: User) -> discord.Embed:
+    """Get the character sheet of a user.
+
+    The sheet is rendered again after upsert_user or remove_user changed
+    the character, or when the guild was reloaded with new user objects.
+
+    Args:
+        user (User): The user
+
+    Returns:
+        discord.Embed: The embed, not to be modified
+    """
+    version = (user, character_version(user.guild_id, user.id))
+    return _sheets.get((user.guild_id, user.id), version, lambda: _render_sheet(user))
+
+def _render_order(tracker: InitiativeTracker) -> discord.Embed:
+    """Render the initiative order of a guild."""
+    embed = discord.Embed(
+        title="📋 Initiative Order",
+        color=discord.Color.blue()
+    )
+    for i, user in enumerate(tracker.users(0, ORDER_LIMIT), 1):
+        embed.add_field(
+            name=f"{i}. {user.char_name}",
+            value=f"Initiative: {user.current_ini}",
+            inline=False
+        )
+    if len(tracker) > ORDER_LIMIT:
+        embed.set_footer(text=f"... and {len(tracker) - ORDER_LIMIT} more")
+    return embed
+
+def initiative_order_embed(guild_id: str, tracker: InitiativeTracker) -> discord.Embed:
+    """Get the initiative order of a guild.
+
+    The order is rendered again after every roll, removal or reset, which
+    change the tracker's version, or when the guild got a new tracker.
+
+    Args:
+        guild_id (str): Roster key of the guild, see guild_key
+        tracker (InitiativeTracker): The guild's initiative order, not empty
+
+    Returns:
+        discord.Embed: The embed, not to be modified
+    """
+    return _orders.get(guild_id, (tracker, tracker.version), lambda: _render_order(tracker))
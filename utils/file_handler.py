@@ -1,39 +1,383 @@
 """File handling utilities for the DSA Bot."""
 
-from typing import List
-from models.user import User
-from config import INI_FILE_PATH
+import logging
+import os
+from typing import Dict, List, Optional
+from models.user import User, row_to_string
+from config import INI_FILE_PATH, JOURNAL_COMPACT_SIZE
+from utils.snapshot import read_snapshot, validate_row, write_snapshot
+from utils.storage import StorageBackend
 
-def load_users() -> List[User]:
-    """Load users from the ini file.
+logger = logging.getLogger(__name__)
+
+# Journal record types
+JOURNAL_UPSERT = 'U'
+JOURNAL_DELETE = 'D'
+
+def guild_file_path(guild_id: str) -> str:
+    """Get the ini file path of a guild's roster.
+
+    Characters without a guild use INI_FILE_PATH itself, every guild gets
+    its own path next to it, e.g. user.<guild_id>.txt. The binary snapshot
+    and the journal are named after this path, the CSV file at the path
+    itself is only read as an import when no snapshot exists yet.
+
+    Args:
+        guild_id (str): Discord guild ID, '' for characters without a guild
+
+    Returns:
+        str: Path of the ini file
+    """
+    if not guild_id:
+        return INI_FILE_PATH
+    root, ext = os.path.splitext(INI_FILE_PATH)
+    return f'{root}.{guild_id}{ext}'
+
+def journal_file_path(path: str) -> str:
+    """Get the journal file path belonging to an ini file.
+
+    Args:
+        path (str): Path of the ini file
+
+    Returns:
+        str: Path of the journal file
+    """
+    return f'{path}.journal'
+
+def snapshot_file_path(path: str) -> str:
+    """Get the binary snapshot path belonging to an ini file.
+
+    Args:
+        path (str): Path of the ini file
+
+    Returns:
+        str: Path of the snapshot file, e.g. user.bin for user.txt
+    """
+    return f'{os.path.splitext(path)[0]}.bin'
+
+def state_file_path(path: str, name: str) -> str:
+    """Get the path of a named state file belonging to an ini file.
+
+    Args:
+        path (str): Path of the ini file
+        name (str): Name of the state
+
+    Returns:
+        str: Path of the state file, e.g. user.combat.json for user.txt
+    """
+    return f'{os.path.splitext(path)[0]}.{name}.json'
+
+def history_file_path(path: str) -> str:
+    """Get the path of the roll archive belonging to an ini file.
+
+    Args:
+        path (str): Path of the ini file
+
+    Returns:
+        str: Path of the archive, e.g. user.history.gz for user.txt
+    """
+    return f'{os.path.splitext(path)[0]}.history.gz'
+
+def recent_file_path(path: str) -> str:
+    """Get the path of the latest archived rolls belonging to an ini file.
+
+    Args:
+        path (str): Path of the ini file
+
+    Returns:
+        str: Path of the file, e.g. user.history.recent for user.txt
+    """
+    return f'{os.path.splitext(path)[0]}.history.recent'
+
+def load_users(path: str = INI_FILE_PATH) -> List[User]:
+    """Load users of an ini file and replay its journal on top of them.
+
+    Users are read from the binary snapshot. Without a snapshot, the ini
+    file itself is imported as CSV.
+
+    Args:
+        path (str, optional): Path of the ini file. Defaults to INI_FILE_PATH.
 
     Returns:
         List[User]: List of loaded users
     """
+    users: Dict[str, User] = {}
+    snapshot_path = snapshot_file_path(path)
+    if os.path.exists(snapshot_path):
+        for user in read_snapshot(snapshot_path):
+            users[user.id] = user
+        logger.info('Loaded %d characters from %s', len(users), snapshot_path)
+    else:
+        for user in import_csv(path):
+            users[user.id] = user
+    replay_journal(users, journal_file_path(path))
+    return list(users.values())
+
+def import_csv(path: str) -> List[User]:
+    """Import users from a CSV file.
+
+    Invalid lines are skipped and reported instead of aborting the import.
+
+    Args:
+        path (str): Path of the CSV file
+
+    Returns:
+        List[User]: List of imported users
+    """
     users = []
+    bad_lines = []
     try:
-        with open(INI_FILE_PATH, 'r') as file:
-            print(f'Loading character file from {INI_FILE_PATH}')
-            for line in file:
-                user = User.from_string(line)
-                if user:
-                    users.append(user)
-            print(f'Loaded {len(users)} characters')
+        with open(path, 'r') as file:
+            logger.info('Importing character file from %s', path)
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    user = User.from_string(line)
+                    if user is None:
+                        raise ValueError('not enough fields')
+                    validate_row(user.to_row())
+                except ValueError as e:
+                    bad_lines.append((line_number, str(e)))
+                    continue
+                users.append(user)
     except FileNotFoundError:
-        print(f'No character file found at {INI_FILE_PATH}')
-        try:
-            with open(INI_FILE_PATH, 'x') as file:
-                print(f'Created new character file at {INI_FILE_PATH}')
-        except FileExistsError:
-            pass
+        logger.info('No character file found at %s', path)
+        return users
+
+    logger.info('Imported %d characters', len(users))
+    if bad_lines:
+        logger.warning('Skipped %d invalid lines in %s:', len(bad_lines), path)
+        for line_number, error in bad_lines[:10]:
+            logger.warning('- line %d: %s', line_number, error)
+        if len(bad_lines) > 10:
+            logger.warning('- ... and %d more', len(bad_lines) - 10)
     return users
 
-def save_users(users: List[User]) -> None:
-    """Save users to the ini file.
+def export_csv(users: List[User], path: str) -> None:
+    """Atomically export users to a CSV file.
+
+    The data is written to a temporary file first and then renamed over
+    the target, so a crash never leaves a half-written file.
 
     Args:
-        users (List[User]): List of users to save
+        users (List[User]): List of users to export
+        path (str): Path of the CSV file
     """
-    with open(INI_FILE_PATH, 'w') as file:
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
         for user in users:
-            file.write(f'{user.to_string()}\n') 
\ No newline at end of file
+            file.write(f'{user.to_string()}\n')
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def write_text(text: str, path: str) -> None:
+    """Atomically write a text file.
+
+    Args:
+        text (str): Content of the file
+        path (str): Path of the file
+    """
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def upsert_record(row: tuple) -> str:
+    """Build a journal record that stores a user.
+
+    Args:
+        row (tuple): User row, see User.to_row
+
+    Returns:
+        str: Journal record
+    """
+    return f'{JOURNAL_UPSERT},{row_to_string(row)}'
+
+def delete_record(user_id: str) -> str:
+    """Build a journal record that deletes a user.
+
+    Args:
+        user_id (str): Discord user ID
+
+    Returns:
+        str: Journal record
+    """
+    return f'{JOURNAL_DELETE},{user_id}'
+
+def append_journal(records: List[str], journal_path: str) -> int:
+    """Append records to a journal.
+
+    Args:
+        records (List[str]): Journal records, one per line
+        journal_path (str): Path of the journal file
+
+    Returns:
+        int: Size of the journal in bytes after the append
+    """
+    with open(journal_path, 'a') as file:
+        file.write(''.join(f'{record}\n' for record in records))
+        file.flush()
+        os.fsync(file.fileno())
+        return os.fstat(file.fileno()).st_size
+
+def replay_journal(users: Dict[str, User], journal_path: str) -> None:
+    """Apply all journal records to the given users.
+
+    Only complete records are applied. A record cut off by a crash is
+    dropped and truncated from the journal, so later appends start on a
+    clean line.
+
+    Args:
+        users (Dict[str, User]): Users keyed by Discord ID, updated in place
+        journal_path (str): Path of the journal file
+    """
+    try:
+        with open(journal_path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return
+
+    applied = 0
+    offset = 0
+    while offset < len(data):
+        end = data.find(b'\n', offset)
+        if end == -1:
+            logger.warning('Dropping incomplete journal record at byte %d', offset)
+            with open(journal_path, 'r+b') as file:
+                file.truncate(offset)
+            break
+        record = data[offset:end].decode('utf-8', errors='replace')
+        offset = end + 1
+
+        kind, _, payload = record.partition(',')
+        try:
+            if kind == JOURNAL_UPSERT:
+                user = User.from_string(payload)
+                if user:
+                    users[user.id] = user
+            elif kind == JOURNAL_DELETE:
+                users.pop(payload.strip(), None)
+            else:
+                continue
+        except ValueError:
+            logger.warning('Skipping invalid journal record: %s', record)
+            continue
+        applied += 1
+
+    if applied:
+        logger.info('Replayed %d journal records from %s', applied, journal_path)
+
+def compact_journal(rows: List[tuple], path: str) -> None:
+    """Fold an ini file's journal into a new binary snapshot.
+
+    The snapshot must reflect the state after the last journal record.
+    Replaying the journal onto it then yields the same state, so a crash
+    between writing the snapshot and truncating the journal loses nothing.
+
+    Args:
+        rows (List[tuple]): User rows, see User.to_row
+        path (str): Path of the ini file
+    """
+    write_snapshot(snapshot_file_path(path), rows)
+    with open(journal_file_path(path), 'w') as file:
+        file.flush()
+        os.fsync(file.fileno())
+
+class FileStorage(StorageBackend):
+    """Flat file backend storing a binary snapshot plus an append-only journal per guild."""
+
+    def __init__(self):
+        """Initialize the file storage backend."""
+        super().__init__()
+        self.journal_sizes: Dict[str, int] = {}
+
+    def needs_snapshot(self, guild_id: str) -> bool:
+        """Whether a guild's journal has grown past JOURNAL_COMPACT_SIZE.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+
+        Returns:
+            bool: True if the journal should be compacted
+        """
+        return self.journal_sizes.get(guild_id, 0) >= JOURNAL_COMPACT_SIZE
+
+    def load_users(self, guild_id: str) -> List[User]:
+        """Load a guild's users from its snapshot and journal.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+
+        Returns:
+            List[User]: List of loaded users
+        """
+        path = guild_file_path(guild_id)
+        imported = not os.path.exists(snapshot_file_path(path))
+        users = load_users(path)
+        if imported and users:
+            # Switch over to the binary snapshot right away
+            compact_journal([user.to_row() for user in users], path)
+            logger.info('Stored imported characters in %s, %s is no longer updated',
+                        snapshot_file_path(path), path)
+        try:
+            self.journal_sizes[guild_id] = os.path.getsize(journal_file_path(path))
+        except OSError:
+            self.journal_sizes[guild_id] = 0
+        return users
+
+    def write_changes(self, guild_id: str, upserts: List[tuple], deletes: List[str],
+                      snapshot: Optional[List[tuple]] = None) -> None:
+        """Append changes to a guild's journal and optionally compact it.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            upserts (List[tuple]): Rows of changed users, see User.to_row
+            deletes (List[str]): Discord IDs of removed users
+            snapshot (Optional[List[tuple]], optional): Rows of all users of the
+                guild to compact the journal into. Defaults to None.
+        """
+        path = guild_file_path(guild_id)
+        records = [upsert_record(row) for row in upserts]
+        records.extend(delete_record(user_id) for user_id in deletes)
+        if records:
+            self.journal_sizes[guild_id] = append_journal(records, journal_file_path(path))
+        if snapshot is not None:
+            compact_journal(snapshot, path)
+            self.journal_sizes[guild_id] = 0
+
+    def load_state(self, guild_id: str, name: str) -> Optional[str]:
+        """Load a named piece of guild state from its file.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            name (str): Name of the state
+
+        Returns:
+            Optional[str]: The stored value or None if there is none
+        """
+        try:
+            with open(state_file_path(guild_file_path(guild_id), name), 'r') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def write_state(self, guild_id: str, name: str, value: Optional[str]) -> None:
+        """Atomically write a named piece of guild state to its file.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            name (str): Name of the state
+            value (Optional[str]): Value to store, None removes the state
+        """
+        path = state_file_path(guild_file_path(guild_id), name)
+        if value is None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return
+        write_text(value, path)
@@ -0,0 +1,568 @@
+"""Roll history of the DSA Bot.
+
+Every throw and initiative roll is packed into a fixed-width record:
+
+    time (I), guild ID (Q), Discord ID (Q), kind (B), flags (B),
+    modifier (h), attributes (3B), rolls (3B), result (h)
+
+Attributes are stored as their position in ATTRIBUTES plus one, 0 marks
+an unused slot. All integers are little endian.
+
+The latest HISTORY_SIZE records of each character are kept in memory for
+/history. New records are also queued per guild and appended in batches
+by a background task to the guild's archive, a file of concatenated gzip
+members that reads as one stream of records. Recording a roll only packs
+the record and appends it to two lists.
+
+Every flush also rewrites the guild's recent file: the archive size it
+covers, followed by the latest records of each character. After a
+restart, the recent history is read from it and from the archive members
+appended after it, so loading does not grow with the archive.
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import itertools
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+from config import HISTORY_FLUSH_INTERVAL, HISTORY_SIZE
+from models.user import ATTRIBUTES
+from utils.checks import CheckResult
+from utils.file_handler import guild_file_path, history_file_path, recent_file_path
+from utils.metrics import Counter, Histogram
+from utils.user_manager import guild_key
+
+logger = logging.getLogger(__name__)
+
+RECORD = struct.Struct('<IQQBBh3B3Bh')
+
+# Record kinds
+KIND_CHECK = 1
+KIND_INITIATIVE = 2
+KIND_NAMES = {KIND_CHECK: 'check', KIND_INITIATIVE: 'initiative'}
+
+# Attributes are stored as their position in ATTRIBUTES plus one
+ATTRIBUTE_CODES = {attr: code for code, attr in enumerate(ATTRIBUTES, 1)}
+
+# Record flags
+FLAG_SUCCESS = 1
+FLAG_PARTY = 2
+FLAG_DOOM = 4
+FLAG_DEBUG = 8
+
+# Header of a recent file: size of the archive its records cover
+RECENT_HEADER = struct.Struct('<Q')
+
+# Bytes decompressed from an archive at once
+READ_SIZE = 1 << 16
+# Start of every gzip member and zlib window bits of a gzip stream
+GZIP_MAGIC = b'\x1f\x8b\x08'
+GZIP_WBITS = 31
+
+ROLLS_RECORDED = Counter('dsa_rolls_recorded_total', 'Rolls added to the history', ['kind'])
+HISTORY_FLUSH_SECONDS = Histogram('dsa_history_flush_seconds', 'Duration of appending rolls to the archives')
+
+# Latest records per guild and user, and records not yet archived per guild
+_recent: Dict[str, Dict[str, Deque[bytes]]] = {}
+_pending: Dict[str, List[bytes]] = {}
+# Guilds whose recent records were read back from disk
+_loaded: Set[str] = set()
+
+# Archive I/O runs on its own worker thread, in order; the lock keeps
+# flushes and archive reads from interleaving
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='history')
+_lock = asyncio.Lock()
+_flush_task: Optional[asyncio.Task] = None
+
+class Roll(NamedTuple):
+    """A recorded roll."""
+
+    time: int
+    guild_id: str
+    user_id: str
+    kind: int
+    flags: int
+    modifier: int
+    attributes: Tuple[str, ...]
+    rolls: Tuple[int, ...]
+    result: int
+
+def pack_roll(guild_id: str, user_id: str, kind: int, flags: int, modifier: int,
+              attributes: Sequence[str], rolls: Sequence[int], result: int,
+              timestamp: Optional[float] = None) -> bytes:
+    """Pack a roll into a record.
+
+    Args:
+        guild_id (str): Roster key of the guild, see guild_key
+        user_id (str): Discord user ID
+        kind (int): KIND_CHECK or KIND_INITIATIVE
+        flags (int): FLAG_* bits
+        modifier (int): Modifier of the roll
+        attributes (Sequence[str]): Checked attributes, at most 3
+        rolls (Sequence[int]): Die results, at most 3
+        result (int): Total difference of a check or total initiative
+        timestamp (Optional[float], optional): Time of the roll. Defaults to now.
+
+    Returns:
+        bytes: The record
+
+    Raises:
+        struct.error: If a value does not fit its field
+    """
+    codes = [ATTRIBUTE_CODES[attr] for attr in attributes] + [0] * (3 - len(attributes))
+    dice = list(rolls) + [0] * (3 - len(rolls))
+    return RECORD.pack(int(timestamp if timestamp is not None else time.time()), int(guild_id or 0),
+                       int(user_id), kind, flags, modifier, *codes, *dice, result)
+
+def unpack_roll(record: bytes) -> Roll:
+    """Unpack a record.
+
+    Args:
+        record (bytes): Record packed by pack_roll
+
+    Returns:
+        Roll: The roll
+    """
+    return _to_roll(RECORD.unpack(record))
+
+def _to_roll(values: tuple) -> Roll:
+    """Convert the unpacked fields of a record to a Roll."""
+    timestamp, guild_id, user_id, kind, flags, modifier = values[:6]
+    return Roll(
+        time=timestamp,
+        guild_id=str(guild_id) if guild_id else '',
+        user_id=str(user_id),
+        kind=kind,
+        flags=flags,
+        modifier=modifier,
+        attributes=tuple(ATTRIBUTES[code - 1] for code in values[6:9] if code),
+        rolls=tuple(roll for roll in values[9:12] if roll),
+        result=values[12],
+    )
+
+def _user_recent(guild_recent: Dict[str, Deque[bytes]], user_id: str) -> Deque[bytes]:
+    """Get the latest records of a character, creating them if missing."""
+    recent = guild_recent.get(user_id)
+    if recent is None:
+        recent = guild_recent[user_id] = deque(maxlen=HISTORY_SIZE)
+    return recent
+
+def _add(guild_id: str, user_id: str, record: bytes) -> None:
+    """Add a record to the recent history and the archive queue."""
+    _user_recent(_recent.setdefault(guild_id, {}), user_id).append(record)
+    _pending.setdefault(guild_id, []).append(record)
+
+def record_check(guild_id, user_id: str, attributes: Sequence[str], modifier: int,
+                 check: CheckResult, debug: bool = False) -> None:
+    """Record an attribute check.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str): Discord user ID of the character
+        attributes (Sequence[str]): Checked attributes
+        modifier (int): Modifier of the check
+        check (CheckResult): Outcome of the check
+        debug (bool, optional): Whether the dice were forced by the debug option. Defaults to False.
+    """
+    flags = ((FLAG_SUCCESS if check.all_success else 0) | (FLAG_PARTY if check.party_effect else 0)
+             | (FLAG_DOOM if check.doom_effect else 0) | (FLAG_DEBUG if debug else 0))
+    guild_id = guild_key(guild_id)
+    try:
+        record = pack_roll(guild_id, user_id, KIND_CHECK, flags, modifier,
+                           attributes, check.rolls[:3], check.total_diff)
+    except struct.error:
+        # An out of range modifier must not fail the throw
+        logger.warning("Check of %s not recorded", user_id, exc_info=True)
+        return
+    _add(guild_id, user_id, record)
+    ROLLS_RECORDED.inc(kind='check')
+
+def record_checks(guild_id, attributes: Sequence[str], modifier: int,
+                  checks: Sequence[Tuple[str, CheckResult]]) -> None:
+    """Record the same attribute check of a group of characters.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        attributes (Sequence[str]): Checked attributes
+        modifier (int): Modifier of the checks
+        checks (Sequence[Tuple[str, CheckResult]]): Discord user ID and outcome of every check
+    """
+    guild_id = guild_key(guild_id)
+    # Fields shared by all records of the group
+    timestamp = int(time.time())
+    guild = int(guild_id or 0)
+    codes = [ATTRIBUTE_CODES[attr] for attr in attributes] + [0] * (3 - len(attributes))
+    guild_recent = _recent.setdefault(guild_id, {})
+    pending = _pending.setdefault(guild_id, [])
+    recorded = 0
+    for user_id, check in checks:
+        flags = ((FLAG_SUCCESS if check.all_success else 0) | (FLAG_PARTY if check.party_effect else 0)
+                 | (FLAG_DOOM if check.doom_effect else 0))
+        dice = check.rolls[:3] + (0,) * (3 - len(check.rolls))
+        try:
+            record = RECORD.pack(timestamp, guild, int(user_id), KIND_CHECK, flags, modifier,
+                                 *codes, *dice, check.total_diff)
+        except struct.error:
+            logger.warning("Check of %s not recorded", user_id, exc_info=True)
+            continue
+        _user_recent(guild_recent, user_id).append(record)
+        pending.append(record)
+        recorded += 1
+    ROLLS_RECORDED.inc(recorded, kind='check')
+
+def record_initiative(guild_id, user_id: str, roll: int, modifier: int, total: int) -> None:
+    """Record an initiative roll.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str): Discord user ID of the character
+        roll (int): The d6 result
+        modifier (int): Modifier of the roll
+        total (int): Resulting initiative
+    """
+    guild_id = guild_key(guild_id)
+    try:
+        record = pack_roll(guild_id, user_id, KIND_INITIATIVE, 0, modifier, (), (roll,), total)
+    except struct.error:
+        logger.warning("Initiative roll of %s not recorded", user_id, exc_info=True)
+        return
+    _add(guild_id, user_id, record)
+    ROLLS_RECORDED.inc(kind='initiative')
+
+def archive_path(guild_id: str) -> str:
+    """Get the archive path of a guild.
+
+    Args:
+        guild_id (str): Roster key of the guild, see guild_key
+
+    Returns:
+        str: Path of the archive, e.g. user.<guild_id>.history.gz
+    """
+    return history_file_path(guild_file_path(guild_id))
+
+def recent_path(guild_id: str) -> str:
+    """Get the recent file path of a guild.
+
+    Args:
+        guild_id (str): Roster key of the guild, see guild_key
+
+    Returns:
+        str: Path of the recent file, e.g. user.<guild_id>.history.recent
+    """
+    return recent_file_path(guild_file_path(guild_id))
+
+def append_archive(path: str, records: List[bytes]) -> None:
+    """Append records to an archive as one gzip member.
+
+    Args:
+        path (str): Path of the archive
+        records (List[bytes]): Records to append
+    """
+    data = gzip.compress(b''.join(records))
+    with open(path, 'ab') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+def _next_member(data: mmap.mmap, start: int) -> int:
+    """Find the start of the next gzip member, or the end of the archive."""
+    position = data.find(GZIP_MAGIC, start)
+    return len(data) if position < 0 else position
+
+def _read_member(data: mmap.mmap, offset: int) -> Tuple[Optional[bytes], int]:
+    """Decompress the gzip member starting at an offset.
+
+    Args:
+        data (mmap.mmap): The archive
+        offset (int): Start of the member
+
+    Returns:
+        Tuple[Optional[bytes], int]: The records of the member, None if it
+            is damaged, and the offset of the next member
+    """
+    decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+    output = []
+    position = offset
+    try:
+        while not decompressor.eof and position < len(data):
+            chunk = data[position:position + READ_SIZE]
+            position += len(chunk)
+            output.append(decompressor.decompress(chunk))
+    except zlib.error:
+        return None, _next_member(data, offset + 1)
+    if not decompressor.eof:
+        return None, _next_member(data, offset + 1)
+    return b''.join(output), position - len(decompressor.unused_data)
+
+def read_archive(path: str, start: int = 0) -> Iterator[bytes]:
+    """Read the records of an archive, oldest first.
+
+    A member cut short by a crash is skipped, reading goes on with the
+    members appended after it.
+
+    Args:
+        path (str): Path of the archive
+        start (int, optional): Offset of the first member to read. Defaults to 0.
+
+    Yields:
+        bytes: Blocks of whole records, see RECORD
+    """
+    try:
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with file:
+        if not os.fstat(file.fileno()).st_size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = start
+            while offset < len(data):
+                block, following = _read_member(data, offset)
+                if block is None or len(block) % RECORD.size:
+                    logger.warning("Skipping damaged data at byte %d of archive %s", offset, path)
+                if block:
+                    yield block[:len(block) - len(block) % RECORD.size]
+                offset = following
+
+def write_recent(path: str, archive_size: int, records: List[bytes]) -> None:
+    """Atomically write a recent file.
+
+    Args:
+        path (str): Path of the recent file
+        archive_size (int): Size of the archive the records cover
+        records (List[bytes]): Latest records of every character, oldest first per character
+    """
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(RECENT_HEADER.pack(archive_size))
+        file.write(b''.join(records))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def _add_blocks(recent: Dict[str, Deque[bytes]], blocks: Iterable[bytes]) -> None:
+    """Add blocks of records, oldest first, to the latest records per character."""
+    for block in blocks:
+        for offset in range(0, len(block), RECORD.size):
+            record = block[offset:offset + RECORD.size]
+            _user_recent(recent, str(int.from_bytes(record[12:20], 'little'))).append(record)
+
+def _read_recent(guild_id: str) -> Dict[str, Deque[bytes]]:
+    """Read the latest records of every character of a guild.
+
+    Reads the recent file and the archive members appended after it was
+    written, e.g. by a flush cut short by a crash. Without a usable recent
+    file, e.g. for archives of older versions, the whole archive is read.
+
+    Args:
+        guild_id (str): Roster key of the guild, see guild_key
+
+    Returns:
+        Dict[str, Deque[bytes]]: Latest records by Discord user ID
+    """
+    path = archive_path(guild_id)
+    recent: Dict[str, Deque[bytes]] = {}
+    covered = 0
+    try:
+        with open(recent_path(guild_id), 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        data = b''
+    if len(data) >= RECENT_HEADER.size and not (len(data) - RECENT_HEADER.size) % RECORD.size:
+        covered, = RECENT_HEADER.unpack_from(data)
+        _add_blocks(recent, [data[RECENT_HEADER.size:]])
+    elif data:
+        logger.warning("Ignoring damaged recent file of guild %s", guild_id)
+    try:
+        archive_size = os.path.getsize(path)
+    except FileNotFoundError:
+        archive_size = 0
+    if covered > archive_size:
+        # The archive was replaced, its recent file is outdated
+        recent.clear()
+        covered = 0
+    _add_blocks(recent, read_archive(path, covered))
+    return recent
+
+async def _load_locked(guild_id: str) -> None:
+    """Fill the recent history of a guild from disk, the caller holds _lock."""
+    if guild_id in _loaded:
+        return
+    loop = asyncio.get_running_loop()
+    archived = await loop.run_in_executor(_executor, _read_recent, guild_id)
+    # Disk holds everything flushed so far, only pending records are newer
+    _add_blocks(archived, _pending.get(guild_id, []))
+    _recent[guild_id] = archived
+    _loaded.add(guild_id)
+
+async def _load_guild(guild_id: str) -> None:
+    """Fill the recent history of a guild from disk, once per run."""
+    async with _lock:
+        await _load_locked(guild_id)
+
+def _archive(guild_id: str, records: List[bytes], recent: List[bytes]) -> None:
+    """Append records to a guild's archive and rewrite its recent file.
+
+    Args:
+        guild_id (str): Roster key of the guild, see guild_key
+        records (List[bytes]): Records to archive
+        recent (List[bytes]): Latest records of every character, including the new ones
+    """
+    path = archive_path(guild_id)
+    append_archive(path, records)
+    try:
+        write_recent(recent_path(guild_id), os.path.getsize(path), recent)
+    except OSError:
+        # The records are archived, the next load reads them from the archive
+        logger.warning("Could not write the recent file of guild %s", guild_id, exc_info=True)
+
+async def recent_rolls(guild_id, user_id: str, count: int = HISTORY_SIZE) -> List[Roll]:
+    """Get the latest rolls of a character, newest first.
+
+    Rolls from before a restart are read back from disk the first time
+    the guild's history is asked for.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str): Discord user ID
+        count (int, optional): Most rolls to return. Defaults to HISTORY_SIZE.
+
+    Returns:
+        List[Roll]: The rolls
+    """
+    guild_id = guild_key(guild_id)
+    if guild_id not in _loaded:
+        await _load_guild(guild_id)
+    recent = _recent.get(guild_id, {}).get(str(user_id), ())
+    return [unpack_roll(record) for record in list(recent)[::-1][:count]]
+
+async def flush_history() -> None:
+    """Append the queued records of every guild to its archive."""
+    global _pending
+    async with _lock:
+        if not _pending:
+            return
+        started = time.perf_counter()
+        errors = []
+        # The recent files hold the latest records from before the restart too
+        for guild_id in list(_pending):
+            try:
+                await _load_locked(guild_id)
+            except Exception as e:
+                logger.warning("Could not read the recent history of guild %s", guild_id, exc_info=True)
+                errors.append(e)
+        pending, _pending = _pending, {}
+        loop = asyncio.get_running_loop()
+        for guild_id, records in pending.items():
+            if guild_id not in _loaded:
+                _pending[guild_id] = records + _pending.get(guild_id, [])
+                continue
+            recent = [b''.join(user_recent) for user_recent in _recent.get(guild_id, {}).values()]
+            try:
+                await loop.run_in_executor(_executor, _archive, guild_id, records, recent)
+            except Exception as e:
+                # Keep the records for the next flush, in front of newer ones
+                _pending[guild_id] = records + _pending.get(guild_id, [])
+                errors.append(e)
+        HISTORY_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        if errors:
+            raise errors[0]
+
+def write_csv(guild_id: str, output: io.BufferedIOBase, pending: List[bytes],
+              names: Dict[str, str], user_id: Optional[str] = None) -> int:
+    """Write a guild's rolls as gzip compressed CSV.
+
+    Args:
+        guild_id (str): Roster key of the guild, see guild_key
+        output (io.BufferedIOBase): Binary file to write to
+        pending (List[bytes]): Records not archived yet, written last
+        names (Dict[str, str]): Character names by Discord ID
+        user_id (Optional[str], optional): Only export this character's rolls. Defaults to None.
+
+    Returns:
+        int: Number of exported rolls
+    """
+    count = 0
+    with gzip.open(output, 'wt', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['time', 'user_id', 'character', 'kind', 'attributes', 'modifier',
+                         'rolls', 'result', 'success', 'party_effect', 'doom_effect', 'debug'])
+        for block in itertools.chain(read_archive(archive_path(guild_id)), [b''.join(pending)]):
+            for values in RECORD.iter_unpack(block):
+                roll = _to_roll(values)
+                if user_id is not None and roll.user_id != user_id:
+                    continue
+                writer.writerow([
+                    time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(roll.time)), roll.user_id,
+                    names.get(roll.user_id, ''), KIND_NAMES.get(roll.kind, roll.kind),
+                    '/'.join(roll.attributes), roll.modifier, '/'.join(map(str, roll.rolls)), roll.result,
+                    int(bool(roll.flags & FLAG_SUCCESS)), int(bool(roll.flags & FLAG_PARTY)),
+                    int(bool(roll.flags & FLAG_DOOM)), int(bool(roll.flags & FLAG_DEBUG)),
+                ])
+                count += 1
+    return count
+
+async def export_history(guild_id, names: Dict[str, str],
+                         user_id: Optional[str] = None) -> Tuple[bytes, int]:
+    """Export a guild's rolls as gzip compressed CSV.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        names (Dict[str, str]): Character names by Discord ID
+        user_id (Optional[str], optional): Only export this character's rolls. Defaults to None.
+
+    Returns:
+        Tuple[bytes, int]: The compressed CSV and the number of rolls in it
+    """
+    guild_id = guild_key(guild_id)
+    async with _lock:
+        pending = list(_pending.get(guild_id, []))
+        output = io.BytesIO()
+        loop = asyncio.get_running_loop()
+        count = await loop.run_in_executor(_executor, write_csv, guild_id, output, pending,
+                                           names, user_id)
+    return output.getvalue(), count
+
+async def _flush_loop(interval: float) -> None:
+    """Periodically archive queued records.
+
+    Args:
+        interval (float): Seconds between flushes
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_history()
+        except Exception:
+            logger.exception("Error archiving rolls")
+
+def start_history(interval: float = HISTORY_FLUSH_INTERVAL) -> None:
+    """Start the background archiving task.
+
+    Args:
+        interval (float, optional): Seconds between flushes. Defaults to HISTORY_FLUSH_INTERVAL.
+    """
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_loop(interval))
+
+async def stop_history() -> None:
+    """Stop the background archiving task and archive the queued records."""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush_history()
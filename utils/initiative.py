@@ -0,0 +1,296 @@
+"""Initiative tracking for the DSA Bot."""
+
+import json
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from models.user import User
+
+# Sort key: highest initiative first, ties go to the higher base
+# initiative, then by character name
+OrderKey = Tuple[int, int, str, str]
+
+class InitiativeTracker:
+    """Initiative order of one guild, kept sorted as rolls come in.
+
+    A character takes part while its current initiative is not 0.
+    Updates cost O(log n) to find the position plus the list shift,
+    reading the first k entries costs O(k). The version counts the
+    changes of the order, for caches of what is rendered from it.
+    """
+
+    def __init__(self, users: Iterable[User] = ()):
+        """Initialize the tracker.
+
+        Args:
+            users (Iterable[User], optional): Users to track. Defaults to ().
+        """
+        self._order: List[OrderKey] = []
+        self._keys: Dict[str, OrderKey] = {}
+        self._users: Dict[str, User] = {}
+        self.version = 0
+        for user in users:
+            if user.current_ini:
+                key = self._key(user)
+                self._order.append(key)
+                self._keys[user.id] = key
+                self._users[user.id] = user
+        self._order.sort()
+
+    @staticmethod
+    def _key(user: User) -> OrderKey:
+        """Get the sort key of a user.
+
+        Args:
+            user (User): The user
+
+        Returns:
+            OrderKey: Key sorting the user into the initiative order
+        """
+        return (-user.current_ini, -user.ini, user.char_name, user.id)
+
+    def __len__(self) -> int:
+        """Get the number of characters in the initiative order."""
+        return len(self._order)
+
+    def __contains__(self, user_id: str) -> bool:
+        """Whether a character is in the initiative order."""
+        return user_id in self._keys
+
+    def update(self, user: User) -> None:
+        """Move a user to the position of its current initiative.
+
+        Args:
+            user (User): The user, removed from the order if its current
+                initiative is 0
+        """
+        self.remove(user.id)
+        if user.current_ini:
+            key = self._key(user)
+            insort(self._order, key)
+            self._keys[user.id] = key
+            self._users[user.id] = user
+            self.version += 1
+
+    def remove(self, user_id: str) -> Optional[User]:
+        """Remove a user from the initiative order.
+
+        Args:
+            user_id (str): Discord user ID
+
+        Returns:
+            Optional[User]: The removed user or None if not in the order
+        """
+        key = self._keys.pop(user_id, None)
+        if key is None:
+            return None
+        del self._order[bisect_left(self._order, key)]
+        self.version += 1
+        return self._users.pop(user_id)
+
+    def clear(self) -> List[User]:
+        """Remove everyone from the initiative order.
+
+        Returns:
+            List[User]: The removed users
+        """
+        users = list(self._users.values())
+        self._order.clear()
+        self._keys.clear()
+        self._users.clear()
+        self.version += 1
+        return users
+
+    def index(self, user_id: str) -> int:
+        """Get the position of a user in the initiative order.
+
+        Args:
+            user_id (str): Discord user ID
+
+        Returns:
+            int: Zero-based position
+
+        Raises:
+            KeyError: If the user is not in the order
+        """
+        return bisect_left(self._order, self._keys[user_id])
+
+    def users(self, start: int = 0, stop: Optional[int] = None) -> List[User]:
+        """Get a slice of the initiative order.
+
+        Args:
+            start (int, optional): First position. Defaults to 0.
+            stop (Optional[int], optional): Position after the last one. Defaults to the end.
+
+        Returns:
+            List[User]: Users in initiative order
+        """
+        return [self._users[key[3]] for key in self._order[start:stop]]
+
+class Combat:
+    """Turn order of a running combat on top of a guild's initiative order.
+
+    The turn pointer is the Discord ID of the acting character, so rolls
+    that join or leave the order mid-combat do not shift it. Delayed
+    characters are skipped until they act with ready or the round ends.
+    """
+
+    def __init__(self, tracker: InitiativeTracker):
+        """Initialize a combat that has not started yet.
+
+        Args:
+            tracker (InitiativeTracker): The guild's initiative order
+        """
+        self.tracker = tracker
+        self.round = 1
+        self.current: Optional[str] = None
+        self.resume: Optional[str] = None
+        self.delayed: Set[str] = set()
+        self.channel_id: Optional[int] = None
+        self.message_id: Optional[int] = None
+
+    def current_user(self) -> Optional[User]:
+        """Get the acting character.
+
+        Returns:
+            Optional[User]: The acting character or None if there is none
+        """
+        if self.current is None or self.current not in self.tracker:
+            return None
+        return self.tracker.users(self.tracker.index(self.current))[0]
+
+    def start(self) -> Optional[User]:
+        """Start the first round with the highest initiative.
+
+        Returns:
+            Optional[User]: The acting character or None if no one has rolled
+        """
+        self.round = 1
+        self.resume = None
+        self.delayed.clear()
+        self.current = None
+        self._step(0, 1)
+        return self.current_user()
+
+    def _position(self) -> int:
+        """Get the position of the acting character, -1 if it left the order."""
+        if self.current is None or self.current not in self.tracker:
+            return -1
+        return self.tracker.index(self.current)
+
+    def _step(self, position: int, direction: int) -> None:
+        """Move the turn to the next character that is not delayed.
+
+        Args:
+            position (int): Position to start looking at
+            direction (int): 1 to move forward, -1 to move back
+        """
+        count = len(self.tracker)
+        self.current = None
+        if not count:
+            return
+        for _ in range(2 * count + 1):
+            if position >= count:
+                # Delayed actions lapse at the end of the round
+                self.round += 1
+                self.delayed.clear()
+                position = 0
+            elif position < 0:
+                self.round = max(1, self.round - 1)
+                position = count - 1
+            user = self.tracker.users(position, position + 1)[0]
+            if user.id not in self.delayed:
+                self.current = user.id
+                return
+            position += direction
+
+    def next(self) -> Optional[User]:
+        """End the current turn.
+
+        After a readied action, the turn returns to the character it
+        interrupted.
+
+        Returns:
+            Optional[User]: The acting character or None if no one has rolled
+        """
+        if self.resume is not None:
+            self.current, self.resume = self.resume, None
+            if self.current in self.tracker and self.current not in self.delayed:
+                return self.current_user()
+            self._step(0, 1)
+            return self.current_user()
+        self._step(self._position() + 1, 1)
+        return self.current_user()
+
+    def prev(self) -> Optional[User]:
+        """Go back to the previous turn.
+
+        Returns:
+            Optional[User]: The acting character or None if no one has rolled
+        """
+        self.resume = None
+        position = self._position()
+        self._step(position - 1 if position >= 0 else 0, -1)
+        return self.current_user()
+
+    def delay(self) -> Optional[User]:
+        """Let the acting character delay its action and move on.
+
+        Returns:
+            Optional[User]: The acting character or None if no one has rolled
+        """
+        if self.current is not None:
+            self.delayed.add(self.current)
+        return self.next()
+
+    def ready(self, user_id: str) -> bool:
+        """Let a delayed character act now, interrupting the current turn.
+
+        Args:
+            user_id (str): Discord user ID of the delayed character
+
+        Returns:
+            bool: False if the character has not delayed its action
+        """
+        if user_id not in self.delayed or user_id not in self.tracker:
+            return False
+        self.delayed.discard(user_id)
+        if self.resume is None:
+            self.resume = self.current
+        self.current = user_id
+        return True
+
+    def to_json(self) -> str:
+        """Serialize the combat for storage.
+
+        Returns:
+            str: The combat state as JSON
+        """
+        return json.dumps({
+            'round': self.round,
+            'current': self.current,
+            'resume': self.resume,
+            'delayed': sorted(self.delayed),
+            'channel_id': self.channel_id,
+            'message_id': self.message_id,
+        })
+
+    @classmethod
+    def from_json(cls, tracker: InitiativeTracker, data: str) -> 'Combat':
+        """Restore a stored combat.
+
+        Args:
+            tracker (InitiativeTracker): The guild's initiative order
+            data (str): The combat state as JSON, see to_json
+
+        Returns:
+            Combat: The restored combat
+        """
+        state = json.loads(data)
+        combat = cls(tracker)
+        combat.round = state['round']
+        combat.current = state['current']
+        combat.resume = state['resume']
+        combat.delayed = set(state['delayed'])
+        combat.channel_id = state['channel_id']
+        combat.message_id = state['message_id']
+        return combat
@@ -0,0 +1,142 @@
+"""Instrumentation of app commands and views for the DSA Bot."""
+
+import logging
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import discord
+from discord import app_commands
+from utils.metrics import Counter, Gauge, Histogram
+
+COMMAND_SECONDS = Histogram('dsa_command_seconds', 'Latency of app commands', ['command'])
+COMMAND_ERRORS = Counter('dsa_command_errors_total', 'Errors raised or logged by app commands', ['command'])
+CALLBACK_SECONDS = Histogram('dsa_view_callback_seconds', 'Latency of view callbacks', ['callback'])
+CALLBACK_ERRORS = Counter('dsa_view_callback_errors_total', 'Errors raised or logged by view callbacks', ['callback'])
+LOGGED_ERRORS = Counter('dsa_logged_errors_total', 'Errors logged, by logger', ['logger'])
+LIVE_VIEWS = Gauge('dsa_live_views', 'Views still waiting for interactions')
+
+# Views that are alive, counted by LIVE_VIEWS
+_views: 'weakref.WeakSet[discord.ui.View]' = weakref.WeakSet()
+
+# Error counter and labels of the command or callback running in the current task
+_handler: ContextVar[Optional[Tuple[Counter, Dict[str, str]]]] = ContextVar('handler', default=None)
+
+class ErrorCountHandler(logging.Handler):
+    """Counts logged errors, per logger and per running command or callback.
+
+    The cogs and views catch their own exceptions and log them, so logged
+    errors are how failures of a command or callback are counted.
+    """
+
+    def __init__(self):
+        """Initialize the handler for records of level ERROR and above."""
+        super().__init__(logging.ERROR)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Count a logged error.
+
+        Args:
+            record (logging.LogRecord): The logged record
+        """
+        LOGGED_ERRORS.inc(logger=record.name)
+        handler = _handler.get()
+        if handler is not None:
+            counter, labels = handler
+            counter.inc(**labels)
+
+class InstrumentedTree(app_commands.CommandTree):
+    """Command tree recording the latency and errors of every app command."""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        """Start timing an app command.
+
+        Runs in the task of the command, right before its callback.
+
+        Args:
+            interaction (discord.Interaction): The command interaction
+
+        Returns:
+            bool: Always True, the command may run
+        """
+        interaction.extras['metrics_started'] = time.perf_counter()
+        _handler.set((COMMAND_ERRORS, {'command': command_name(interaction)}))
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError) -> None:
+        """Record a command that raised, then log the error.
+
+        Args:
+            interaction (discord.Interaction): The command interaction
+            error (app_commands.AppCommandError): The raised error
+        """
+        record_command(interaction)
+        await super().on_error(interaction, error)
+
+def command_name(interaction: discord.Interaction) -> str:
+    """Get the metric label of an interaction's command.
+
+    Args:
+        interaction (discord.Interaction): The command interaction
+
+    Returns:
+        str: Qualified command name
+    """
+    command = interaction.command
+    return command.qualified_name if command else 'unknown'
+
+def record_command(interaction: discord.Interaction) -> None:
+    """Record the latency of a finished app command.
+
+    Args:
+        interaction (discord.Interaction): The command interaction
+    """
+    started = interaction.extras.pop('metrics_started', None)
+    if started is not None:
+        COMMAND_SECONDS.observe(time.perf_counter() - started, command=command_name(interaction))
+
+def instrument_callback(name: str, callback: Callable[[discord.Interaction], Awaitable[None]]):
+    """Wrap a view callback to record its latency and errors.
+
+    Args:
+        name (str): Metric label of the callback, e.g. DiceThrowView.confirm_callback
+        callback (Callable[[discord.Interaction], Awaitable[None]]): The callback
+
+    Returns:
+        Callable[[discord.Interaction], Awaitable[None]]: The wrapped callback
+    """
+    labels = {'callback': name}
+
+    async def instrumented(interaction: discord.Interaction) -> None:
+        token = _handler.set((CALLBACK_ERRORS, labels))
+        started = time.perf_counter()
+        try:
+            await callback(interaction)
+        finally:
+            CALLBACK_SECONDS.observe(time.perf_counter() - started, **labels)
+            _handler.reset(token)
+
+    instrumented.__name__ = getattr(callback, '__name__', 'callback')
+    return instrumented
+
+def track_view(view: discord.ui.View) -> None:
+    """Count a view as live until it finishes or is garbage collected.
+
+    Args:
+        view (discord.ui.View): The new view
+    """
+    _views.add(view)
+
+def install_instrumentation(bot: discord.Client) -> None:
+    """Hook the bot's events and gauges into the metrics.
+
+    Args:
+        bot (discord.Client): The bot instance
+    """
+    logging.getLogger().addHandler(ErrorCountHandler())
+    LIVE_VIEWS.set_function(lambda: sum(1 for view in list(_views) if not view.is_finished()))
+
+    async def on_app_command_completion(interaction: discord.Interaction, command) -> None:
+        record_command(interaction)
+
+    bot.add_listener(on_app_command_completion)
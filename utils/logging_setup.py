@@ -0,0 +1,121 @@
+"""Logging setup for the DSA Bot."""
+
+import copy
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS
+
+TEXT_FORMAT = '%(asctime)s %(levelname)-8s %(name)s: %(message)s'
+
+_listener: Optional[QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format a log record.
+
+        Args:
+            record (logging.LogRecord): The record to format
+
+        Returns:
+            str: The record as JSON
+        """
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class _LoopQueueHandler(QueueHandler):
+    """Queue handler doing only the work that must happen in the logging thread.
+
+    The message is merged with its arguments and tracebacks are rendered,
+    since both may change or disappear later. Formatting and writing the
+    line is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Prepare a record for the queue.
+
+        Args:
+            record (logging.LogRecord): The record to enqueue
+
+        Returns:
+            logging.LogRecord: A self-contained copy of the record
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Parse per-module log levels.
+
+    Args:
+        spec (str): Comma separated logger=LEVEL pairs, e.g. 'cogs=DEBUG,discord=WARNING'
+
+    Returns:
+        Dict[str, int]: Log level per logger name
+
+    Raises:
+        ValueError: If a pair is malformed or a level is unknown
+    """
+    levels = {}
+    for pair in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = pair.partition('=')
+        value = logging.getLevelName(level.strip().upper())
+        if not name or not isinstance(value, int):
+            raise ValueError(f"Invalid log level setting: {pair}")
+        levels[name.strip()] = value
+    return levels
+
+def setup_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, fmt: str = LOG_FORMAT) -> None:
+    """Send all logging through a queue to a stream handler in a background thread.
+
+    Loggers are created per module with logging.getLogger(__name__), so
+    levels can be set per module or package. Messages use lazy %-style
+    arguments and are only formatted when their level is enabled.
+
+    Args:
+        level (str, optional): Root log level. Defaults to LOG_LEVEL.
+        levels (str, optional): Per-module levels, see parse_levels. Defaults to LOG_LEVELS.
+        fmt (str, optional): 'text' or 'json'. Defaults to LOG_FORMAT.
+    """
+    global _listener
+    stop_logging()
+
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [_LoopQueueHandler(log_queue)]
+    root.setLevel(level.upper())
+    for name, value in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(value)
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+def stop_logging() -> None:
+    """Write out queued log records and stop the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,228 @@
+"""Metrics collection and Prometheus text exposition for the DSA Bot.
+
+Metrics register themselves on creation and are rendered together by
+render_metrics. Label values are passed as keyword arguments, e.g.
+COMMANDS.inc(command='throw').
+"""
+
+import logging
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List['Metric'] = []
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format."""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the text format."""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """Base class of all metrics."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Create and register a metric.
+
+        Args:
+            name (str): Metric name, e.g. dsa_commands_total
+            documentation (str): Help text
+            labelnames (Sequence[str], optional): Names of the labels. Defaults to ().
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """Get the series key of a set of label values.
+
+        Raises:
+            ValueError: If the labels do not match the metric's label names
+        """
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = '') -> str:
+        """Format the labels of a series."""
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def samples(self) -> List[str]:
+        """Get the sample lines of the metric."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the metric in the Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increase the counter.
+
+        Args:
+            amount (float, optional): Amount to add. Defaults to 1.
+            **labels (str): Label values
+        """
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Get the current count of a series."""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [f'{self.name}{self._labels(key)} {_format_value(value)}'
+                for key, value in sorted(self._values.items())]
+
+class Gauge(Metric):
+    """Value that can go up and down, optionally read from a function at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        """Create a gauge.
+
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            labelnames (Sequence[str], optional): Names of the labels. Defaults to ().
+            function (Optional[Callable[[], float]], optional): Computes the value of
+                an unlabelled gauge on every scrape. Defaults to None.
+        """
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.function = function
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge.
+
+        Args:
+            value (float): New value
+            **labels (str): Label values
+        """
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Compute the value of the gauge on every scrape.
+
+        Args:
+            function (Callable[[], float]): Returns the current value
+        """
+        self.function = function
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            try:
+                return [f'{self.name} {_format_value(self.function())}']
+            except Exception:
+                logger.exception("Error computing gauge %s", self.name)
+                return []
+        return [f'{self.name}{self._labels(key)} {_format_value(value)}'
+                for key, value in sorted(self._values.items())]
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Create a histogram.
+
+        Args:
+            name (str): Metric name, e.g. dsa_command_seconds
+            documentation (str): Help text
+            labelnames (Sequence[str], optional): Names of the labels. Defaults to ().
+            buckets (Sequence[float], optional): Upper bounds of the buckets.
+                Defaults to DEFAULT_BUCKETS.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per series: count per bucket (not cumulative), sum of values
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record a value.
+
+        Args:
+            value (float): The observed value
+            **labels (str): Label values
+        """
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * len(self.buckets), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{self._labels(key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{self._labels(key)} {_format_value(total[0])}')
+            lines.append(f'{self.name}_count{self._labels(key)} {cumulative}')
+        return lines
+
+def render_metrics() -> str:
+    """Render all registered metrics in the Prometheus text format.
+
+    Returns:
+        str: The exposition text
+    """
+    return '\n'.join(metric.render() for metric in _registry) + '\n'
+
+async def start_metrics_server(host: str, port: int):
+    """Serve the metrics on http://host:port/metrics.
+
+    Args:
+        host (str): Address to bind, keep it local
+        port (int): Port to bind
+
+    Returns:
+        aiohttp.web.AppRunner: Runner to clean up when shutting down
+    """
+    # aiohttp ships with discord.py
+    from aiohttp import web
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(text=render_metrics(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return runner
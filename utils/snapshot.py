@@ -0,0 +1,202 @@
+"""Binary roster snapshot format for the DSA Bot.
+
+A snapshot file consists of a header, a table of fixed-width records and
+a blob holding the UTF-8 encoded names:
+
+    header   magic (4s), version (H), record size (H), record count (I)
+    records  guild ID (Q), Discord ID (Q), ini (h), MU..KK (8h),
+             name offset (I), name length (H), char name offset (I),
+             char name length (H), current initiative (i)
+    blob     names, referenced by offset relative to the blob start
+
+Version 1 records end before the current initiative, which then reads
+as 0. All integers are little endian. Records can be decoded one at a time
+straight from a memory map, or all at once with struct.iter_unpack.
+"""
+
+import mmap
+import os
+import struct
+from typing import Iterator, List
+from models.user import User
+
+MAGIC = b'DSAS'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHHI')
+RECORD = struct.Struct('<QQh8hIHIHi')
+
+# Record layouts of all readable versions
+RECORDS = {
+    1: struct.Struct('<QQh8hIHIH'),
+    2: RECORD,
+}
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is not valid."""
+
+def _pack_record(row: tuple, name_offset: int, name_length: int,
+                 char_offset: int, char_length: int) -> bytes:
+    """Pack a user row into a fixed-width record.
+
+    Args:
+        row (tuple): User row, see User.to_row
+        name_offset (int): Blob offset of the name
+        name_length (int): Length of the encoded name
+        char_offset (int): Blob offset of the character name
+        char_length (int): Length of the encoded character name
+
+    Returns:
+        bytes: The packed record
+
+    Raises:
+        ValueError: If an ID is not numeric or a value does not fit its field
+    """
+    try:
+        return RECORD.pack(int(row[12] or 0), int(row[0]), *row[3:12],
+                           name_offset, name_length, char_offset, char_length, row[13])
+    except struct.error as e:
+        raise ValueError(str(e)) from e
+
+def validate_row(row: tuple) -> None:
+    """Check that a user row can be stored in a snapshot.
+
+    Args:
+        row (tuple): User row, see User.to_row
+
+    Raises:
+        ValueError: If an ID is not numeric or a value does not fit its field
+    """
+    _pack_record(row, 0, len(row[1].encode('utf-8')), 0, len(row[2].encode('utf-8')))
+
+def write_snapshot(path: str, rows: List[tuple]) -> None:
+    """Atomically write users to a snapshot file.
+
+    Args:
+        path (str): Path of the snapshot file
+        rows (List[tuple]): User rows, see User.to_row
+
+    Raises:
+        ValueError: If a Discord or guild ID is not numeric
+    """
+    records = bytearray()
+    blob = bytearray()
+    for row in rows:
+        name = row[1].encode('utf-8')
+        char_name = row[2].encode('utf-8')
+        name_offset = len(blob)
+        blob += name
+        char_offset = len(blob)
+        blob += char_name
+        records += _pack_record(row, name_offset, len(name), char_offset, len(char_name))
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(rows)))
+        file.write(records)
+        file.write(blob)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path: str):
+        """Open a snapshot file.
+
+        Args:
+            path (str): Path of the snapshot file
+
+        Raises:
+            SnapshotError: If the file is not a valid snapshot
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                raise SnapshotError(f'{path} is too short to be a snapshot')
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise SnapshotError(f'{path} is not a snapshot file')
+        self._record = RECORDS.get(version)
+        if self._record is None or record_size != self._record.size:
+            self.close()
+            raise SnapshotError(f'{path} has unsupported snapshot version {version}')
+        self._blob_offset = HEADER.size + self.count * self._record.size
+        if self._blob_offset > size:
+            self.close()
+            raise SnapshotError(f'{path} is truncated')
+
+    def __len__(self) -> int:
+        """Get the number of users in the snapshot."""
+        return self.count
+
+    def __getitem__(self, index: int) -> User:
+        """Decode a single user.
+
+        Args:
+            index (int): Record index
+
+        Returns:
+            User: The decoded user
+        """
+        if not 0 <= index < self.count:
+            raise IndexError('snapshot record index out of range')
+        values = self._record.unpack_from(self._map, HEADER.size + index * self._record.size)
+        return self._decode(values)
+
+    def __iter__(self) -> Iterator[User]:
+        """Decode all users in bulk."""
+        records = memoryview(self._map)[HEADER.size:self._blob_offset]
+        try:
+            for values in self._record.iter_unpack(records):
+                yield self._decode(values)
+        finally:
+            records.release()
+
+    def _decode(self, values: tuple) -> User:
+        """Create a user from unpacked record values.
+
+        Args:
+            values (tuple): Values unpacked with the record layout of the file
+
+        Returns:
+            User: The decoded user
+        """
+        guild_id, user_id = values[0], values[1]
+        name_offset, name_length, char_offset, char_length = values[11:15]
+        blob = self._blob_offset
+        name = self._map[blob + name_offset:blob + name_offset + name_length].decode('utf-8')
+        char_name = self._map[blob + char_offset:blob + char_offset + char_length].decode('utf-8')
+        user = User(user_id, name, char_name, guild_id or '')
+        (user.ini, user.MU, user.KL, user.IN, user.CH,
+         user.FF, user.GE, user.KO, user.KK) = values[2:11]
+        if len(values) > 15:
+            user.current_ini = values[15]
+        return user
+
+    def close(self) -> None:
+        """Unmap the snapshot file."""
+        self._map.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def read_snapshot(path: str) -> List[User]:
+    """Load all users from a snapshot file.
+
+    Args:
+        path (str): Path of the snapshot file
+
+    Returns:
+        List[User]: List of loaded users
+    """
+    with Snapshot(path) as snapshot:
+        return list(snapshot)
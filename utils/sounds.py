@@ -0,0 +1,107 @@
+"""Soundboard playback of the DSA Bot.
+
+Sounds are played in the background by one queue per voice channel, so
+callers fire and forget them. A channel plays at most one sound per
+SOUND_INTERVAL; sounds requested meanwhile are merged into the single
+pending one, the latest request wins.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+import discord
+from config import SOUND_INTERVAL
+from utils.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+SOUND_FAILURES = Counter('dsa_sound_failures_total', 'Soundboard sounds that failed to play')
+SOUNDS_DROPPED = Counter('dsa_sounds_dropped_total', 'Soundboard sounds merged into an overlapping one')
+
+# Queue per voice channel ID, removed again once the channel is idle
+_queues: Dict[int, 'SoundQueue'] = {}
+
+SOUND_QUEUES = Gauge('dsa_sound_queues', 'Voice channels with sounds playing or pending',
+                     function=lambda: len(_queues))
+
+async def send_sound(client: discord.Client, channel: discord.VoiceChannel, sound_id: int) -> None:
+    """Play a soundboard sound in a voice channel right away.
+
+    Args:
+        client (discord.Client): The bot client, whose cache holds the sound
+        channel (discord.VoiceChannel): The voice channel
+        sound_id (int): ID of the soundboard sound
+
+    Raises:
+        LookupError: If the sound is not in any of the bot's guilds
+        discord.HTTPException: If sending the sound failed
+    """
+    sound = client.get_soundboard_sound(sound_id)
+    if sound is None:
+        raise LookupError(f"Unknown soundboard sound: {sound_id}")
+    await channel.send_sound(sound)
+
+class SoundQueue:
+    """Plays the sounds of one voice channel, one at a time.
+
+    Holds at most one pending sound. Its task ends when nothing is
+    pending, so idle channels cost nothing.
+    """
+
+    def __init__(self, channel_id: int, interval: float = SOUND_INTERVAL):
+        """Initialize the queue.
+
+        Args:
+            channel_id (int): ID of the voice channel
+            interval (float, optional): Seconds between two sounds. Defaults to SOUND_INTERVAL.
+        """
+        self.channel_id = channel_id
+        self.interval = interval
+        self._pending: Optional[Tuple[discord.Client, discord.VoiceChannel, int]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def push(self, client: discord.Client, channel: discord.VoiceChannel, sound_id: int) -> None:
+        """Queue a sound, replacing the pending one.
+
+        Args:
+            client (discord.Client): The bot client
+            channel (discord.VoiceChannel): The voice channel
+            sound_id (int): ID of the soundboard sound
+        """
+        if self._pending is not None:
+            SOUNDS_DROPPED.inc()
+        self._pending = (client, channel, sound_id)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Play pending sounds until there are none."""
+        try:
+            while self._pending is not None:
+                client, channel, sound_id = self._pending
+                self._pending = None
+                try:
+                    await send_sound(client, channel, sound_id)
+                    logger.debug("Played soundboard sound %s in %s", sound_id, self.channel_id)
+                except Exception:
+                    # A missing sound does not fail the throw
+                    SOUND_FAILURES.inc()
+                    logger.debug("Error playing sound %s", sound_id, exc_info=True)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._task = None
+            if _queues.get(self.channel_id) is self:
+                del _queues[self.channel_id]
+
+def queue_sound(client: discord.Client, channel: discord.VoiceChannel, sound_id: int) -> None:
+    """Play a soundboard sound in the background.
+
+    Args:
+        client (discord.Client): The bot client
+        channel (discord.VoiceChannel): The voice channel
+        sound_id (int): ID of the soundboard sound
+    """
+    queue = _queues.get(channel.id)
+    if queue is None:
+        queue = _queues[channel.id] = SoundQueue(channel.id)
+    queue.push(client, channel, sound_id)
@@ -0,0 +1,162 @@
+"""SQLite storage backend for the DSA Bot."""
+
+import logging
+import sqlite3
+from typing import List, Optional
+from models.user import User
+from config import SQLITE_DB_PATH
+from utils.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 4
+
+# Same order as User.to_row
+USER_COLUMNS = ('id', 'name', 'char_name', 'ini', 'MU', 'KL', 'IN', 'CH', 'FF', 'GE', 'KO', 'KK',
+                'guild_id', 'current_ini')
+INTEGER_COLUMNS = USER_COLUMNS[3:12]
+
+# Quoted, since IN is an SQL keyword
+COLUMN_LIST = ', '.join(f'"{column}"' for column in USER_COLUMNS)
+INSERT_USER = (
+    f'INSERT OR REPLACE INTO users ({COLUMN_LIST}) '
+    f'VALUES ({", ".join("?" for _ in USER_COLUMNS)})'
+)
+
+CREATE_USERS = (
+    'CREATE TABLE IF NOT EXISTS users ('
+    "guild_id TEXT NOT NULL DEFAULT '', id TEXT NOT NULL, "
+    'name TEXT NOT NULL, char_name TEXT NOT NULL, '
+    + ', '.join(f'"{column}" INTEGER NOT NULL' for column in INTEGER_COLUMNS)
+    + ', current_ini INTEGER NOT NULL DEFAULT 0'
+    ', PRIMARY KEY (guild_id, id))'
+)
+
+CREATE_STATE = (
+    'CREATE TABLE IF NOT EXISTS state ('
+    'guild_id TEXT NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL, '
+    'PRIMARY KEY (guild_id, name))'
+)
+
+class SQLiteStorage(StorageBackend):
+    """SQLite backend storing one row per character, keyed by guild and Discord ID."""
+
+    def __init__(self, path: str = SQLITE_DB_PATH):
+        """Initialize the SQLite storage backend.
+
+        Args:
+            path (str, optional): Database file path. Defaults to SQLITE_DB_PATH.
+        """
+        super().__init__()
+        self.path = path
+        # Only the backend's single worker thread uses the connection after
+        # the initial load, so sharing it across threads is safe.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        """Create the tables or migrate them to the current schema version."""
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self.connection:
+            if version == 1:
+                # Version 1 had no guild column, its characters keep guild ''
+                self.connection.execute('ALTER TABLE users RENAME TO users_v1')
+                self.connection.execute(CREATE_USERS)
+                columns = ', '.join(f'"{column}"' for column in USER_COLUMNS[:12])
+                self.connection.execute(
+                    f'INSERT INTO users ({columns}) SELECT {columns} FROM users_v1'
+                )
+                self.connection.execute('DROP TABLE users_v1')
+            elif version == 2:
+                # Version 2 did not store rolled initiative
+                self.connection.execute(
+                    'ALTER TABLE users ADD COLUMN current_ini INTEGER NOT NULL DEFAULT 0'
+                )
+            elif version == 0:
+                self.connection.execute(CREATE_USERS)
+            # Version 4 added the guild state table
+            self.connection.execute(CREATE_STATE)
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def load_users(self, guild_id: str) -> List[User]:
+        """Load a guild's users from the database.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+
+        Returns:
+            List[User]: List of loaded users
+        """
+        cursor = self.connection.execute(
+            f'SELECT {COLUMN_LIST} FROM users WHERE guild_id = ?', (guild_id,)
+        )
+        users = [User.from_row(row) for row in cursor]
+        logger.info('Loaded %d characters of guild %s from %s', len(users), guild_id or '-', self.path)
+        return users
+
+    def write_changes(self, guild_id: str, upserts: List[tuple], deletes: List[str],
+                      snapshot: Optional[List[tuple]] = None) -> None:
+        """Write all changes to a guild's roster in a single transaction.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            upserts (List[tuple]): Rows of changed users, see User.to_row
+            deletes (List[str]): Discord IDs of removed users
+            snapshot (Optional[List[tuple]], optional): Rows of all users of the
+                guild that replace its stored roster. Defaults to None.
+        """
+        with self.connection:
+            if snapshot is not None:
+                self.connection.execute('DELETE FROM users WHERE guild_id = ?', (guild_id,))
+                self.connection.executemany(INSERT_USER, snapshot)
+                return
+            if deletes:
+                self.connection.executemany(
+                    'DELETE FROM users WHERE guild_id = ? AND id = ?',
+                    [(guild_id, user_id) for user_id in deletes]
+                )
+            if upserts:
+                self.connection.executemany(INSERT_USER, upserts)
+
+    def load_state(self, guild_id: str, name: str) -> Optional[str]:
+        """Load a named piece of guild state from the database.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            name (str): Name of the state
+
+        Returns:
+            Optional[str]: The stored value or None if there is none
+        """
+        row = self.connection.execute(
+            'SELECT value FROM state WHERE guild_id = ? AND name = ?', (guild_id, name)
+        ).fetchone()
+        return row[0] if row else None
+
+    def write_state(self, guild_id: str, name: str, value: Optional[str]) -> None:
+        """Store a named piece of guild state in the database.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            name (str): Name of the state
+            value (Optional[str]): Value to store, None removes the state
+        """
+        with self.connection:
+            if value is None:
+                self.connection.execute(
+                    'DELETE FROM state WHERE guild_id = ? AND name = ?', (guild_id, name)
+                )
+            else:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO state (guild_id, name, value) VALUES (?, ?, ?)',
+                    (guild_id, name, value)
+                )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        super().close()
+        self.connection.close()
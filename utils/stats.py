@@ -0,0 +1,433 @@
+"""Running dice statistics of the DSA Bot.
+
+Every attribute check updates the statistics of its character, its guild
+and the guild's current session in O(1): counts, success rates per
+attribute and the mean and variance of the d20 rolls and differences,
+kept with Welford's algorithm. Queries never look at past rolls.
+
+The statistics of a guild are stored as one named state of the storage
+backend, see StorageBackend.load_state. Checks made before a guild's
+stored statistics were loaded are merged into them on load.
+"""
+
+import asyncio
+import json
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from config import SAVE_INTERVAL
+from models.user import ATTRIBUTES
+from utils.checks import CheckResult
+from utils.user_manager import get_backend, guild_key
+
+logger = logging.getLogger(__name__)
+
+# Name of the stored statistics, see StorageBackend.load_state
+STATS_STATE = 'stats'
+
+# Mean and standard deviation of a fair d20
+D20_MEAN = 10.5
+D20_STDDEV = math.sqrt((20 ** 2 - 1) / 12)
+
+class RunningStats:
+    """Count, mean and variance of a stream of values, see Welford's algorithm."""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        """Initialize the statistics.
+
+        Args:
+            count (int, optional): Number of values. Defaults to 0.
+            mean (float, optional): Mean of the values. Defaults to 0.0.
+            m2 (float, optional): Sum of squared differences from the mean. Defaults to 0.0.
+        """
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float) -> None:
+        """Add a value.
+
+        Args:
+            value (float): The value
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @classmethod
+    def from_values(cls, values: Sequence[float]) -> 'RunningStats':
+        """Compute the statistics of a batch of values at once.
+
+        Args:
+            values (Sequence[float]): The values
+
+        Returns:
+            RunningStats: Statistics of the values, as if added one by one
+        """
+        if not values:
+            return cls()
+        mean = sum(values) / len(values)
+        return cls(len(values), mean, sum((value - mean) ** 2 for value in values))
+
+    def merge(self, other: 'RunningStats') -> None:
+        """Add the values of other statistics.
+
+        Args:
+            other (RunningStats): Statistics of further values
+        """
+        count = self.count + other.count
+        if not count:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self) -> float:
+        """Sample variance of the values, 0 for less than two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Sample standard deviation of the values."""
+        return math.sqrt(self.variance)
+
+    def to_list(self) -> List[float]:
+        """Get the statistics for storage."""
+        return [self.count, self.mean, self.m2]
+
+    @classmethod
+    def from_list(cls, values: Sequence[float]) -> 'RunningStats':
+        """Restore statistics stored by to_list."""
+        count, mean, m2 = values
+        return cls(int(count), mean, m2)
+
+class CheckStats:
+    """Statistics of a series of attribute checks."""
+
+    __slots__ = ('checks', 'successes', 'party_effects', 'doom_effects', 'd20', 'diff', 'attributes')
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self.checks = 0
+        self.successes = 0
+        self.party_effects = 0
+        self.doom_effects = 0
+        self.d20 = RunningStats()
+        self.diff = RunningStats()
+        # Rolls and passed rolls per attribute
+        self.attributes: Dict[str, List[int]] = {}
+
+    def add(self, attributes: Sequence[str], check: CheckResult) -> None:
+        """Add a check.
+
+        Args:
+            attributes (Sequence[str]): Checked attributes
+            check (CheckResult): Outcome of the check
+        """
+        self.checks += 1
+        self.successes += check.all_success
+        self.party_effects += check.party_effect
+        self.doom_effects += check.doom_effect
+        self.diff.add(check.total_diff)
+        for attr, roll, diff in zip(attributes, check.rolls, check.diffs):
+            self.d20.add(roll)
+            counts = self.attributes.get(attr)
+            if counts is None:
+                counts = self.attributes[attr] = [0, 0]
+            counts[0] += 1
+            counts[1] += not diff
+
+    @classmethod
+    def from_checks(cls, attributes: Sequence[str], checks: Sequence[CheckResult]) -> 'CheckStats':
+        """Compute the statistics of a batch of checks of the same attributes at once.
+
+        Args:
+            attributes (Sequence[str]): Checked attributes
+            checks (Sequence[CheckResult]): Outcomes of the checks
+
+        Returns:
+            CheckStats: Statistics of the checks, as if added one by one
+        """
+        stats = cls()
+        stats.checks = len(checks)
+        stats.successes = sum(check.all_success for check in checks)
+        stats.party_effects = sum(check.party_effect for check in checks)
+        stats.doom_effects = sum(check.doom_effect for check in checks)
+        stats.diff = RunningStats.from_values([check.total_diff for check in checks])
+        count = len(attributes)
+        stats.d20 = RunningStats.from_values([roll for check in checks for roll in check.rolls[:count]])
+        for index, attr in enumerate(attributes):
+            diffs = [check.diffs[index] for check in checks]
+            counts = stats.attributes.setdefault(attr, [0, 0])
+            counts[0] += len(diffs)
+            counts[1] += diffs.count(0)
+        return stats
+
+    def merge(self, other: 'CheckStats') -> None:
+        """Add the checks of other statistics.
+
+        Args:
+            other (CheckStats): Statistics of further checks
+        """
+        self.checks += other.checks
+        self.successes += other.successes
+        self.party_effects += other.party_effects
+        self.doom_effects += other.doom_effects
+        self.d20.merge(other.d20)
+        self.diff.merge(other.diff)
+        for attr, (rolls, passed) in other.attributes.items():
+            counts = self.attributes.setdefault(attr, [0, 0])
+            counts[0] += rolls
+            counts[1] += passed
+
+    @property
+    def success_rate(self) -> float:
+        """Share of successful checks."""
+        return self.successes / self.checks if self.checks else 0.0
+
+    def luck(self) -> float:
+        """How far the average d20 is from a fair die's, in standard errors.
+
+        Returns:
+            float: Positive when the dice rolled high, which is bad in DSA
+        """
+        if not self.d20.count:
+            return 0.0
+        return (self.d20.mean - D20_MEAN) / (D20_STDDEV / math.sqrt(self.d20.count))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the statistics for storage."""
+        return {
+            'checks': self.checks,
+            'successes': self.successes,
+            'party_effects': self.party_effects,
+            'doom_effects': self.doom_effects,
+            'd20': self.d20.to_list(),
+            'diff': self.diff.to_list(),
+            'attributes': self.attributes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CheckStats':
+        """Restore statistics stored by to_dict.
+
+        Raises:
+            KeyError: If a field is missing
+            ValueError: If a field is malformed
+        """
+        stats = cls()
+        stats.checks = data['checks']
+        stats.successes = data['successes']
+        stats.party_effects = data['party_effects']
+        stats.doom_effects = data['doom_effects']
+        stats.d20 = RunningStats.from_list(data['d20'])
+        stats.diff = RunningStats.from_list(data['diff'])
+        stats.attributes = {attr: [int(rolls), int(passed)] for attr, (rolls, passed)
+                            in data['attributes'].items() if attr in ATTRIBUTES}
+        return stats
+
+# Statistics per guild and user, per guild and per guild's current session
+_characters: Dict[str, Dict[str, CheckStats]] = {}
+_guilds: Dict[str, CheckStats] = {}
+_sessions: Dict[str, CheckStats] = {}
+
+# Guilds whose stored statistics were loaded, changed since the last save,
+# and whose session was reset before loading
+_loaded: Set[str] = set()
+_dirty: Set[str] = set()
+_reset_before_load: Set[str] = set()
+_stats_lock = asyncio.Lock()
+_stats_task: Optional[asyncio.Task] = None
+
+def _get(scope: Dict[Any, CheckStats], key: Any) -> CheckStats:
+    """Get the statistics of a key, creating them if missing."""
+    stats = scope.get(key)
+    if stats is None:
+        stats = scope[key] = CheckStats()
+    return stats
+
+def add_check(guild_id, user_id: str, attributes: Sequence[str], check: CheckResult) -> None:
+    """Count an attribute check for its character, guild and session.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str): Discord user ID of the character
+        attributes (Sequence[str]): Checked attributes
+        check (CheckResult): Outcome of the check
+    """
+    guild_id = guild_key(guild_id)
+    _get(_characters.setdefault(guild_id, {}), str(user_id)).add(attributes, check)
+    _get(_guilds, guild_id).add(attributes, check)
+    _get(_sessions, guild_id).add(attributes, check)
+    _dirty.add(guild_id)
+
+def add_checks(guild_id, attributes: Sequence[str], checks: Sequence[Tuple[str, CheckResult]]) -> None:
+    """Count the same attribute check of a group of characters.
+
+    The guild and session statistics are updated once for the whole group.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        attributes (Sequence[str]): Checked attributes
+        checks (Sequence[Tuple[str, CheckResult]]): Discord user ID and outcome of every check
+    """
+    if not checks:
+        return
+    guild_id = guild_key(guild_id)
+    characters = _characters.setdefault(guild_id, {})
+    for user_id, check in checks:
+        _get(characters, str(user_id)).add(attributes, check)
+    group = CheckStats.from_checks(attributes, [check for _, check in checks])
+    _get(_guilds, guild_id).merge(group)
+    _get(_sessions, guild_id).merge(group)
+    _dirty.add(guild_id)
+
+def reset_session(guild_id) -> None:
+    """Start counting a new session in a guild.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+    """
+    guild_id = guild_key(guild_id)
+    _sessions.pop(guild_id, None)
+    if guild_id not in _loaded:
+        _reset_before_load.add(guild_id)
+    _dirty.add(guild_id)
+
+def character_stats(guild_id, user_id: str) -> CheckStats:
+    """Get the statistics of a character, load_stats the guild first.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str): Discord user ID
+
+    Returns:
+        CheckStats: The statistics, empty if the character made no checks
+    """
+    return _characters.get(guild_key(guild_id), {}).get(str(user_id)) or CheckStats()
+
+def guild_stats(guild_id) -> CheckStats:
+    """Get the statistics of all checks in a guild, load_stats the guild first."""
+    return _guilds.get(guild_key(guild_id)) or CheckStats()
+
+def session_stats(guild_id) -> CheckStats:
+    """Get the statistics of a guild's current session, load_stats the guild first."""
+    return _sessions.get(guild_key(guild_id)) or CheckStats()
+
+def stats_to_json(guild_id: str) -> str:
+    """Serialize the statistics of a guild.
+
+    Args:
+        guild_id (str): Roster key of the guild
+
+    Returns:
+        str: JSON document of all scopes
+    """
+    session = _sessions.get(guild_id)
+    return json.dumps({
+        'characters': {user_id: stats.to_dict() for user_id, stats in _characters.get(guild_id, {}).items()},
+        'guild': _get(_guilds, guild_id).to_dict(),
+        'session': session.to_dict() if session else None,
+    }, separators=(',', ':'))
+
+def _merge_stored(guild_id: str, state: Optional[str]) -> None:
+    """Merge stored statistics of a guild into the ones counted since the start."""
+    if not state:
+        return
+    data = json.loads(state)
+    characters = _characters.setdefault(guild_id, {})
+    for user_id, stored in data['characters'].items():
+        stats = CheckStats.from_dict(stored)
+        stats.merge(_get(characters, user_id))
+        characters[user_id] = stats
+    stats = CheckStats.from_dict(data['guild'])
+    stats.merge(_get(_guilds, guild_id))
+    _guilds[guild_id] = stats
+    if data['session'] and guild_id not in _reset_before_load:
+        stats = CheckStats.from_dict(data['session'])
+        stats.merge(_get(_sessions, guild_id))
+        _sessions[guild_id] = stats
+
+async def load_stats(guild_id) -> None:
+    """Load the stored statistics of a guild, once per run.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+    """
+    guild_id = guild_key(guild_id)
+    if guild_id in _loaded:
+        return
+    async with _stats_lock:
+        if guild_id in _loaded:
+            return
+        backend = get_backend()
+        state = await asyncio.get_running_loop().run_in_executor(
+            backend.executor, backend.load_state, guild_id, STATS_STATE
+        )
+        try:
+            _merge_stored(guild_id, state)
+        except (KeyError, TypeError, ValueError):
+            logger.exception("Ignoring malformed stored statistics of guild %s", guild_id)
+        _loaded.add(guild_id)
+        _reset_before_load.discard(guild_id)
+
+async def flush_stats() -> None:
+    """Store the statistics of every guild that changed since the last flush."""
+    global _dirty
+    if not _dirty:
+        return
+    dirty, _dirty = _dirty, set()
+    backend = get_backend()
+    loop = asyncio.get_running_loop()
+    errors = []
+    for guild_id in dirty:
+        try:
+            # Never overwrite stored statistics that were not merged yet
+            await load_stats(guild_id)
+            await loop.run_in_executor(backend.executor, backend.write_state,
+                                       guild_id, STATS_STATE, stats_to_json(guild_id))
+        except Exception as e:
+            _dirty.add(guild_id)
+            errors.append(e)
+    if errors:
+        raise errors[0]
+
+async def _stats_loop(interval: float) -> None:
+    """Periodically store changed statistics.
+
+    Args:
+        interval (float): Seconds between flushes
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_stats()
+        except Exception:
+            logger.exception("Error saving statistics")
+
+def start_stats(interval: float = SAVE_INTERVAL) -> None:
+    """Start the background task storing statistics.
+
+    Args:
+        interval (float, optional): Seconds between flushes. Defaults to SAVE_INTERVAL.
+    """
+    global _stats_task
+    if _stats_task is None or _stats_task.done():
+        _stats_task = asyncio.create_task(_stats_loop(interval))
+
+async def stop_stats() -> None:
+    """Stop the background task and store pending statistics."""
+    global _stats_task
+    if _stats_task is not None:
+        _stats_task.cancel()
+        try:
+            await _stats_task
+        except asyncio.CancelledError:
+            pass
+        _stats_task = None
+    await flush_stats()
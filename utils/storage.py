@@ -0,0 +1,99 @@
+"""Storage backend interface for the DSA Bot."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from models.user import User
+
+class StorageBackend:
+    """Base class for character storage backends.
+
+    All methods are blocking. user_manager calls them through the backend's
+    executor, a single worker thread, so the event loop never waits on
+    storage and writes are applied in order.
+    """
+
+    def __init__(self):
+        """Initialize the storage backend."""
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage')
+
+    def needs_snapshot(self, guild_id: str) -> bool:
+        """Whether the next write for a guild should include a full snapshot.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+
+        Returns:
+            bool: True if a snapshot should be written
+        """
+        return False
+
+    def load_users(self, guild_id: str) -> List[User]:
+        """Load the stored users of a guild.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+
+        Returns:
+            List[User]: List of loaded users
+        """
+        raise NotImplementedError
+
+    def write_changes(self, guild_id: str, upserts: List[tuple], deletes: List[str],
+                      snapshot: Optional[List[tuple]] = None) -> None:
+        """Persist a batch of changes to one guild's roster.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            upserts (List[tuple]): Rows of changed users, see User.to_row
+            deletes (List[str]): Discord IDs of removed users
+            snapshot (Optional[List[tuple]], optional): Rows of all users of the
+                guild. If given, it replaces the stored roster after the
+                changes are applied. Defaults to None.
+        """
+        raise NotImplementedError
+
+    def load_state(self, guild_id: str, name: str) -> Optional[str]:
+        """Load a named piece of guild state, e.g. a running combat.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            name (str): Name of the state
+
+        Returns:
+            Optional[str]: The stored value or None if there is none
+        """
+        raise NotImplementedError
+
+    def write_state(self, guild_id: str, name: str, value: Optional[str]) -> None:
+        """Store a named piece of guild state.
+
+        Args:
+            guild_id (str): Discord guild ID, '' for characters without a guild
+            name (str): Name of the state
+            value (Optional[str]): Value to store, None removes the state
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+        self.executor.shutdown(wait=True)
+
+def create_backend(name: str) -> StorageBackend:
+    """Create the storage backend with the given name.
+
+    Args:
+        name (str): Backend name, either 'file' or 'sqlite'
+
+    Returns:
+        StorageBackend: New backend instance
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if name == 'file':
+        from utils.file_handler import FileStorage
+        return FileStorage()
+    if name == 'sqlite':
+        from utils.sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    raise ValueError(f"Unknown storage backend: {name}")
@@ -1,26 +1,406 @@
 """User management module for the DSA Bot."""
 
-from utils.file_handler import load_users, save_users
-
-# Global users list
-_users = []
-
-def get_users():
-    """Get the global users list."""
-    global _users
-    return _users
-
-def set_users(new_users):
-    """Set the global users list."""
-    global _users
-    _users = new_users
-
-def load_all_users():
-    """Load all users from file."""
-    global _users
-    _users = load_users()
-    return _users
-
-def save_all_users():
-    """Save all users to file."""
-    save_users(_users) 
\ No newline at end of file
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from config import SAVE_INTERVAL, STORAGE_BACKEND
+from models.user import User
+from utils.initiative import Combat, InitiativeTracker
+from utils.metrics import Gauge, Histogram
+from utils.storage import StorageBackend, create_backend
+
+logger = logging.getLogger(__name__)
+
+# Rosters partitioned by guild ID, each keyed by Discord user ID.
+# Guild '' holds characters created before rosters were split by guild.
+_guilds: Dict[str, Dict[str, User]] = {}
+_loading: Dict[str, asyncio.Task] = {}
+
+# Initiative order and running combat per guild, maintained alongside the rosters
+_trackers: Dict[str, InitiativeTracker] = {}
+_combats: Dict[str, Combat] = {}
+
+# Change count per (guild, user), for caches of rendered character sheets
+_character_versions: Dict[Tuple[str, str], int] = {}
+
+# Name of the stored combat state, see StorageBackend.load_state
+COMBAT_STATE = 'combat'
+
+LOAD_SECONDS = Histogram('dsa_guild_load_seconds', 'Duration of loading a guild roster from storage')
+FLUSH_SECONDS = Histogram('dsa_flush_seconds', 'Duration of writing pending changes to storage')
+LOADED_GUILDS = Gauge('dsa_loaded_guilds', 'Guild rosters in memory',
+                      function=lambda: len(_guilds))
+CHARACTERS = Gauge('dsa_characters', 'Characters in memory',
+                   function=lambda: sum(len(users) for users in _guilds.values()))
+
+# Storage backend selected in config, created on first load
+_backend: Optional[StorageBackend] = None
+
+# Write-behind state per guild: mutations only record what changed, the
+# persistence task writes it out at most once per SAVE_INTERVAL.
+_changed_ids: Dict[str, Set[str]] = {}
+_snapshot_guilds: Set[str] = set()
+_save_lock = asyncio.Lock()
+_persistence_task: Optional[asyncio.Task] = None
+
+def guild_key(guild_id) -> str:
+    """Normalize a Discord guild ID to a roster key.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID, None outside of guilds
+
+    Returns:
+        str: Roster key, '' for characters without a guild
+    """
+    return str(guild_id) if guild_id else ''
+
+def get_users(guild_id) -> List[User]:
+    """Get all loaded users of a guild.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        List[User]: List of the guild's users in memory
+    """
+    return list(_guilds.get(guild_key(guild_id), {}).values())
+
+def set_users(guild_id, new_users: List[User]) -> None:
+    """Replace all users of a guild in memory.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        new_users (List[User]): List of users to keep
+    """
+    guild_id = guild_key(guild_id)
+    _guilds[guild_id] = {user.id: user for user in new_users}
+    _trackers[guild_id] = InitiativeTracker(new_users)
+    if guild_id in _combats:
+        _combats[guild_id].tracker = _trackers[guild_id]
+
+def get_user(guild_id, user_id) -> Optional[User]:
+    """Look up a user of a guild by Discord ID.
+
+    Characters created before rosters were split by guild are moved into
+    the first guild they are looked up in.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str | int): Discord user ID
+
+    Returns:
+        Optional[User]: The user or None if not found
+    """
+    guild_id = guild_key(guild_id)
+    user_id = str(user_id)
+    user = _guilds.get(guild_id, {}).get(user_id)
+    if user is None and guild_id and guild_id in _guilds:
+        user = _guilds.get('', {}).get(user_id)
+        if user is not None:
+            remove_user('', user_id)
+            user.guild_id = guild_id
+            upsert_user(user)
+    return user
+
+def character_version(guild_id, user_id) -> int:
+    """Get the number of changes to a user of a guild.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str | int): Discord user ID
+
+    Returns:
+        int: Counter increased by upsert_user, remove_user and reset_initiative
+    """
+    return _character_versions.get((guild_key(guild_id), str(user_id)), 0)
+
+def _touch(guild_id: str, user_id: str) -> None:
+    """Record a change to a user for saving and for caches."""
+    _changed_ids.setdefault(guild_id, set()).add(user_id)
+    key = (guild_id, user_id)
+    _character_versions[key] = _character_versions.get(key, 0) + 1
+
+def upsert_user(user: User) -> None:
+    """Add a user or replace the user with the same Discord ID in its guild.
+
+    The user's guild must have been loaded with load_guild. The change is
+    saved by the background persistence task.
+
+    Args:
+        user (User): User to store
+    """
+    _guilds.setdefault(user.guild_id, {})[user.id] = user
+    get_initiative(user.guild_id).update(user)
+    _touch(user.guild_id, user.id)
+
+def remove_user(guild_id, user_id) -> Optional[User]:
+    """Remove a user of a guild by Discord ID.
+
+    The change is saved by the background persistence task.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str | int): Discord user ID
+
+    Returns:
+        Optional[User]: The removed user or None if not found
+    """
+    guild_id = guild_key(guild_id)
+    user_id = str(user_id)
+    _touch(guild_id, user_id)
+    get_initiative(guild_id).remove(user_id)
+    return _guilds.get(guild_id, {}).pop(user_id, None)
+
+def get_initiative(guild_id) -> InitiativeTracker:
+    """Get the initiative order of a guild.
+
+    The order is kept up to date by upsert_user and remove_user, so
+    change a user's current_ini only together with upsert_user.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        InitiativeTracker: The guild's initiative order
+    """
+    guild_id = guild_key(guild_id)
+    tracker = _trackers.get(guild_id)
+    if tracker is None:
+        tracker = _trackers[guild_id] = InitiativeTracker()
+    return tracker
+
+def reset_initiative(guild_id) -> int:
+    """Reset the current initiative of everyone in a guild's initiative order.
+
+    Only the characters that had rolled are changed and saved.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        int: Number of characters that were reset
+    """
+    guild_id = guild_key(guild_id)
+    users = get_initiative(guild_id).clear()
+    for user in users:
+        user.current_ini = 0
+        _touch(guild_id, user.id)
+    return len(users)
+
+def get_combat(guild_id) -> Optional[Combat]:
+    """Get the running combat of a guild.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        Optional[Combat]: The running combat or None if there is none
+    """
+    return _combats.get(guild_key(guild_id))
+
+def start_combat(guild_id) -> Combat:
+    """Start a new combat in a guild, replacing a running one.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        Combat: The new combat, with the highest initiative acting first
+    """
+    guild_id = guild_key(guild_id)
+    combat = _combats[guild_id] = Combat(get_initiative(guild_id))
+    combat.start()
+    return combat
+
+def end_combat(guild_id) -> Optional[Combat]:
+    """End the running combat of a guild.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        Optional[Combat]: The ended combat or None if there was none
+    """
+    return _combats.pop(guild_key(guild_id), None)
+
+async def save_combat(guild_id) -> None:
+    """Store the state of a guild's combat, or remove it after the combat ended.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+    """
+    guild_id = guild_key(guild_id)
+    combat = _combats.get(guild_id)
+    state = combat.to_json() if combat else None
+    backend = get_backend()
+    await asyncio.get_running_loop().run_in_executor(
+        backend.executor, backend.write_state, guild_id, COMBAT_STATE, state
+    )
+
+def get_backend() -> StorageBackend:
+    """Get the configured storage backend.
+
+    Returns:
+        StorageBackend: The storage backend
+    """
+    global _backend
+    if _backend is None:
+        _backend = create_backend(STORAGE_BACKEND)
+    return _backend
+
+async def _load_guild(guild_id: str) -> None:
+    """Load a guild's roster and running combat from storage into memory.
+
+    Args:
+        guild_id (str): Roster key of the guild
+    """
+    backend = get_backend()
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        users = await loop.run_in_executor(backend.executor, backend.load_users, guild_id)
+        combat_state = await loop.run_in_executor(
+            backend.executor, backend.load_state, guild_id, COMBAT_STATE
+        )
+        if guild_id not in _guilds:
+            set_users(guild_id, users)
+            if combat_state and guild_id not in _combats:
+                _combats[guild_id] = Combat.from_json(get_initiative(guild_id), combat_state)
+    finally:
+        _loading.pop(guild_id, None)
+        LOAD_SECONDS.observe(time.perf_counter() - started)
+
+async def load_guild(guild_id) -> List[User]:
+    """Load a guild's roster from storage unless it is already in memory.
+
+    Rosters are loaded on first use, so memory and load time only grow
+    with the guilds that are actually active.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+
+    Returns:
+        List[User]: List of the guild's users
+    """
+    guild_id = guild_key(guild_id)
+    if guild_id not in _guilds:
+        task = _loading.get(guild_id)
+        if task is None:
+            task = _loading[guild_id] = asyncio.ensure_future(_load_guild(guild_id))
+        await asyncio.shield(task)
+    return get_users(guild_id)
+
+def save_all_users(guild_id) -> None:
+    """Mark all users of a guild for saving.
+
+    Use this after changing many users in place. The guild's roster is
+    written as a new snapshot by the background persistence task.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+    """
+    _snapshot_guilds.add(guild_key(guild_id))
+
+async def _flush_guild(backend: StorageBackend, guild_id: str,
+                       changed_ids: Set[str], snapshot_dirty: bool) -> None:
+    """Write the unsaved changes of one guild.
+
+    Args:
+        backend (StorageBackend): Storage backend to write to
+        guild_id (str): Roster key of the guild
+        changed_ids (Set[str]): Discord IDs of changed or removed users
+        snapshot_dirty (bool): Whether the whole roster must be written
+    """
+    users = _guilds.get(guild_id, {})
+    upserts = []
+    deletes = []
+    for user_id in changed_ids:
+        user = users.get(user_id)
+        if user:
+            upserts.append(user.to_row())
+        else:
+            deletes.append(user_id)
+    snapshot = None
+    if snapshot_dirty or backend.needs_snapshot(guild_id):
+        snapshot = [user.to_row() for user in users.values()]
+
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            backend.executor, backend.write_changes, guild_id, upserts, deletes, snapshot
+        )
+    except Exception:
+        _changed_ids.setdefault(guild_id, set()).update(changed_ids)
+        if snapshot_dirty:
+            _snapshot_guilds.add(guild_id)
+        raise
+
+async def flush_users() -> None:
+    """Write unsaved changes to storage now.
+
+    Only changed users are written, one batch per guild. A guild's full
+    roster is written instead when save_all_users was called for it or
+    the backend asks for a snapshot, e.g. to compact its journal.
+    Everything is serialized on the event loop and written on the
+    backend's executor, so the loop never blocks on I/O.
+    """
+    global _changed_ids, _snapshot_guilds
+    async with _save_lock:
+        if not _changed_ids and not _snapshot_guilds:
+            return
+        backend = get_backend()
+        changed_ids, snapshot_guilds = _changed_ids, _snapshot_guilds
+        _changed_ids, _snapshot_guilds = {}, set()
+
+        errors = []
+        started = time.perf_counter()
+        for guild_id in set(changed_ids) | snapshot_guilds:
+            try:
+                await _flush_guild(backend, guild_id, changed_ids.get(guild_id, set()),
+                                   guild_id in snapshot_guilds)
+            except Exception as e:
+                errors.append(e)
+        FLUSH_SECONDS.observe(time.perf_counter() - started)
+        if errors:
+            raise errors[0]
+
+async def _persistence_loop(interval: float) -> None:
+    """Periodically flush unsaved changes.
+
+    Args:
+        interval (float): Seconds between flushes
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_users()
+        except Exception:
+            logger.exception("Error saving users")
+
+def start_persistence(interval: float = SAVE_INTERVAL) -> None:
+    """Start the background persistence task.
+
+    Args:
+        interval (float, optional): Seconds between flushes. Defaults to SAVE_INTERVAL.
+    """
+    global _persistence_task
+    if _persistence_task is None or _persistence_task.done():
+        _persistence_task = asyncio.create_task(_persistence_loop(interval))
+
+async def stop_persistence() -> None:
+    """Stop the background persistence task, flush pending changes and close storage."""
+    global _persistence_task, _backend
+    if _persistence_task is not None:
+        _persistence_task.cancel()
+        try:
+            await _persistence_task
+        except asyncio.CancelledError:
+            pass
+        _persistence_task = None
+    try:
+        await flush_users()
+    finally:
+        # Close storage even if the last flush failed
+        if _backend is not None:
+            backend, _backend = _backend, None
+            backend.close()
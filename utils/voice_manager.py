@@ -0,0 +1,177 @@
+"""Voice connection management for the DSA Bot.
+
+The bot keeps at most one voice connection per guild. Joining another
+channel of the same guild moves the connection instead of opening a
+second one, and connections nobody used for VOICE_IDLE_TIMEOUT seconds
+are closed by a background task.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+import discord
+from config import VOICE_IDLE_TIMEOUT
+from utils.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+# Voice connection, last use and join lock per guild ID
+_connections: Dict[int, discord.VoiceClient] = {}
+_last_used: Dict[int, float] = {}
+_locks: Dict[int, asyncio.Lock] = {}
+_eviction_task: Optional[asyncio.Task] = None
+
+VOICE_CONNECTIONS = Gauge('dsa_voice_connections', 'Connected voice channels',
+                          function=lambda: connection_count())
+
+def connection_count() -> int:
+    """Get the number of open voice connections.
+
+    Returns:
+        int: Guilds the bot is connected to a voice channel in
+    """
+    return sum(1 for voice_client in _connections.values() if voice_client.is_connected())
+
+def get_connection(guild_id: int) -> Optional[discord.VoiceClient]:
+    """Get the voice connection of a guild.
+
+    Args:
+        guild_id (int): Discord guild ID
+
+    Returns:
+        Optional[discord.VoiceClient]: The connection or None if not connected
+    """
+    voice_client = _connections.get(guild_id)
+    if voice_client is not None and not voice_client.is_connected():
+        # Disconnected from outside, e.g. kicked from the channel
+        _forget(guild_id)
+        return None
+    return voice_client
+
+def touch(guild_id) -> None:
+    """Mark a guild's voice connection as used, postponing its eviction.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+    """
+    if guild_id and int(guild_id) in _connections:
+        _last_used[int(guild_id)] = time.monotonic()
+
+def _forget(guild_id: int) -> None:
+    """Stop tracking a guild's voice connection."""
+    _connections.pop(guild_id, None)
+    _last_used.pop(guild_id, None)
+
+async def join_channel(channel: discord.VoiceChannel) -> discord.VoiceClient:
+    """Connect to a voice channel, reusing the guild's connection.
+
+    Args:
+        channel (discord.VoiceChannel): The channel to join
+
+    Returns:
+        discord.VoiceClient: The guild's connection, now in the channel
+
+    Raises:
+        discord.ClientException: If connecting failed
+        asyncio.TimeoutError: If connecting timed out
+    """
+    guild_id = channel.guild.id
+    async with _locks.setdefault(guild_id, asyncio.Lock()):
+        # Also adopt connections made before the bot was tracking them
+        voice_client = get_connection(guild_id) or channel.guild.voice_client
+        if voice_client is not None and voice_client.is_connected():
+            if voice_client.channel.id != channel.id:
+                logger.debug("Moving voice connection of guild %s to %s", guild_id, channel.name)
+                await voice_client.move_to(channel)
+        else:
+            if voice_client is not None:
+                await voice_client.disconnect(force=True)
+            logger.debug("Connecting to voice channel %s of guild %s", channel.name, guild_id)
+            voice_client = await channel.connect()
+        _connections[guild_id] = voice_client
+        _last_used[guild_id] = time.monotonic()
+        return voice_client
+
+async def leave_guild(guild: discord.Guild) -> bool:
+    """Disconnect from the voice channel of a guild.
+
+    Args:
+        guild (discord.Guild): The guild
+
+    Returns:
+        bool: False if the bot was not connected
+    """
+    async with _locks.setdefault(guild.id, asyncio.Lock()):
+        voice_client = get_connection(guild.id) or guild.voice_client
+        _forget(guild.id)
+        if voice_client is None:
+            return False
+        await voice_client.disconnect()
+        return True
+
+async def evict_idle(idle_timeout: float = VOICE_IDLE_TIMEOUT) -> int:
+    """Disconnect from voice channels that were not used for a while.
+
+    Args:
+        idle_timeout (float, optional): Seconds since the last use. Defaults to VOICE_IDLE_TIMEOUT.
+
+    Returns:
+        int: Number of closed connections
+    """
+    deadline = time.monotonic() - idle_timeout
+    evicted = 0
+    for guild_id, last_used in list(_last_used.items()):
+        if last_used > deadline:
+            continue
+        voice_client = _connections.get(guild_id)
+        if voice_client is None:
+            continue
+        async with _locks.setdefault(guild_id, asyncio.Lock()):
+            # A join may have used the connection while waiting for the lock
+            if _last_used.get(guild_id, 0.0) > deadline or _connections.get(guild_id) is not voice_client:
+                continue
+            _forget(guild_id)
+            try:
+                await voice_client.disconnect()
+                evicted += 1
+            except Exception:
+                logger.warning("Error leaving idle voice channel of guild %s", guild_id, exc_info=True)
+    if evicted:
+        logger.info("Left %d idle voice channel(s)", evicted)
+    return evicted
+
+async def _eviction_loop(idle_timeout: float) -> None:
+    """Periodically close idle voice connections.
+
+    Args:
+        idle_timeout (float): Seconds after which a connection is idle
+    """
+    while True:
+        await asyncio.sleep(max(1.0, idle_timeout / 4))
+        try:
+            await evict_idle(idle_timeout)
+        except Exception:
+            logger.exception("Error evicting idle voice connections")
+
+def start_eviction(idle_timeout: float = VOICE_IDLE_TIMEOUT) -> None:
+    """Start the background task closing idle voice connections.
+
+    Args:
+        idle_timeout (float, optional): Seconds after which a connection is idle,
+            0 keeps connections open. Defaults to VOICE_IDLE_TIMEOUT.
+    """
+    global _eviction_task
+    if idle_timeout > 0 and (_eviction_task is None or _eviction_task.done()):
+        _eviction_task = asyncio.create_task(_eviction_loop(idle_timeout))
+
+async def stop_eviction() -> None:
+    """Stop the background eviction task."""
+    global _eviction_task
+    if _eviction_task is not None:
+        _eviction_task.cancel()
+        try:
+            await _eviction_task
+        except asyncio.CancelledError:
+            pass
+        _eviction_task = None
@@ -0,0 +1,29 @@
+"""Base view of the DSA Bot."""
+
+import discord
+from utils.instrumentation import instrument_callback, track_view
+
+class InstrumentedView(discord.ui.View):
+    """View whose item callbacks are timed and counted in the metrics.
+
+    Assign an item's callback before adding the item to the view.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the view and count it as live."""
+        super().__init__(*args, **kwargs)
+        track_view(self)
+
+    def add_item(self, item: discord.ui.Item) -> 'InstrumentedView':
+        """Add an item, wrapping its callback with instrumentation.
+
+        Args:
+            item (discord.ui.Item): The item to add
+
+        Returns:
+            InstrumentedView: The view, for chaining
+        """
+        callback = item.callback
+        name = f'{type(self).__name__}.{getattr(callback, "__name__", "callback")}'
+        item.callback = instrument_callback(name, callback)
+        return super().add_item(item)
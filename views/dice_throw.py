@@ -1,16 +1,42 @@
 """View for handling dice throws."""
 
-import random
+import logging
 import discord
 from discord import ButtonStyle
-from discord.ui import Button, View
-from models.user import User
-import asyncio
-
-class ThrowTypeView(View):
+from typing import List, Optional
+from models.user import ATTRIBUTE_NAMES, ATTRIBUTES, User
+from utils.checks import check_odds, resolve_check
+from utils.dice import debug_source, get_stream
+from utils.history import record_check
+from utils.stats import add_check
+from utils.sounds import queue_sound
+from utils.voice_manager import touch
+from views.persistent import (
+    ButtonTemplate, PersistentView, action_of, build_layout, decode_id, encode_id, load_character
+)
+
+logger = logging.getLogger(__name__)
+
+# Button layouts, declared once and built by every view
+THROW_TYPE_LAYOUT = build_layout([
+    ButtonTemplate("throw_simple", "Simple Throw (1 Attribute)", ButtonStyle.primary, 0, "simple_callback"),
+    ButtonTemplate("throw_full", "Full Throw (3 Attributes)", ButtonStyle.success, 0, "full_callback"),
+])
+THROW_LAYOUT = build_layout([
+    # Attributes in rows of 4
+    *(ButtonTemplate(f"attr_{attr}", f"{attr} ({ATTRIBUTE_NAMES[attr]})", ButtonStyle.primary, i // 4,
+                     "attribute_callback")
+      for i, attr in enumerate(ATTRIBUTES)),
+    ButtonTemplate("mod_minus", "-1", ButtonStyle.danger, 2, "modifier_callback"),
+    ButtonTemplate("mod_plus", "+1", ButtonStyle.success, 2, "modifier_callback"),
+    ButtonTemplate("confirm_throw", "Confirm Throw", ButtonStyle.success, 2, "confirm_callback"),
+])
+
+class ThrowTypeView(PersistentView, kind='p'):
     """View for selecting the type of throw."""
 
-    def __init__(self, user: User, timeout: int = 180, debug: int = None, is_dm: bool = False):
+    def __init__(self, user: User, timeout: int = 180, debug: int = None, is_dm: bool = False,
+                 persistent: Optional[bool] = None):
         """Initialize the throw type view.
 
         Args:
@@ -18,33 +44,39 @@ class ThrowTypeView(View):
             timeout (int, optional): View timeout in seconds. Defaults to 180.
             debug (int, optional): Debug value for testing. Defaults to None.
             is_dm (bool, optional): Whether this is a DM throw. Defaults to False.
+            persistent (Optional[bool], optional): Keep the state in the custom_ids.
+                Defaults to PERSISTENT_VIEWS.
         """
-        super().__init__(timeout=timeout)
+        super().__init__(timeout=timeout, persistent=persistent)
         self.user = user
         self.debug = debug
         self.is_dm = is_dm
-        self.add_throw_type_buttons()
-
-    def add_throw_type_buttons(self) -> None:
-        """Add buttons for throw type selection."""
-        print("Adding throw type buttons...")
-        simple_button = Button(
-            label="Simple Throw (1 Attribute)",
-            custom_id="throw_simple",
-            style=ButtonStyle.primary,
-            row=0
-        )
-        full_button = Button(
-            label="Full Throw (3 Attributes)",
-            custom_id="throw_full",
-            style=ButtonStyle.success,
-            row=0
-        )
-        simple_button.callback = self.simple_callback
-        full_button.callback = self.full_callback
-        self.add_item(simple_button)
-        self.add_item(full_button)
-        print("Throw type buttons added")
+        self.add_layout(THROW_TYPE_LAYOUT)
+
+    def state_fields(self) -> List[str]:
+        """Get the view's state for its custom_ids.
+
+        Returns:
+            List[str]: Owner, debug value and DM flag
+        """
+        return [encode_id(self.user.id), '' if self.debug is None else str(self.debug), str(int(self.is_dm))]
+
+    @classmethod
+    async def from_state(cls, interaction: discord.Interaction, fields: List[str]) -> Optional['ThrowTypeView']:
+        """Rebuild the view from the state in a clicked custom_id.
+
+        Args:
+            interaction (discord.Interaction): The click
+            fields (List[str]): Owner, debug value and DM flag
+
+        Returns:
+            Optional[ThrowTypeView]: The view or None if the character is gone
+        """
+        owner, debug, is_dm = fields
+        user = await load_character(interaction.guild_id, decode_id(owner))
+        if user is None:
+            return None
+        return cls(user, debug=int(debug) if debug else None, is_dm=is_dm == '1', persistent=True)
 
     async def simple_callback(self, interaction: discord.Interaction) -> None:
         """Handle simple throw selection.
@@ -56,7 +88,8 @@ class ThrowTypeView(View):
             await interaction.response.send_message("This is not your throw!", ephemeral=True)
             return
 
-        view = DiceThrowView(self.user, debug=self.debug, is_dm=self.is_dm, simple=True)
+        view = DiceThrowView(self.user, debug=self.debug, is_dm=self.is_dm, simple=True,
+                             persistent=self.persistent)
         await interaction.response.edit_message(
             content="Select your attribute and adjust the modifier:",
             view=view
@@ -72,16 +105,18 @@ class ThrowTypeView(View):
             await interaction.response.send_message("This is not your throw!", ephemeral=True)
             return
 
-        view = DiceThrowView(self.user, debug=self.debug, is_dm=self.is_dm, simple=False)
+        view = DiceThrowView(self.user, debug=self.debug, is_dm=self.is_dm, simple=False,
+                             persistent=self.persistent)
         await interaction.response.edit_message(
             content="Select your attributes and adjust the modifier:",
             view=view
         )
 
-class DiceThrowView(View):
+class DiceThrowView(PersistentView, kind='t'):
     """View for handling dice throws with attribute selection."""
 
-    def __init__(self, user: User, timeout: int = 180, debug: int = None, is_dm: bool = False, simple: bool = False):
+    def __init__(self, user: User, timeout: int = 180, debug: int = None, is_dm: bool = False, simple: bool = False,
+                 persistent: Optional[bool] = None):
         """Initialize the dice throw view.
 
         Args:
@@ -90,84 +125,59 @@ class DiceThrowView(View):
             debug (int, optional): Debug value for testing. Defaults to None.
             is_dm (bool, optional): Whether this is a DM throw. Defaults to False.
             simple (bool, optional): Whether this is a simple attribute throw. Defaults to False.
+            persistent (Optional[bool], optional): Keep the state in the custom_ids.
+                Defaults to PERSISTENT_VIEWS.
         """
-        super().__init__(timeout=timeout)
+        super().__init__(timeout=timeout, persistent=persistent)
         self.user = user
         self.selected_attributes = []
         self.modifier = 0
-        self.rolls = {}
+        self.rolls = []
         self.debug = debug
         self.is_dm = is_dm
         self.simple = simple
-        print(f"\n=== Initializing DiceThrowView ===")
-        print(f"User: {user.name} ({user.id})")
-        print(f"Character: {user.char_name}")
-        print(f"Debug mode: {debug}")
-        print(f"DM throw: {is_dm}")
-        print(f"Simple throw: {simple}")
-        self.add_attribute_buttons()
-        self.add_modifier_buttons()
-        self.add_confirm_button()
-
-    def add_attribute_buttons(self) -> None:
-        """Add buttons for attribute selection."""
-        print("Adding attribute buttons...")
-        attributes = [
-            ("MU", "Mut"),
-            ("KL", "Klugheit"),
-            ("IN", "Intuition"),
-            ("CH", "Charisma"),
-            ("FF", "Fingerfertigkeit"),
-            ("GE", "Gewandtheit"),
-            ("KO", "Konstitution"),
-            ("KK", "Körperkraft")
+        logger.debug("Throw view for %s (%s): debug=%s, dm=%s, simple=%s",
+                     user.char_name, user.id, debug, is_dm, simple)
+        self.add_layout(THROW_LAYOUT)
+
+    def state_fields(self) -> List[str]:
+        """Get the view's state for its custom_ids.
+
+        Returns:
+            List[str]: Owner, debug value, DM and simple flags, selected
+                attributes and modifier
+        """
+        return [
+            encode_id(self.user.id), '' if self.debug is None else str(self.debug),
+            str(int(self.is_dm)), str(int(self.simple)), ''.join(self.selected_attributes), str(self.modifier)
         ]
-        
-        # Add attributes in rows of 4
-        for i, (attr, name) in enumerate(attributes):
-            button = Button(
-                label=f"{attr} ({name})",
-                custom_id=f"attr_{attr}",
-                style=ButtonStyle.primary,
-                row=i // 4
-            )
-            button.callback = self.attribute_callback
-            self.add_item(button)
-        print("Attribute buttons added")
-
-    def add_modifier_buttons(self) -> None:
-        """Add buttons for modifier adjustment."""
-        print("Adding modifier buttons...")
-        minus_button = Button(
-            label="-1",
-            custom_id="mod_minus",
-            style=ButtonStyle.danger,
-            row=2
-        )
-        plus_button = Button(
-            label="+1",
-            custom_id="mod_plus",
-            style=ButtonStyle.success,
-            row=2
-        )
-        minus_button.callback = self.modifier_callback
-        plus_button.callback = self.modifier_callback
-        self.add_item(minus_button)
-        self.add_item(plus_button)
-        print("Modifier buttons added")
-
-    def add_confirm_button(self) -> None:
-        """Add the confirm button."""
-        print("Adding confirm button...")
-        confirm_button = Button(
-            label="Confirm Throw",
-            custom_id="confirm_throw",
-            style=ButtonStyle.success,
-            row=2
-        )
-        confirm_button.callback = self.confirm_callback
-        self.add_item(confirm_button)
-        print("Confirm button added")
+
+    @classmethod
+    async def from_state(cls, interaction: discord.Interaction, fields: List[str]) -> Optional['DiceThrowView']:
+        """Rebuild the view from the state in a clicked custom_id.
+
+        Args:
+            interaction (discord.Interaction): The click
+            fields (List[str]): Fields written by state_fields
+
+        Returns:
+            Optional[DiceThrowView]: The view or None if the character is gone
+
+        Raises:
+            ValueError: If an attribute is unknown
+        """
+        owner, debug, is_dm, simple, attributes, modifier = fields
+        selected = [attributes[i:i + 2] for i in range(0, len(attributes), 2)]
+        if not set(selected) <= set(ATTRIBUTES):
+            raise ValueError(f"Unknown attributes: {attributes}")
+        user = await load_character(interaction.guild_id, decode_id(owner))
+        if user is None:
+            return None
+        view = cls(user, debug=int(debug) if debug else None, is_dm=is_dm == '1',
+                   simple=simple == '1', persistent=True)
+        view.selected_attributes = selected
+        view.modifier = int(modifier)
+        return view
 
     async def attribute_callback(self, interaction: discord.Interaction) -> None:
         """Handle attribute button clicks.
@@ -175,41 +185,29 @@ class DiceThrowView(View):
         Args:
             interaction (discord.Interaction): The interaction that triggered this callback
         """
-        print(f"\n=== Attribute Selection ===")
-        print(f"User: {interaction.user.name} ({interaction.user.id})")
-        print(f"Expected user: {self.user.name} ({self.user.id})")
+        logger.debug("Attribute Selection by %s (%s)", interaction.user.name, interaction.user.id)
         
         if str(interaction.user.id) != str(self.user.id):
-            print("Wrong user tried to use the throw")
+            logger.debug("%s tried to use the throw of %s", interaction.user.id, self.user.id)
             await interaction.response.send_message("This is not your throw!", ephemeral=True)
             return
 
         max_attributes = 1 if self.simple else 3
         if len(self.selected_attributes) >= max_attributes:
-            print(f"User tried to select more than {max_attributes} attributes")
+            logger.debug("User tried to select more than %s attributes", max_attributes)
             await interaction.response.send_message(f"You have already selected {max_attributes} attribute{'s' if max_attributes > 1 else ''}!", ephemeral=True)
             return
 
-        button = interaction.data.get("custom_id")
+        button = action_of(interaction.data.get("custom_id", ""))
         if not button:
-            print("Could not identify button")
+            logger.debug("Could not identify button")
             await interaction.response.send_message("Error: Could not identify the button!", ephemeral=True)
             return
 
         attr = button.split('_')[1]
         self.selected_attributes.append(attr)
-        print(f"Selected attribute: {attr}")
-        
-        selection_text = []
-        for i, attr in enumerate(self.selected_attributes):
-            attr_value = getattr(self.user, attr)
-            selection_text.append(f"{i+1}. {attr}: {attr_value}")
-        
-        print(f"Current selection: {selection_text}")
-        await interaction.response.edit_message(
-            content=f"Selected attributes:\n" + "\n".join(selection_text),
-            view=self
-        )
+        logger.debug("Selected attribute: %s", attr)
+        await self.show(interaction, self.render_selection)
 
     async def modifier_callback(self, interaction: discord.Interaction) -> None:
         """Handle modifier button clicks.
@@ -217,60 +215,67 @@ class DiceThrowView(View):
         Args:
             interaction (discord.Interaction): The interaction that triggered this callback
         """
-        print(f"\n=== Modifier Adjustment ===")
-        print(f"User: {interaction.user.name} ({interaction.user.id})")
-        print(f"Expected user: {self.user.name} ({self.user.id})")
+        logger.debug("Modifier Adjustment by %s (%s)", interaction.user.name, interaction.user.id)
         
         if str(interaction.user.id) != str(self.user.id):
-            print("Wrong user tried to use the throw")
+            logger.debug("%s tried to use the throw of %s", interaction.user.id, self.user.id)
             await interaction.response.send_message("This is not your throw!", ephemeral=True)
             return
 
-        button = interaction.data.get("custom_id")
+        button = action_of(interaction.data.get("custom_id", ""))
         if not button:
-            print("Could not identify button")
+            logger.debug("Could not identify button")
             await interaction.response.send_message("Error: Could not identify the button!", ephemeral=True)
             return
 
         change = -1 if button == "mod_minus" else 1
         self.modifier += change
-        print(f"New modifier value: {self.modifier}")
+        logger.debug("New modifier value: %s", self.modifier)
+        await self.show(interaction, self.render_selection)
+
+    def render_selection(self) -> dict:
+        """Render the message showing the current selection.
 
+        Returns:
+            dict: Keyword arguments for editing the message
+        """
         selection_text = []
         for i, attr in enumerate(self.selected_attributes):
             attr_value = getattr(self.user, attr)
             mod_str = f" ({self.modifier:+d})" if self.modifier != 0 else ""
             selection_text.append(f"{i+1}. {attr}: {attr_value}{mod_str}")
-        
-        print(f"Updated selection: {selection_text}")
-        await interaction.response.edit_message(
-            content=f"Selected attributes:\n" + "\n".join(selection_text),
-            view=self
-        )
+        return {
+            "content": "Selected attributes:\n" + "\n".join(selection_text) + self.odds_preview(),
+            "view": self
+        }
 
-    async def play_sound(self, interaction: discord.Interaction, sound_id: int) -> None:
-        """Play a soundboard sound in the voice channel.
+    def odds_preview(self) -> str:
+        """Describe the odds of the selected check.
+
+        Returns:
+            str: Odds text to append to the message, empty until all attributes are selected
+        """
+        required_attributes = 1 if self.simple else 3
+        if len(self.selected_attributes) != required_attributes:
+            return ""
+        odds = check_odds([getattr(self.user, attr) for attr in self.selected_attributes], self.modifier)
+        text = f"\n\nSuccess chance: {odds.success:.1%}"
+        if required_attributes > 1:
+            text += f" (🎉 {odds.party_effect:.2%}, 💀 {odds.doom_effect:.2%})"
+        return text
+
+    def play_sound(self, interaction: discord.Interaction, sound_id: int) -> None:
+        """Play a soundboard sound in the user's voice channel, in the background.
 
         Args:
             interaction (discord.Interaction): The interaction that triggered this callback
             sound_id (int): ID of the soundboard sound to play
         """
-        try:
-            # Get the user's voice channel
-            if not interaction.user.voice:
-                print("User is not in a voice channel")
-                return
-
-            voice_channel = interaction.user.voice.channel
-            print(f"User is in voice channel: {voice_channel.name}")
-
-            # Play the soundboard sound using the correct format
-            sound = discord.BaseSoundboardSound(id=sound_id, volume=1.0)
-            await voice_channel.send_sound(sound)
-            print(f"Playing soundboard sound: {sound_id}")
-
-        except Exception as e:
-            print(f"Error playing sound: {str(e)}")
+        if not interaction.user.voice:
+            logger.debug("User is not in a voice channel")
+            return
+        touch(interaction.guild_id)
+        queue_sound(interaction.client, interaction.user.voice.channel, sound_id)
 
     async def confirm_callback(self, interaction: discord.Interaction) -> None:
         """Handle confirm button clicks.
@@ -279,69 +284,54 @@ class DiceThrowView(View):
             interaction (discord.Interaction): The interaction that triggered this callback
         """
         try:
-            print(f"\n=== Confirming Throw ===")
-            print(f"User: {interaction.user.name} ({interaction.user.id})")
-            print(f"Expected user: {self.user.name} ({self.user.id})")
-            print(f"Selected attributes: {self.selected_attributes}")
-            print(f"Modifier: {self.modifier}")
+            logger.debug("Confirming Throw by %s (%s)", interaction.user.name, interaction.user.id)
             
             if str(interaction.user.id) != str(self.user.id):
-                print("Wrong user tried to use the throw")
+                logger.debug("%s tried to use the throw of %s", interaction.user.id, self.user.id)
                 await interaction.response.send_message("This is not your throw!", ephemeral=True)
                 return
 
             required_attributes = 1 if self.simple else 3
             if len(self.selected_attributes) != required_attributes:
-                print(f"User tried to confirm with wrong number of attributes")
+                logger.debug("User tried to confirm with wrong number of attributes")
                 await interaction.response.send_message(f"You need to select exactly {required_attributes} attribute{'s' if required_attributes > 1 else ''}!", ephemeral=True)
                 return
 
             # Defer the response immediately to prevent timeout
             await interaction.response.defer()
+            # Pending selection edits must not overwrite the results
+            await self.edits.close()
 
             # Make the rolls
             if self.debug is not None:
-                print(f"Using debug value: {self.debug}")
-                if self.debug == 1:
-                    self.rolls = {0: 1, 1: 1, 2: random.randint(1, 20)}
-                elif self.debug == 20:
-                    self.rolls = {0: 20, 1: 20, 2: random.randint(1, 20)}
+                logger.debug("Using debug value: %s", self.debug)
+                dice = debug_source(interaction.guild_id, self.debug)
             else:
-                self.rolls = {i: random.randint(1, 20) for i in range(required_attributes)}
-            print(f"Rolls: {self.rolls}")
-
-            # Check for party and doom effects
-            party_effect = len([r for r in self.rolls.values() if r == 1]) >= 2
-            doom_effect = len([r for r in self.rolls.values() if r == 20]) >= 2
-            print(f"Party effect: {party_effect}")
-            print(f"Doom effect: {doom_effect}")
+                dice = get_stream(interaction.guild_id)
+            self.rolls = dice.roll_many(20, required_attributes)
 
             # Perform the throw
-            results = []
-            total_diff = 0
-            any_failures = False
-            all_success = True
-
-            for i, attr in enumerate(self.selected_attributes):
-                roll = self.rolls[i]
-                attr_value = getattr(self.user, attr)
-                modified_attr = attr_value + self.modifier
-                success = roll <= modified_attr
-                diff = 0 if success else roll - modified_attr
-                total_diff += diff
-                
-                if not success:
-                    any_failures = True
-                    all_success = False
+            attribute_values = [getattr(self.user, attr) for attr in self.selected_attributes]
+            check = resolve_check(self.rolls, attribute_values, self.modifier)
+            record_check(interaction.guild_id, self.user.id, self.selected_attributes, self.modifier,
+                         check, debug=self.debug is not None)
+            if self.debug is None:
+                # Forced debug dice would skew the statistics
+                add_check(interaction.guild_id, self.user.id, self.selected_attributes, check)
+            party_effect = check.party_effect
+            doom_effect = check.doom_effect
+            all_success = check.all_success
+            total_diff = check.total_diff
 
+            results = []
+            for attr, roll, diff in zip(self.selected_attributes, check.rolls, check.diffs):
                 result = f"{attr}: {roll}"
-                if not success:
+                if diff:
                     result += f" (Diff: {diff:+d})"
                 results.append(result)
-                print(f"Attribute {attr}: Roll={roll}, Value={attr_value}, Modified={modified_attr}, Success={success}, Diff={diff}")
 
-            print(f"Total difference: {total_diff}")
-            print(f"All success: {all_success}")
+            logger.debug("Throw of %s with %s, modifier %+d: %s", self.user.char_name,
+                         self.selected_attributes, self.modifier, check)
 
             # Create result embed
             embed = discord.Embed(
@@ -353,15 +343,15 @@ class DiceThrowView(View):
             if party_effect:
                 embed.color = discord.Color.green()
                 embed.description = "🎉 Two 1s were rolled!"
-                await self.play_sound(interaction, 1370159584701976656)  # Party effect sound
+                self.play_sound(interaction, 1370159584701976656)  # Party effect sound
             elif doom_effect:
                 embed.color = discord.Color.red()
                 embed.description = "💀 Two 20s were rolled!"
-                await self.play_sound(interaction, 1370159584701976657)  # Doom effect sound
+                self.play_sound(interaction, 1370159584701976657)  # Doom effect sound
             elif all_success:
                 embed.color = discord.Color.green()
                 embed.description = "✅ All checks successful!"
-                await self.play_sound(interaction, 1370159584701976658)  # Success sound
+                self.play_sound(interaction, 1370159584701976658)  # Success sound
 
             for result in results:
                 embed.add_field(name="", value=result, inline=False)
@@ -372,7 +362,7 @@ class DiceThrowView(View):
                 inline=False
             )
 
-            print("Sending results to user")
+            logger.debug("Sending results to user")
             # Use followup since we deferred the response
             await interaction.followup.edit_message(
                 message_id=interaction.message.id,
@@ -381,7 +371,7 @@ class DiceThrowView(View):
                 view=None
             )
         except Exception as e:
-            print(f"Error in confirm callback: {str(e)}")
+            logger.exception("Error in confirm callback")
             if not interaction.response.is_done():
                 await interaction.response.send_message(f"❌ An error occurred: {str(e)}", ephemeral=True)
             else:
@@ -1,20 +1,28 @@
 """View for handling dungeon master rolls."""
 
+import logging
 import discord
+from typing import List, Optional
 from models.user import User
 from views.dice_throw import DiceThrowView
+from views.persistent import PersistentView, action_of, load_character
+from utils.user_manager import get_user
 
-class DungeonMasterRollView(discord.ui.View):
+logger = logging.getLogger(__name__)
+
+class DungeonMasterRollView(PersistentView, kind='d'):
     """View for handling dungeon master rolls."""
 
-    def __init__(self, users: list[User], debug: int = None):
+    def __init__(self, users: list[User], debug: int = None, persistent: Optional[bool] = None):
         """Initialize the dungeon master roll view.
 
         Args:
             users (list[User]): List of users to choose from
             debug (int, optional): Debug value for testing. Defaults to None.
+            persistent (Optional[bool], optional): Keep the state in the custom_ids.
+                Defaults to PERSISTENT_VIEWS.
         """
-        super().__init__(timeout=300)  # 5 minute timeout
+        super().__init__(timeout=300, persistent=persistent)  # 5 minute timeout
         self.debug = debug
         self.users = users  # Store users list as instance variable
         self.add_character_buttons(users)
@@ -26,14 +34,41 @@ class DungeonMasterRollView(discord.ui.View):
             users (list[User]): List of users to create buttons for
         """
         for user in users:
-            button = discord.ui.Button(
+            button = self.button(
+                f"char_{user.id}",
                 label=user.char_name,
-                custom_id=f"char_{user.id}",
                 style=discord.ButtonStyle.primary
             )
             button.callback = self.character_callback
             self.add_item(button)
 
+    def state_fields(self) -> List[str]:
+        """Get the view's state for its custom_ids.
+
+        Returns:
+            List[str]: The debug value, the characters are in the actions
+        """
+        return ['' if self.debug is None else str(self.debug)]
+
+    @classmethod
+    async def from_state(cls, interaction: discord.Interaction,
+                         fields: List[str]) -> Optional['DungeonMasterRollView']:
+        """Rebuild the view with the clicked character only.
+
+        Args:
+            interaction (discord.Interaction): The click
+            fields (List[str]): The debug value
+
+        Returns:
+            Optional[DungeonMasterRollView]: The view or None if the character is gone
+        """
+        debug, = fields
+        char_id = action_of(interaction.data["custom_id"]).split("_")[1]
+        user = await load_character(interaction.guild_id, char_id)
+        if user is None:
+            return None
+        return cls([user], debug=int(debug) if debug else None, persistent=True)
+
     async def character_callback(self, interaction: discord.Interaction):
         """Handle character selection.
 
@@ -42,8 +77,8 @@ class DungeonMasterRollView(discord.ui.View):
         """
         try:
             # Get the selected character
-            char_id = interaction.data["custom_id"].split("_")[1]
-            selected_user = next((user for user in self.users if str(user.id) == char_id), None)
+            char_id = action_of(interaction.data["custom_id"]).split("_")[1]
+            selected_user = get_user(interaction.guild_id, char_id)
             
             if not selected_user:
                 await interaction.response.send_message(
@@ -53,12 +88,12 @@ class DungeonMasterRollView(discord.ui.View):
                 return
 
             # Create dice throw view for the selected character
-            view = DiceThrowView(selected_user, debug=self.debug, is_dm=True)
+            view = DiceThrowView(selected_user, debug=self.debug, is_dm=True, persistent=self.persistent)
             await interaction.response.edit_message(
                 content=f"Making throw for {selected_user.char_name}. Select up to 3 attributes:",
                 view=view
             )
 
         except Exception as e:
-            print(f"Error in character callback: {str(e)}")
+            logger.exception("Error in character callback")
             await interaction.response.send_message(f'❌ An error occurred: {str(e)}') 
\ No newline at end of file
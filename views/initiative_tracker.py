@@ -0,0 +1,126 @@
+"""Live tracker message for running combats."""
+
+import logging
+import discord
+from utils.initiative import Combat
+from utils.user_manager import get_combat, save_combat
+from views.base import InstrumentedView
+
+logger = logging.getLogger(__name__)
+
+# Most characters listed in the tracker
+TRACKER_LIMIT = 25
+
+def combat_embed(combat: Combat) -> discord.Embed:
+    """Create the tracker embed of a combat.
+
+    Args:
+        combat (Combat): The running combat
+
+    Returns:
+        discord.Embed: Embed listing the initiative order and whose turn it is
+    """
+    tracker = combat.tracker
+    lines = []
+    for user in tracker.users(0, TRACKER_LIMIT):
+        if user.id == combat.current:
+            lines.append(f"▶️ **{user.char_name}** ({user.current_ini})")
+        elif user.id in combat.delayed:
+            lines.append(f"⏸️ {user.char_name} ({user.current_ini}, delayed)")
+        else:
+            lines.append(f"▫️ {user.char_name} ({user.current_ini})")
+    if len(tracker) > TRACKER_LIMIT:
+        lines.append(f"... and {len(tracker) - TRACKER_LIMIT} more")
+
+    embed = discord.Embed(
+        title=f"⚔️ Combat - Round {combat.round}",
+        description="\n".join(lines) or "No one has rolled for initiative yet!",
+        color=discord.Color.blue()
+    )
+    current_user = combat.current_user()
+    if current_user:
+        embed.set_footer(text=f"{current_user.char_name}'s turn")
+    return embed
+
+async def refresh_tracker(client: discord.Client, combat: Combat) -> bool:
+    """Edit a combat's tracker message to show its current state.
+
+    Args:
+        client (discord.Client): The bot client
+        combat (Combat): The running combat
+
+    Returns:
+        bool: False if the tracker message no longer exists
+    """
+    if combat.channel_id is None or combat.message_id is None:
+        return False
+    message = client.get_partial_messageable(combat.channel_id).get_partial_message(combat.message_id)
+    try:
+        await message.edit(embed=combat_embed(combat), view=InitiativeTrackerView())
+    except discord.NotFound:
+        return False
+    return True
+
+class InitiativeTrackerView(InstrumentedView):
+    """Buttons of the tracker message.
+
+    The view holds no state, every click acts on the combat of the guild
+    it was clicked in. This keeps the buttons working after a restart.
+    """
+
+    def __init__(self):
+        """Initialize the tracker view."""
+        super().__init__(timeout=None)
+        self.add_buttons()
+
+    def add_buttons(self) -> None:
+        """Add the turn buttons."""
+        buttons = (
+            ("⏮️ Previous", "init_tracker:prev", discord.ButtonStyle.secondary),
+            ("⏭️ Next", "init_tracker:next", discord.ButtonStyle.primary),
+            ("⏸️ Delay", "init_tracker:delay", discord.ButtonStyle.secondary),
+            ("▶️ Ready", "init_tracker:ready", discord.ButtonStyle.success),
+        )
+        for label, custom_id, style in buttons:
+            button = discord.ui.Button(label=label, custom_id=custom_id, style=style, row=0)
+            button.callback = self.turn_callback
+            self.add_item(button)
+
+    async def turn_callback(self, interaction: discord.Interaction) -> None:
+        """Handle turn button clicks.
+
+        The tracker message is updated as the response to the click, so
+        every turn costs a single message edit.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this callback
+        """
+        try:
+            combat = get_combat(interaction.guild_id)
+            if combat is None or combat.message_id != interaction.message.id:
+                await interaction.response.send_message("This combat has ended!", ephemeral=True)
+                return
+
+            action = interaction.data["custom_id"].split(":")[1]
+            if action == "prev":
+                combat.prev()
+            elif action == "next":
+                combat.next()
+            elif action == "delay":
+                combat.delay()
+            elif action == "ready" and not combat.ready(str(interaction.user.id)):
+                await interaction.response.send_message(
+                    "Your character has not delayed its action!",
+                    ephemeral=True
+                )
+                return
+
+            await interaction.response.edit_message(embed=combat_embed(combat), view=self)
+            await save_combat(interaction.guild_id)
+
+        except Exception as e:
+            logger.exception("Error in tracker callback")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f"❌ An error occurred: {str(e)}", ephemeral=True)
+            else:
+                await interaction.followup.send(f"❌ An error occurred: {str(e)}", ephemeral=True)
@@ -0,0 +1,296 @@
+"""Persistent prompts of the DSA Bot.
+
+In persistent mode, a prompt's state is encoded in the custom_id of each
+of its buttons: dsa:<kind>:<state fields>:<action>. Clicks are dispatched
+by discord.py to the single registered PromptRouter, which rebuilds the
+prompt's view from the custom_id and runs the clicked button's callback.
+No view object is kept between clicks, so memory does not grow with the
+number of open prompts and prompts keep working after a restart.
+"""
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type
+import discord
+from config import PERSISTENT_VIEWS
+from models.user import User
+from utils.edits import EditCoalescer
+from utils.user_manager import get_user, load_guild
+from views.base import InstrumentedView
+
+logger = logging.getLogger(__name__)
+
+# Prefix of all persistent custom_ids, Discord allows 100 characters in total
+PREFIX = 'dsa'
+TEMPLATE = re.compile(rf'{PREFIX}:(?P<kind>[a-z]):(?P<fields>[^:]*(?::[^:]*)*)')
+MAX_CUSTOM_ID = 100
+
+# Prompt view class per kind, filled by PersistentView subclasses
+_prompts: Dict[str, Type['PersistentView']] = {}
+
+def encode_id(user_id) -> str:
+    """Shorten a Discord ID for a custom_id.
+
+    Args:
+        user_id (str | int): Discord ID
+
+    Returns:
+        str: The ID in base 36
+    """
+    value = int(user_id)
+    digits = ''
+    while True:
+        value, digit = divmod(value, 36)
+        digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+        if not value:
+            return digits
+
+def decode_id(text: str) -> str:
+    """Expand a Discord ID shortened by encode_id.
+
+    Args:
+        text (str): The ID in base 36
+
+    Returns:
+        str: The Discord ID
+    """
+    return str(int(text, 36))
+
+def action_of(custom_id: str) -> str:
+    """Get the action of a button, the last part of its custom_id.
+
+    Works for plain custom_ids like mod_plus and persistent ones alike.
+
+    Args:
+        custom_id (str): custom_id of the clicked button
+
+    Returns:
+        str: The action, e.g. mod_plus
+    """
+    return custom_id.rsplit(':', 1)[-1]
+
+class ButtonTemplate(NamedTuple):
+    """One button of a prompt layout."""
+    action: str
+    label: str
+    style: discord.ButtonStyle
+    row: int
+    callback: str  # name of the view method handling clicks
+
+# Buttons of a prompt, in display order
+Layout = Tuple[ButtonTemplate, ...]
+
+def build_layout(templates: Sequence[ButtonTemplate]) -> Layout:
+    """Declare the buttons of a prompt layout once, to be built by every view.
+
+    Args:
+        templates (Sequence[ButtonTemplate]): The buttons, in display order
+
+    Returns:
+        Layout: The templates
+    """
+    return tuple(templates)
+
+async def load_character(guild_id, user_id: str) -> Optional[User]:
+    """Look up the character of a prompt, loading its guild after a restart.
+
+    Args:
+        guild_id (str | int | None): Discord guild ID
+        user_id (str): Discord user ID
+
+    Returns:
+        Optional[User]: The character or None if it was deleted
+    """
+    await load_guild(guild_id)
+    return get_user(guild_id, user_id)
+
+class PromptRouter(discord.ui.DynamicItem[discord.ui.Button], template=TEMPLATE):
+    """The one registered handler of all persistent prompt buttons."""
+
+    def __init__(self, button: discord.ui.Button):
+        """Wrap a button with a persistent custom_id.
+
+        Args:
+            button (discord.ui.Button): The button
+        """
+        super().__init__(button)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button,
+                             match: re.Match) -> 'PromptRouter':
+        """Create the router for a clicked button."""
+        return cls(item)
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        """Rebuild the clicked prompt and run the button's callback.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered this callback
+        """
+        match = self.template.fullmatch(self.custom_id)
+        *fields, action = match['fields'].split(':')
+        prompt = _prompts.get(match['kind'])
+        view = None
+        if prompt is not None:
+            try:
+                view = await prompt.from_state(interaction, fields)
+            except (ValueError, IndexError):
+                logger.warning("Malformed prompt custom_id: %s", self.custom_id)
+        if view is None:
+            await interaction.response.send_message("This prompt has expired, please start a new one!",
+                                                    ephemeral=True)
+            return
+        await view.dispatch_action(interaction, action)
+
+class PersistentView(InstrumentedView):
+    """View whose buttons can carry its whole state in their custom_ids.
+
+    Subclasses pass their kind, a single lowercase letter, in the class
+    statement, create their buttons with button(), list their state in
+    state_fields() and restore it in from_state(). Fixed buttons come from
+    a layout declared once at import, see build_layout.
+    """
+
+    kind: str = ''
+
+    def __init_subclass__(cls, kind: str = '', **kwargs):
+        super().__init_subclass__(**kwargs)
+        if kind:
+            cls.kind = kind
+            _prompts[kind] = cls
+
+    def __init__(self, timeout: Optional[float] = 180, persistent: Optional[bool] = None):
+        """Initialize the view.
+
+        Args:
+            timeout (Optional[float], optional): View timeout in seconds, ignored
+                for persistent views. Defaults to 180.
+            persistent (Optional[bool], optional): Encode the state in the custom_ids.
+                Defaults to PERSISTENT_VIEWS, read when the view is created.
+        """
+        if persistent is None:
+            persistent = PERSISTENT_VIEWS
+        super().__init__(timeout=None if persistent else timeout)
+        self.persistent = persistent
+        self.edits = EditCoalescer()
+
+    def state_fields(self) -> List[str]:
+        """Get the view's state for its custom_ids.
+
+        Returns:
+            List[str]: State fields, without ':'
+        """
+        raise NotImplementedError
+
+    @classmethod
+    async def from_state(cls, interaction: discord.Interaction, fields: List[str]) -> Optional['PersistentView']:
+        """Rebuild a view from the state in a clicked custom_id.
+
+        Args:
+            interaction (discord.Interaction): The click
+            fields (List[str]): The state fields written by state_fields
+
+        Returns:
+            Optional[PersistentView]: The view or None if the prompt is no longer valid
+
+        Raises:
+            ValueError: If the fields are malformed
+        """
+        raise NotImplementedError
+
+    def state_prefix(self) -> str:
+        """Get the start of the custom_ids, carrying the view's current state.
+
+        Returns:
+            str: dsa:<kind>:<state fields>:
+        """
+        return ':'.join([PREFIX, self.kind, *self.state_fields(), ''])
+
+    def custom_id(self, action: str, prefix: Optional[str] = None) -> str:
+        """Get the custom_id of a button.
+
+        Args:
+            action (str): The button's action, e.g. mod_plus
+            prefix (Optional[str], optional): The state_prefix, when building
+                several custom_ids at once. Defaults to None.
+
+        Returns:
+            str: The persistent custom_id in persistent mode, else the action
+        """
+        if not self.persistent:
+            return action
+        custom_id = (prefix or self.state_prefix()) + action
+        if len(custom_id) > MAX_CUSTOM_ID:
+            raise ValueError(f"custom_id too long: {custom_id}")
+        return custom_id
+
+    def button(self, action: str, **kwargs) -> discord.ui.Item:
+        """Create a button of the view.
+
+        Args:
+            action (str): The button's action, e.g. mod_plus
+            **kwargs: Arguments of discord.ui.Button
+
+        Returns:
+            discord.ui.Item: The button, routed by PromptRouter in persistent mode
+        """
+        button = discord.ui.Button(custom_id=self.custom_id(action), **kwargs)
+        return PromptRouter(button) if self.persistent else button
+
+    def add_layout(self, layout: Layout) -> None:
+        """Add the buttons of a layout.
+
+        Every view builds its own buttons, since their components change
+        with the view, e.g. their custom_ids in persistent mode. Building a
+        button is cheaper than copying a prebuilt one with a component of
+        its own.
+
+        Args:
+            layout (Layout): Layout declared by build_layout
+        """
+        prefix = self.state_prefix() if self.persistent else None
+        for template in layout:
+            item = discord.ui.Button(style=template.style, label=template.label,
+                                     custom_id=self.custom_id(template.action, prefix), row=template.row)
+            if self.persistent:
+                item = PromptRouter(item)
+            # On the router in persistent mode, dispatch_action calls it
+            item.callback = getattr(self, template.callback)
+            self.add_item(item)
+
+    def refresh_custom_ids(self) -> None:
+        """Write the current state into the custom_ids, before showing the view again."""
+        if self.persistent:
+            prefix = self.state_prefix()
+            for item in self.children:
+                item.custom_id = self.custom_id(action_of(item.custom_id), prefix)
+
+    async def show(self, interaction: discord.Interaction, render: Callable[[], Dict[str, Any]]) -> None:
+        """Show the view's new state after a click.
+
+        Clicks are coalesced into few edits. Persistent views edit right
+        away instead, the next click carries the state of the edited buttons.
+
+        Args:
+            interaction (discord.Interaction): The click
+            render (Callable[[], Dict[str, Any]]): Returns the keyword arguments of the edit
+        """
+        if self.persistent:
+            self.refresh_custom_ids()
+            await interaction.response.edit_message(**render())
+        else:
+            await self.edits.push(interaction, render)
+
+    async def dispatch_action(self, interaction: discord.Interaction, action: str) -> None:
+        """Run the callback of the button with an action.
+
+        Args:
+            interaction (discord.Interaction): The click
+            action (str): The clicked button's action
+        """
+        for item in self.children:
+            if action_of(item.custom_id) == action:
+                await item.callback(interaction)
+                return
+        await interaction.response.send_message("This prompt has expired, please start a new one!",
+                                                ephemeral=True)